@@ -1,9 +1,48 @@
 import streamlit as st
 import base64
+import logging
+import os
+import time
 import pandas as pd
 import plotly.express as px
-from io import BytesIO
 from pathlib import Path
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from billing import DEFAULT_TIER, TIERS, load_recovery_costs
+from catalog import load_catalog
+from cohort import find_cohorts
+from charts import MAX_POINTS, cached_figure, line_figure
+from data_cache import EXCEL_ENGINE, memory_report, read_excel
+from exports import (
+    XLSX_MIME, ZIP_MIME, file_bytes, lazy, vendor_bundle_xlsx, vendor_bundle_zip, xlsx_bytes
+)
+from ingest import read_workbook, snapshot_date
+import perf
+import prefetch
+from labels import ffpe_labels, label_sheet_pdf, labels_zip, supply_labels
+from rollups import load_store_rollups
+from scanner import ScanPipeline, apply_scan, decode_bytes, video_frame_callback
+from snapshot import load_latest, pending_markdown
+from store import TABLES, get_store
+from supply import load_supply
+from tables import PAGE_SIZES, file_table, paged_table
+from watcher import POLL_SECONDS, DataWatcher
+
+try:
+    from streamlit_webrtc import webrtc_streamer
+except ImportError:
+    webrtc_streamer = None
+
+RUN_STARTED = time.perf_counter()
+logger = logging.getLogger("dashboard")
+# Snapshot mode: render Tabs 1-4 from the newest precomputed snapshot
+# (``python snapshot.py``) in this directory instead of computing them.
+SNAPSHOT_DIR = os.environ.get("DASHBOARD_SNAPSHOT_DIR")
+# Set DASHBOARD_WATCH=0 to turn off the background data-file watcher.
+WATCH_DATA = os.environ.get("DASHBOARD_WATCH", "1").lower() not in ("0", "false", "no", "off")
+# Set DASHBOARD_PREFETCH=0 to skip parsing every data file in the background
+# when the server starts (it is always skipped in snapshot mode).
+PREFETCH = os.environ.get("DASHBOARD_PREFETCH", "1").lower() not in ("0", "false", "no", "off")
 
 st.set_page_config(page_title="In Situ Tissue-Omics Core Dashboard", layout="wide")
 
@@ -63,149 +102,342 @@ st.markdown(f"""
     </div>
 """, unsafe_allow_html=True)
 
+
 # -------------------------------------------------
-# TABS
+# PAGED TABLES
 # -------------------------------------------------
-tab1, tab2, tab3, tab4 = st.tabs([
-    "📦 Delivered Services",
-    "⏳ Pending Services",
-    "🧫 FFPE Cancer Tissue Repository",
-    "💰 Recovery Cost"
-])
+@st.fragment
+def table_viewer(table, key):
+    """Search, sort and page ``table`` on the server; only the visible page
+    of the selected columns is sent to the browser."""
+    col_search, col_sort, col_order = st.columns([3, 2, 1])
+    search = col_search.text_input("Search", key=f"{key}_search", placeholder="Filter rows containing…")
+    sort = col_sort.selectbox("Sort by", ["(file order)"] + table.columns, key=f"{key}_sort")
+    descending = col_order.toggle("Descending", key=f"{key}_desc")
+    columns = st.multiselect("Columns", table.columns, default=table.columns, key=f"{key}_columns")
+
+    col_page, col_size = st.columns([3, 1])
+    page_size = col_size.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_size")
+    page = col_page.number_input("Page", min_value=1, step=1, key=f"{key}_page")
+    with perf.span("transform", f"{key} query"):
+        rows, total = table.query(columns, sort=sort, ascending=not descending, search=search,
+                                  page=page, page_size=page_size)
+    pages = max(1, -(-total // page_size))
+    page = min(page, pages)
+    with perf.span("render", f"{key} table"):
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+    first = (page - 1) * page_size
+    st.caption(f"Page {page} of {pages} · rows {min(first + 1, total)}–{first + len(rows)} of {total}"
+               + (f" (filtered from {len(table)})" if total != len(table) else ""))
+
+
+def unreadable(path, error):
+    """Say that a data file could not be read, instead of failing the page."""
+    logger.warning("could not read %s: %s", path, error)
+    st.error(f"⚠️ {path.name} could not be read ({type(error).__name__}: {error}). "
+             "Replace it with a valid export; the rest of the page is unaffected.")
+
+
+def seed(store, table):
+    """Fill an empty store table from its workbook; an unreadable workbook
+    is reported instead of failing the page."""
+    try:
+        store.seed(table)
+    except Exception as e:
+        unreadable(Path(TABLES[table][0]), e)
+
+
+def show_figure(fig):
+    with perf.span("render", fig.layout.title.text):
+        st.plotly_chart(fig, use_container_width=True)
+
 
 # -------------------------------------------------
 # TAB 1: DELIVERED SERVICES
 # -------------------------------------------------
-with tab1:
-    DEFAULT_FILE = Path("lab_record.xlsx")
-
-    if DEFAULT_FILE.exists():
-        df = pd.read_excel(DEFAULT_FILE)
+def trend_chart(key, data, title, **kwargs):
+    """Memoized, downsampled date/quantity line chart; long series get a zoom slider."""
+    x_range = None
+    if len(data) > MAX_POINTS:
+        first, last = data["Date"].min().date(), data["Date"].max().date()
+        x_range = st.slider("Zoom", min_value=first, max_value=last, value=(first, last),
+                            key=f"{key[0]}_zoom")
+    fig = cached_figure(key + (x_range,), lambda: line_figure(data, "Date", "Quantity", title,
+                                                              x_range=x_range, **kwargs))
+    show_figure(fig)
+
+
+@st.fragment
+def slide_trend(rollups):
+    st.subheader("📈 Histology Slide Generation Over Time")
+    granularity = st.radio("Granularity", ["Daily", "Monthly"], horizontal=True, key="slides_granularity")
+    if granularity == "Monthly":
+        time_summary = rollups.monthly_summary("slides").rename(columns={"Month": "Date"})
     else:
-        st.error("❌ No data file found. Please place 'lab_record.xlsx' in the same directory.")
-        st.stop()
+        time_summary = rollups.summary("slides", "Date")
+    trend_chart(("slides", granularity, id(rollups), rollups.version), time_summary,
+                "No of Histology Slides Over Time (excl. FFPE Processing & Embedding)")
+
+
+def service_entry(store):
+    with st.expander("➕ Log a Delivered Service"):
+        with st.form("service_entry", clear_on_submit=True):
+            col1, col2, col3 = st.columns(3)
+            date = col1.date_input("Date")
+            requester = col2.text_input("Requester Name")
+            service_type = col3.text_input("Service Type")
+            sample_type = col1.text_input("Sample Type")
+            quantity = col2.number_input("Quantity", min_value=0, step=1)
+            notes = col3.text_input("Notes")
+            if st.form_submit_button("Save Service Record"):
+                if not requester or not service_type:
+                    st.warning("Requester Name and Service Type are required.")
+                else:
+                    store.upsert("service_records", [{
+                        "Date": date, "Requester Name": requester, "Service Type": service_type,
+                        "Sample Type": sample_type, "Quantity": quantity, "Notes": notes or None,
+                    }])
+                    st.success(f"Saved {service_type} for {requester}.")
+
+
+def store_transfer(store, table, file_name):
+    """Bulk xlsx import into, and export of, one store table."""
+    with st.expander("📂 Bulk Import / Export (xlsx)"):
+        uploaded = st.file_uploader("Import rows from a workbook", type=["xlsx"], key=f"{table}_import")
+        replace = st.checkbox("Replace all existing rows", key=f"{table}_replace")
+        if uploaded is not None and st.button("Import", key=f"{table}_import_run"):
+            try:
+                imported = store.import_xlsx(table, uploaded, replace=replace)
+                st.success(f"Imported {imported} rows.")
+            except ValueError as e:
+                st.error(str(e))
+            except Exception as e:
+                st.error(f"⚠️ {uploaded.name} could not be read ({type(e).__name__}: {e}).")
+        revision = store.revision(table)
+        st.download_button(
+            label="📥 Export as xlsx",
+            data=lambda: xlsx_bytes(store.export_frame(table), table, version=("store", table, revision)),
+            file_name=file_name,
+            mime=XLSX_MIME,
+            key=f"{table}_export"
+        )
 
-    required_cols = ["Date", "Requester Name", "Service Type", "Sample Type", "Quantity"]
-    if not all(col in df.columns for col in required_cols):
-        st.error(f"Excel file must contain these columns: {required_cols}")
-        st.stop()
 
-    df["Date"] = pd.to_datetime(df["Date"])
-    df["Quantity"] = pd.to_numeric(df["Quantity"], errors="coerce").fillna(0).astype(int)
+def delivered_services():
+    store = get_store()
+    with perf.span("load", "seed service_records"):
+        seed(store, "service_records")
+    service_entry(store)
+    store_transfer(store, "service_records", "lab_record.xlsx")
 
-    total_services = len(df)
-    slide_df_for_metrics = df[df["Service Type"] != "FFPE Processing & Embedding"]
-    total_slides_processed = slide_df_for_metrics["Quantity"].sum()
-    unique_requesters = df["Requester Name"].nunique()
+    if store.count("service_records") == 0:
+        st.error("❌ No service records yet. Import 'lab_record.xlsx' or log a service above.")
+        st.stop()
+
+    with perf.span("load", "service rollups"):
+        rollups = load_store_rollups(store)
 
+    metrics = rollups.metrics()
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Service Entries (all)", total_services)
-    col2.metric("Total Slides Processed (excl. FFPE Processing & Embedding)", total_slides_processed)
-    col3.metric("Unique Requesters (all)", unique_requesters)
+    col1.metric("Total Service Entries (all)", metrics["total_services"])
+    col2.metric("Total Slides Processed (excl. FFPE Processing & Embedding)", metrics["total_slides"])
+    col3.metric("Unique Requesters (all)", metrics["unique_requesters"])
 
     st.divider()
 
-    grouped = (
-        df.groupby(["Date", "Requester Name", "Service Type", "Sample Type"], as_index=False)
-          .agg({"Quantity": "sum"})
-    )
-
     st.subheader("📅 Provided Service Summary (All Services)")
-    daily_summary = (
-        grouped.groupby(["Date", "Requester Name"], as_index=False)
-               .agg({"Quantity": "sum"})
-               .sort_values("Date", ascending=False)
-    )
+    with perf.span("transform", "daily summary"):
+        daily_summary = rollups.summary("all", ["Date", "Requester Name"], sort="Date")
     st.dataframe(daily_summary, use_container_width=True)
 
     st.divider()
 
-    slide_df = grouped[grouped["Service Type"] != "FFPE Processing & Embedding"].copy()
-
     st.subheader("📊 Quantity by Service Type (Slide Generation)")
-    service_summary = slide_df.groupby("Service Type", as_index=False)["Quantity"].sum()
-    fig_service = px.bar(service_summary, x="Service Type", y="Quantity", text="Quantity",
-                         title="Quantity by Service Type (Slide Generation)", color="Service Type")
-    st.plotly_chart(fig_service, use_container_width=True)
+    service_summary = rollups.summary("slides", "Service Type")
+    fig_service = cached_figure(("service", id(rollups), rollups.version), lambda: px.bar(
+        service_summary, x="Service Type", y="Quantity", text="Quantity",
+        title="Quantity by Service Type (Slide Generation)", color="Service Type"))
+    show_figure(fig_service)
 
     st.subheader("👩‍🔬 Quantity by Requester (Slide Generation)")
-    requester_summary = slide_df.groupby("Requester Name", as_index=False)["Quantity"].sum()
-    fig_requester = px.bar(requester_summary, x="Requester Name", y="Quantity", text="Quantity",
-                           title="Quantity by Requester (Slide Generation)", color="Requester Name")
-    st.plotly_chart(fig_requester, use_container_width=True)
+    requester_summary = rollups.summary("slides", "Requester Name")
+    fig_requester = cached_figure(("requester", id(rollups), rollups.version), lambda: px.bar(
+        requester_summary, x="Requester Name", y="Quantity", text="Quantity",
+        title="Quantity by Requester (Slide Generation)", color="Requester Name"))
+    show_figure(fig_requester)
 
-    st.subheader("📈 Histology Slide Generation Over Time")
-    time_summary = slide_df.groupby("Date", as_index=False)["Quantity"].sum()
-    fig_time = px.line(time_summary, x="Date", y="Quantity", markers=True,
-                       title="No of Histology Slides Over Time (excl. FFPE Processing & Embedding)")
-    st.plotly_chart(fig_time, use_container_width=True)
+    slide_trend(rollups)
 
     st.divider()
 
     st.subheader("🧱 FFPE Processing & Embedding Trend Over Time")
-    ffpe_df = grouped[grouped["Service Type"] == "FFPE Processing & Embedding"]
-
-    if not ffpe_df.empty:
-        ffpe_trend = ffpe_df.groupby("Date", as_index=False)["Quantity"].sum()
-        fig_ffpe = px.line(ffpe_trend, x="Date", y="Quantity", markers=True,
-                           title="FFPE Processing & Embedding Volume Over Time",
-                           color_discrete_sequence=["#FF7F50"])
-        st.plotly_chart(fig_ffpe, use_container_width=True)
+    if not rollups.ffpe().empty:
+        ffpe_trend = rollups.summary("ffpe", "Date")
+        trend_chart(("ffpe", id(rollups), rollups.version), ffpe_trend,
+                    "FFPE Processing & Embedding Volume Over Time", color_discrete_sequence=["#FF7F50"])
 
         st.subheader("🔍 FFPE Processing & Embedding Summary by Requester")
-        ffpe_summary = (
-            ffpe_df.groupby("Requester Name", as_index=False)["Quantity"]
-            .sum()
-            .sort_values("Quantity", ascending=False)
-        )
+        ffpe_summary = rollups.summary("ffpe", "Requester Name", sort="Quantity")
         st.dataframe(ffpe_summary, use_container_width=True)
     else:
         st.info("No 'FFPE Processing & Embedding' records found in this dataset.")
 
     st.divider()
     st.subheader("📋 Full Service Report (All Entries)")
-    st.dataframe(grouped.sort_values("Date", ascending=False), use_container_width=True)
+    table_viewer(paged_table(("report", id(rollups), rollups.version), rollups.report), "report")
+
 
 # -------------------------------------------------
 # TAB 2: PENDING SERVICES
 # -------------------------------------------------
-with tab2:
-    st.subheader("⏳ Pending Service Requests")
-
-    st.markdown("""
-    **Pending Requests:**
-    1. *Dr. Amadou Gaye* — Matched FFPE and frozen tissue samples from 8 African American and 8 non–African American patients.  
-       **Status:** In progress (biobank contact and coordination)
-    2. *Dr. Chandravanu Dash* — Frozen mouse brain slide preparation for brain region study.  
-       **Status:** In review process
-    3. *Dr. Menaka Thounaojam* - Frozen sections from unfixed snap frozen mouse eye tissue.
-       **Status:** In process of optimizing sectioning protocol
-    """)
-
-    # --- Load Excel file for Biobank list ---
+@st.fragment
+def biobank_list():
     st.markdown("### 📘 List of Biobanks")
-    PENDING_FILE = "Cancer_biobanks_USA.xlsx"
-    try:
-        pending_df = pd.read_excel(PENDING_FILE)
-        edited_df = st.data_editor(
-            pending_df,
-            use_container_width=True,
-            num_rows="dynamic",
-            key="pending_editor"
-        )
+    store = get_store()
+    seed(store, "biobanks")
+    with perf.span("load", "biobanks"):
+        biobank_df = store.editor_frame("biobanks")
+    revision = store.revision("biobanks")
+    # Keyed on the revision so a saved (or someone else's) change starts a fresh editor.
+    editor_key = f"biobank_editor_{revision}"
+    edited_df = st.data_editor(
+        biobank_df,
+        use_container_width=True,
+        num_rows="dynamic",
+        hide_index=True,
+        column_config={"id": None},
+        disabled=["id"],
+        key=editor_key
+    )
 
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-            edited_df.to_excel(writer, index=False, sheet_name="Pending_Services")
+    col_save, col_download = st.columns(2)
+    if col_save.button("💾 Save Changes", key="biobank_save"):
+        saved = store.apply_edits("biobanks", biobank_df, st.session_state[editor_key])
+        st.toast(f"Saved {saved} biobank row changes.")
+        st.rerun(scope="fragment")
+    col_download.download_button(
+        label="📥 Download Updated Biobank List",
+        data=lazy(xlsx_bytes, edited_df.drop(columns="id"), "Pending_Services"),
+        file_name="Updated_Pending_Services.xlsx",
+        mime=XLSX_MIME
+    )
+    store_transfer(store, "biobanks", "Cancer_biobanks_USA.xlsx")
+
+
+@st.fragment
+def catalog_search():
+    st.subheader("🔎 Cross-Vendor Tissue Catalog")
+    with perf.span("load", "catalog"):
+        tissue_catalog = load_catalog()
+    for vendor, error in tissue_catalog.skipped.items():
+        st.warning(f"⚠️ {vendor} stock is left out of the catalog: its file could not be read ({error}).")
+    if len(tissue_catalog) == 0:
+        st.info("No vendor stock files found in the directory.")
+    else:
+        facet_labels = {
+            "vendor": "Vendor",
+            "preservation": "Preservation",
+            "stage_group": "Stage",
+            "grade": "Grade",
+            "er": "ER",
+            "pr": "PR",
+            "her2_ihc": "HER2 IHC",
+            "ethnicity": "Ethnicity",
+        }
+        facet_cols = st.columns(4)
+        selected = {}
+        for i, (facet, label) in enumerate(facet_labels.items()):
+            chosen = facet_cols[i % 4].multiselect(
+                label, tissue_catalog.facet_values(facet), key=f"catalog_{facet}"
+            )
+            selected[facet] = chosen or None
+        age_col, avail_col = st.columns([3, 1])
+        age_range = age_col.slider("Age", 0, 100, (0, 100), key="catalog_age")
+        if avail_col.checkbox("Available only", value=True, key="catalog_available"):
+            selected["available"] = True
+
+        with perf.span("transform", "catalog filter"):
+            matches = tissue_catalog.filter(age=None if age_range == (0, 100) else age_range, **selected)
+        st.caption(f"{len(matches)} of {len(tissue_catalog)} samples match")
+        st.dataframe(matches, use_container_width=True)
+
+
+@st.fragment
+def cohort_builder():
+    st.subheader("🧩 Cohort Builder")
+    st.caption("Donor groups for a pending request, chosen from the vendor stock files: cheapest available "
+               "donors per group, single-vendor options first.")
+    tissue_catalog = load_catalog()
+    if len(tissue_catalog) == 0:
+        st.info("No vendor stock files found in the directory.")
+        return
+    ethnicities = tissue_catalog.facet_values("ethnicity")
+
+    col_type, col_stage, col_age = st.columns([2, 2, 3])
+    sample_type = col_type.radio("Samples per donor", ["Matched FFPE + Frozen", "FFPE", "Frozen", "FFPE or Frozen"],
+                                 key="cohort_type")
+    stages = col_stage.multiselect("Stage", tissue_catalog.facet_values("stage_group"), key="cohort_stage")
+    age_range = col_age.slider("Age", 0, 100, (0, 100), key="cohort_age")
+    receptor_cols = st.columns(3)
+    receptors = {
+        facet: receptor_cols[i].multiselect(label, tissue_catalog.facet_values(facet), key=f"cohort_{facet}")
+        for i, (facet, label) in enumerate((("er", "ER"), ("pr", "PR"), ("her2", "HER2")))
+    }
 
-        st.download_button(
-            label="💾 Download Updated Biobank List",
-            data=buffer.getvalue(),
-            file_name="Updated_Pending_Services.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    group_count = st.number_input("Donor groups", min_value=1, max_value=4, value=2, key="cohort_groups")
+    arms = []
+    for i, col in enumerate(st.columns(int(group_count))):
+        # Defaults follow the first pending request: 8 African American and 8 other donors.
+        default = ["Black or African American"] if i == 0 else [e for e in ethnicities
+                                                                  if e != "Black or African American"]
+        name = col.text_input("Group", value=f"Group {i + 1}", key=f"cohort_name_{i}")
+        count = col.number_input("Donors", min_value=1, value=8, key=f"cohort_count_{i}")
+        chosen = col.multiselect("Ethnicity", ethnicities, default=[e for e in default if e in ethnicities],
+                                 key=f"cohort_ethnicity_{i}")
+        arms.append((name, int(count), {"ethnicity": chosen or None}))
+
+    started = time.perf_counter()
+    with perf.span("transform", "cohort search"):
+        cohorts = find_cohorts(
+            tissue_catalog, arms,
+            matched=sample_type == "Matched FFPE + Frozen",
+            preservation=None if sample_type == "FFPE or Frozen" else sample_type,
+            age=None if age_range == (0, 100) else age_range,
+            stage_group=stages or None,
+            **{facet: values or None for facet, values in receptors.items()},
         )
-    except Exception as e:
-        st.error(f"Could not read {PENDING_FILE}: {e}")
+    st.caption(f"{len(cohorts)} options in {time.perf_counter() - started:.2f}s")
+    if not cohorts:
+        st.info("No available donors match these criteria.")
+    for i, cohort in enumerate(cohorts, start=1):
+        status = "✅ complete" if cohort["feasible"] else "⚠️ short " + ", ".join(
+            f"{arm}: {missing}" for arm, missing in cohort["shortfall"].items())
+        cost = f"${cohort['total_cost']:,.2f}" + (f" + {cohort['unpriced']} unpriced" if cohort["unpriced"] else "")
+        with st.expander(f"Option {i} · {' + '.join(cohort['vendors'])} · {cohort['donors']} donors · {cost} · "
+                         f"{status}", expanded=i == 1):
+            st.dataframe(cohort["samples"], use_container_width=True, hide_index=True)
+            st.download_button(
+                label="📥 Download Cohort (xlsx)",
+                data=lazy(xlsx_bytes, cohort["samples"], "Cohort"),
+                file_name=f"cohort_option_{i}.xlsx",
+                mime=XLSX_MIME,
+                key=f"cohort_download_{i}"
+            )
+
+
+def pending_services():
+    st.subheader("⏳ Pending Service Requests")
+
+    st.markdown(pending_markdown())
+
+    # --- Biobank list (editable) ---
+    biobank_list()
+
+    st.divider()
+    catalog_search()
+
+    st.divider()
+    cohort_builder()
 
     st.divider()
     st.subheader("🏷️ Available Tissue Stock Files")
@@ -214,16 +446,23 @@ with tab2:
     bioivt_path = Path("BioIVT_stock.xlsx")
     if bioivt_path.exists():
         st.markdown("#### 🧬 BioIVT Breast Cancer Tissue Stock")
-        bioivt_df = pd.read_excel(bioivt_path)
-        st.dataframe(bioivt_df, use_container_width=True)
-        bioivt_buffer = BytesIO()
-        with pd.ExcelWriter(bioivt_buffer, engine="openpyxl") as writer:
-            bioivt_df.to_excel(writer, index=False)
+        try:
+            with perf.span("load", bioivt_path.name):
+                bioivt_sheets = read_workbook(bioivt_path)
+        except Exception as e:
+            unreadable(bioivt_path, e)
+            bioivt_sheets = {}
+        bioivt_date = snapshot_date(bioivt_sheets)
+        if bioivt_date is not None:
+            st.caption(f"Vendor output date: {bioivt_date:%m/%d/%Y}")
+        for sheet_name, sheet_df in bioivt_sheets.items():
+            st.markdown(f"**{sheet_name}** — {len(sheet_df)} rows")
+            table_viewer(file_table(bioivt_path, sheet_name, lambda: sheet_df), f"bioivt_{sheet_name}")
         st.download_button(
             label="📥 Download BioIVT Stock File",
-            data=bioivt_buffer.getvalue(),
+            data=lazy(file_bytes, bioivt_path),
             file_name="BioIVT_stock.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            mime=XLSX_MIME
         )
     else:
         st.info("BioIVT_stock.xlsx not found in the directory.")
@@ -232,16 +471,23 @@ with tab2:
     cureline_path = Path("Cureline_breast_cancer_stock.xlsx")
     if cureline_path.exists():
         st.markdown("#### 🧫 Cureline Breast Cancer Tissue Stock")
-        cureline_df = pd.read_excel(cureline_path)
-        st.dataframe(cureline_df, use_container_width=True)
-        cureline_buffer = BytesIO()
-        with pd.ExcelWriter(cureline_buffer, engine="openpyxl") as writer:
-            cureline_df.to_excel(writer, index=False)
+        try:
+            with perf.span("load", cureline_path.name):
+                cureline_sheets = read_workbook(cureline_path)
+        except Exception as e:
+            unreadable(cureline_path, e)
+            cureline_sheets = {}
+        cureline_date = snapshot_date(cureline_sheets)
+        if cureline_date is not None:
+            st.caption(f"Vendor output date: {cureline_date:%m/%d/%Y}")
+        for sheet_name, sheet_df in cureline_sheets.items():
+            st.markdown(f"**{sheet_name}** — {len(sheet_df)} rows")
+            table_viewer(file_table(cureline_path, sheet_name, lambda: sheet_df), f"cureline_{sheet_name}")
         st.download_button(
             label="📥 Download Cureline Stock File",
-            data=cureline_buffer.getvalue(),
+            data=lazy(file_bytes, cureline_path),
             file_name="Cureline_breast_cancer_stock.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            mime=XLSX_MIME
         )
     else:
         st.info("Cureline_breast_cancer_stock.xlsx not found in the directory.")
@@ -250,88 +496,445 @@ with tab2:
     reprocell_path = Path("reprocell_breast_stock.xlsx")
     if reprocell_path.exists():
         st.markdown("#### 🧬 Reprocell Breast Cancer Tissue Stock")
-        reprocell_df = pd.read_excel(reprocell_path)
-        st.dataframe(reprocell_df, use_container_width=True)
-        reprocell_buffer = BytesIO()
-        with pd.ExcelWriter(reprocell_buffer, engine="openpyxl") as writer:
-            reprocell_df.to_excel(writer, index=False)
+        try:
+            reprocell_table = file_table(reprocell_path, "sheet", lambda: read_excel(reprocell_path))
+        except Exception as e:
+            unreadable(reprocell_path, e)
+        else:
+            table_viewer(reprocell_table, "reprocell")
         st.download_button(
             label="📥 Download Reprocell Stock File",
-            data=reprocell_buffer.getvalue(),
+            data=lazy(file_bytes, reprocell_path),
             file_name="Reprocell_stock.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            mime=XLSX_MIME
         )
     else:
         st.info("Reprocell_stock.xlsx not found in the directory.")
 
 # --- reprocell breast File ---
-    reprocell_path = Path("reprocell_biobank_2.xlsx")
+    reprocell2_path = Path("reprocell_biobank_2.xlsx")
     if reprocell2_path.exists():
         st.markdown("#### 🧬 Additional Reprocell Breast Cancer Tissue Stock")
-        reprocell2_df = pd.read_excel(reprocell2_path)
-        st.dataframe(reprocell2_df, use_container_width=True)
-        reprocell2_buffer = BytesIO()
-        with pd.ExcelWriter(reprocell2_buffer, engine="openpyxl") as writer:
-            reprocell2_df.to_excel(writer, index=False)
+        try:
+            reprocell2_table = file_table(reprocell2_path, "sheet", lambda: read_excel(reprocell2_path))
+        except Exception as e:
+            unreadable(reprocell2_path, e)
+        else:
+            table_viewer(reprocell2_table, "reprocell2")
         st.download_button(
             label="📥 Download Reprocell Stock2 File",
-            data=reprocell2_buffer.getvalue(),
+            data=lazy(file_bytes, reprocell2_path),
             file_name="Reprocell2_stock.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            mime=XLSX_MIME
         )
     else:
         st.info("Reprocell_biobank_2.xlsx not found in the directory.")
+
+    # --- All vendor stock in one download ---
+    vendor_paths = {
+        "BioIVT": bioivt_path,
+        "Cureline": cureline_path,
+        "Reprocell": reprocell_path,
+        "Reprocell 2": reprocell2_path,
+    }
+    if any(p.exists() for p in vendor_paths.values()):
+        st.markdown("#### 📦 All Vendor Stock")
+        col_xlsx, col_zip = st.columns(2)
+        col_xlsx.download_button(
+            label="📥 Download All Vendor Stock (one workbook)",
+            data=lazy(vendor_bundle_xlsx, vendor_paths),
+            file_name="All_vendor_stock.xlsx",
+            mime=XLSX_MIME
+        )
+        col_zip.download_button(
+            label="🗜️ Download All Vendor Stock Files (zip)",
+            data=lazy(vendor_bundle_zip, vendor_paths),
+            file_name="All_vendor_stock.zip",
+            mime=ZIP_MIME
+        )
+
+
 # -------------------------------------------------
 # TAB 3: FFPE CANCER TISSUE REPOSITORY
 # -------------------------------------------------
-with tab3:
+def ffpe_repository():
     st.subheader("🧫 FFPE Cancer Tissue Repository Overview")
-    repo_file = Path("ffpe_repository.xlsx")
+    store = get_store()
+    seed(store, "ffpe_repository")
 
-    if repo_file.exists():
-        repo_df = pd.read_excel(repo_file)
+    if store.count("ffpe_repository"):
+        with perf.span("load", "ffpe_repository"):
+            repo_df = store.frame("ffpe_repository").reset_index(drop=True)
+        revision = store.revision("ffpe_repository")
         st.dataframe(repo_df, use_container_width=True)
 
+        ffpe_label_items = ffpe_labels(repo_df)
+        st.download_button(
+            label="🖨️ Download FFPE Block QR Labels (PDF)",
+            data=lazy(label_sheet_pdf, ffpe_label_items),
+            file_name="ffpe_block_labels.pdf",
+            mime="application/pdf"
+        )
+
         st.subheader("📈 Repository Summary by Cancer Type")
-        if "Cancer Type" in repo_df.columns and "Quantity" in repo_df.columns:
-            summary = repo_df.groupby("Cancer Type", as_index=False)["Quantity"].sum()
-            fig_repo = px.bar(summary, x="Cancer Type", y="Quantity",
-                              title="FFPE Samples by Cancer Type", color="Cancer Type")
-            st.plotly_chart(fig_repo, use_container_width=True)
-        else:
-            st.warning("Columns 'Cancer Type' and 'Quantity' not found in the repository file.")
+        summary = repo_df.groupby("Cancer Type", as_index=False)["Quantity"].sum()
+        fig_repo = cached_figure(("repo", revision), lambda: px.bar(
+            summary, x="Cancer Type", y="Quantity", title="FFPE Samples by Cancer Type", color="Cancer Type"))
+        show_figure(fig_repo)
     else:
-        st.info("No FFPE repository file found. Please upload 'ffpe_repository.xlsx'.")
+        st.info("No FFPE repository records yet. Import 'ffpe_repository.xlsx' below.")
+    store_transfer(store, "ffpe_repository", "ffpe_repository.xlsx")
+
 
 # -------------------------------------------------
 # TAB 4: RECOVERY COST
 # -------------------------------------------------
-with tab4:
+@st.fragment
+def rate_editor(store, table, title, file_name):
+    """Editable store table (the price schedule or the requester tiers)."""
+    st.markdown(f"### {title}")
+    df = store.editor_frame(table)
+    revision = store.revision(table)
+    editor_key = f"{table}_editor_{revision}"
+    st.data_editor(
+        df,
+        use_container_width=True,
+        num_rows="dynamic",
+        hide_index=True,
+        column_config={
+            "id": None,
+            "Tier": st.column_config.SelectboxColumn("Tier", options=TIERS, default=DEFAULT_TIER),
+        },
+        disabled=["id"],
+        key=editor_key
+    )
+    if st.button("💾 Save Changes", key=f"{table}_save"):
+        saved = store.apply_edits(table, df, st.session_state[editor_key])
+        st.toast(f"Saved {saved} row changes.")
+        st.rerun()
+    store_transfer(store, table, file_name)
+
+
+def recovery_cost():
     st.subheader("💰 Recovery Cost Overview")
-    cost_file = Path("recovery_cost.xlsx")
-
-    if cost_file.exists():
-        cost_df = pd.read_excel(cost_file)
-        st.dataframe(cost_df, use_container_width=True)
-
-        if "Requester Name" in cost_df.columns and "Cost" in cost_df.columns:
-            st.subheader("📊 Cost Breakdown by Requester")
-            summary_cost = cost_df.groupby("Requester Name", as_index=False)["Cost"].sum()
-            fig_cost = px.bar(summary_cost, x="Requester Name", y="Cost", text="Cost",
-                              title="Total Recovery Cost per Requester", color="Requester Name")
-            st.plotly_chart(fig_cost, use_container_width=True)
-
-            st.subheader("📈 Monthly Cost Trend")
-            if "Date" in cost_df.columns:
-                cost_df["Date"] = pd.to_datetime(cost_df["Date"])
-                monthly_cost = cost_df.groupby(cost_df["Date"].dt.to_period("M")).sum(numeric_only=True)
-                monthly_cost.index = monthly_cost.index.astype(str)
-                fig_month = px.line(monthly_cost, x=monthly_cost.index, y="Cost",
-                                    title="Monthly Recovery Cost Trend", markers=True)
-                st.plotly_chart(fig_month, use_container_width=True)
-        else:
-            st.warning("The recovery cost file must include 'Requester Name' and 'Cost' columns.")
+    st.caption("Quantity of every delivered service × the unit price in effect on its date for its service, "
+               "sample type and the requester's tier (a blank Sample Type rate covers all sample types).")
+    store = get_store()
+    for table in ("service_records", "price_schedule", "requester_tiers"):
+        seed(store, table)
+
+    if store.count("service_records") and store.count("price_schedule"):
+        with perf.span("load", "recovery costs"):
+            costs = load_recovery_costs(store)
+        metrics = costs.metrics()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Total Recovery Cost", f"${metrics['total']:,.2f}")
+        col2.metric("Internal", f"${metrics['Internal']:,.2f}")
+        col3.metric("External", f"${metrics['External']:,.2f}")
+        col4.metric("Entries Without a Rate", metrics["unpriced_entries"])
+        if metrics["unpriced_entries"]:
+            st.warning("Some services have no rate in effect on their date; add them to the price schedule.")
+            st.dataframe(costs.unpriced(), use_container_width=True, hide_index=True)
+
+        st.subheader("📊 Cost Breakdown by Requester")
+        fig_cost = cached_figure(("cost", id(costs), costs.version), lambda: px.bar(
+            costs.by_requester(), x="Requester Name", y="Cost", text="Cost",
+            title="Total Recovery Cost per Requester", color="Tier"))
+        show_figure(fig_cost)
+
+        st.subheader("📈 Monthly Cost Trend")
+        fig_month = cached_figure(("monthly_cost", id(costs), costs.version), lambda: line_figure(
+            costs.monthly(), "Month", "Cost", "Monthly Recovery Cost Trend", color="Tier"))
+        show_figure(fig_month)
+
+        st.subheader("📋 Priced Services")
+        table_viewer(paged_table(("cost_lines", id(costs), costs.version), costs.report), "cost_lines")
+    elif not store.count("price_schedule"):
+        st.info("No price schedule yet. Add rates below or import 'price_schedule.xlsx'.")
+    else:
+        st.info("No service records yet. Log services on the Delivered Services page.")
+
+    st.divider()
+    rate_editor(store, "price_schedule", "🏷️ Price Schedule", "price_schedule.xlsx")
+    rate_editor(store, "requester_tiers", "👥 Requester Rate Tiers", "requester_tiers.xlsx")
+
+
+# -------------------------------------------------
+# TAB 5: SUPPLY INVENTORY
+# -------------------------------------------------
+@st.fragment
+def supply_lookup(inventory):
+    st.subheader("🔍 Quick Lookup")
+    lookup_mode = st.radio("Look up by", ["Lot #", "Catalog #", "Location"], horizontal=True,
+                           key="supply_lookup_mode")
+    if lookup_mode == "Location":
+        location = st.selectbox("Location", inventory.locations(), key="supply_location")
+        st.dataframe(inventory.at_location(location), use_container_width=True)
+    else:
+        code = st.text_input(lookup_mode, key="supply_code").strip()
+        if code and lookup_mode == "Lot #":
+            lot_rows = inventory.where_is_lot(code)
+            if lot_rows.empty:
+                st.warning(f"Lot {code} is not in stock.")
+            else:
+                st.dataframe(lot_rows, use_container_width=True)
+        elif code:
+            st.metric(f"Units of {code} in stock", inventory.catalog_count(code))
+            st.dataframe(inventory.catalog_rows(code), use_container_width=True)
+
+
+@st.fragment
+def expiring_supplies(inventory):
+    st.subheader("⏰ Expiring Soon")
+    within_days = st.slider("Expiring within (days)", 0, 180, 30, key="supply_expiry_days")
+    st.dataframe(inventory.expiring(within_days), use_container_width=True)
+
+
+@st.fragment
+def supply_scanner(inventory, supply_file):
+    st.subheader("📷 Scan Check-in / Check-out")
+    scan_mode = st.radio("Scan mode", ["Check out (−1)", "Check in (+1)"], horizontal=True, key="scan_mode")
+    if "scan_pipeline" not in st.session_state:
+        # Decoding runs on worker threads, which cannot see session state,
+        # so the current mode travels on the pipeline object itself.
+        pipeline = ScanPipeline(lambda code: apply_scan(load_supply(supply_file), code, pipeline.delta))
+        st.session_state.scan_pipeline = pipeline
+    scan_pipeline = st.session_state.scan_pipeline
+    scan_pipeline.delta = -1 if scan_mode.startswith("Check out") else 1
+
+    if webrtc_streamer is not None:
+        webrtc_streamer(
+            key="supply_scanner",
+            video_frame_callback=video_frame_callback(scan_pipeline),
+            media_stream_constraints={"video": True, "audio": False},
+            async_processing=True,
+        )
     else:
-        st.info("No recovery cost file found. Please upload 'recovery_cost.xlsx'.")
+        st.info("Camera scanning needs the 'streamlit-webrtc' package.")
+
+    scan_images = st.file_uploader("Or scan from image files", type=["png", "jpg", "jpeg"],
+                                   accept_multiple_files=True, key="scan_images")
+    scanned_files = st.session_state.setdefault("scanned_files", set())
+    for image in scan_images or []:
+        if image.file_id in scanned_files:
+            continue
+        scanned_files.add(image.file_id)
+        try:
+            codes = decode_bytes(image.getvalue())
+        except ValueError as e:
+            st.error(f"{image.name}: {e}")
+            continue
+        for code in codes:
+            scan_pipeline.history.appendleft((image.name, code))
+            try:
+                if apply_scan(inventory, code, scan_pipeline.delta) is None:
+                    st.warning(f"{code} does not match any lot or catalog number in stock.")
+            except ValueError as e:
+                st.error(f"{code}: {e}")
+    while scan_pipeline.errors:
+        code, message = scan_pipeline.errors.popleft()
+        st.error(f"{code}: {message}")
+
+    if scan_pipeline.history:
+        st.dataframe(pd.DataFrame(list(scan_pipeline.history), columns=["Scanned", "Code"]),
+                     use_container_width=True)
+
+    store = get_store()
+    st.caption(f"Check-ins and check-outs are saved ({store.count('supply_adjustments')} so far) and "
+               f"applied on top of {supply_file.name} every time it is loaded.")
+    revision = store.revision("supply_adjustments")
+    st.download_button(
+        label="📥 Download Check-in / Check-out Log",
+        data=lambda: xlsx_bytes(store.export_frame("supply_adjustments"), "supply_adjustments",
+                                version=("store", "supply_adjustments", revision)),
+        file_name="supply_adjustments.xlsx",
+        mime=XLSX_MIME,
+        key="supply_adjustments_export"
+    )
+
+
+def supply_inventory():
+    st.subheader("🧪 Supply Inventory")
+    supply_file = Path("MMCCCL_supply_oct2025.xlsx")
 
-    
\ No newline at end of file
+    inventory = None
+    if supply_file.exists():
+        try:
+            with perf.span("load", supply_file.name):
+                inventory = load_supply(supply_file)
+        except Exception as e:
+            unreadable(supply_file, e)
+
+    if inventory is not None:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Lots in Stock", int(inventory.df["in_stock"].sum()))
+        col2.metric("Catalog Numbers", len(inventory.by_catalog))
+        col3.metric("Below Minimum Stock", len(inventory.low_stock))
+
+        supply_lookup(inventory)
+
+        st.divider()
+        st.subheader("⚠️ Below Minimum Stock Level")
+        if inventory.low_stock.empty:
+            st.success("All items are at or above their minimum stock level.")
+        else:
+            st.dataframe(inventory.low_stock, use_container_width=True)
+
+        expiring_supplies(inventory)
+
+        st.divider()
+        supply_scanner(inventory, supply_file)
+
+        st.divider()
+        st.subheader("🏷️ QR Labels")
+        supply_label_items = supply_labels(inventory)
+        st.caption(f"{len(supply_label_items)} in-stock lots (catalog # + lot # + location)")
+        col_pdf, col_zip = st.columns(2)
+        col_pdf.download_button(
+            label="🖨️ Download Printable Label Sheet (PDF)",
+            data=lazy(label_sheet_pdf, supply_label_items),
+            file_name="supply_labels.pdf",
+            mime="application/pdf"
+        )
+        col_zip.download_button(
+            label="🗜️ Download Label Images (zip)",
+            data=lazy(labels_zip, supply_label_items),
+            file_name="supply_labels.zip",
+            mime=ZIP_MIME
+        )
+    elif not supply_file.exists():
+        st.info("No supply inventory file found. Please place 'MMCCCL_supply_oct2025.xlsx' in the same directory.")
+
+
+# -------------------------------------------------
+# SNAPSHOT MODE
+# -------------------------------------------------
+def render_snapshot(snapshot, section):
+    st.info(f"📸 Showing the precomputed snapshot of {snapshot.created} (read-only).")
+    for block in snapshot.blocks(section):
+        kind = block["type"]
+        if kind == "subheader":
+            st.subheader(block["text"])
+        elif kind == "caption":
+            st.caption(block["text"])
+        elif kind == "info":
+            st.info(block["text"])
+        elif kind == "requests":
+            st.markdown(pending_markdown(block["items"]))
+        elif kind == "divider":
+            st.divider()
+        elif kind == "metrics":
+            for col, (label, value) in zip(st.columns(len(block["items"])), block["items"]):
+                col.metric(label, value)
+        elif kind == "figure":
+            show_figure(snapshot.figure(block["name"]))
+        elif kind == "table":
+            name = block["name"]
+            table_viewer(paged_table(("snapshot", snapshot.id, name), lambda: snapshot.frame(name)),
+                         f"snapshot_{name}")
+
+
+def snapshot_page(snapshot, section):
+    def page():
+        render_snapshot(snapshot, section)
+    page.__name__ = f"{section}_snapshot"
+    return page
+
+
+# -------------------------------------------------
+# NAVIGATION
+# -------------------------------------------------
+# Each section is a page function, so only the page being viewed loads its
+# data and builds its figures; widgets inside fragments rerun only their
+# fragment.
+@st.cache_resource
+def _process_state():
+    return {"cold": True}
+
+
+@st.cache_resource
+def _warm_start():
+    # Once per server process, from its first script run (Streamlit has no
+    # start-up hook). Pages needing a file it is still parsing wait for that
+    # parse instead of starting their own.
+    return prefetch.start_background()
+
+
+@st.cache_resource
+def _data_watcher():
+    return DataWatcher().start()
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def data_updates(watcher):
+    """Rerun this session once the watcher has reloaded a changed data file."""
+    seen = st.session_state.setdefault("data_generation", watcher.generation)
+    if watcher.generation != seen:
+        st.session_state.data_generation = watcher.generation
+        st.session_state.data_updated = [e["file"] for e in watcher.events_since(seen)]
+        st.rerun()
+
+
+sections = {
+    "delivered": delivered_services,
+    "pending": pending_services,
+    "ffpe": ffpe_repository,
+    "cost": recovery_cost,
+}
+snapshot = load_latest(SNAPSHOT_DIR) if SNAPSHOT_DIR else None
+if snapshot is not None:
+    sections = {name: snapshot_page(snapshot, name) for name in sections}
+elif PREFETCH:
+    _warm_start()
+
+page = st.navigation([
+    st.Page(sections["delivered"], title="Delivered Services", icon="📦", url_path="delivered", default=True),
+    st.Page(sections["pending"], title="Pending Services", icon="⏳", url_path="pending"),
+    st.Page(sections["ffpe"], title="FFPE Cancer Tissue Repository", icon="🧫", url_path="ffpe"),
+    st.Page(sections["cost"], title="Recovery Cost", icon="💰", url_path="cost"),
+    st.Page(supply_inventory, title="Supply Inventory", icon="🧪", url_path="supply"),
+], position="top")
+ctx = get_script_run_ctx()
+session_id = ctx.session_id if ctx else None
+perf.begin_run(session_id, page.title)
+page.run()
+
+# --- Data files reloaded in the background ---
+if WATCH_DATA:
+    with st.sidebar:
+        data_updates(_data_watcher())
+    for updated_file in st.session_state.pop("data_updated", []):
+        st.toast(f"🔄 {updated_file} changed and was reloaded.")
+
+# --- Time to first paint ---
+if "first_paint" not in st.session_state:
+    process_state = _process_state()
+    st.session_state.first_paint = {
+        "seconds": time.perf_counter() - RUN_STARTED,
+        "page": page.title,
+        "cold": process_state["cold"],
+    }
+    process_state["cold"] = False
+    logger.info("first paint %.3fs on %r (%s start)", st.session_state.first_paint["seconds"],
+                page.title, "cold" if st.session_state.first_paint["cold"] else "warm")
+first_paint = st.session_state.first_paint
+st.sidebar.caption(
+    f"⏱️ First paint {first_paint['seconds']:.2f}s on {first_paint['page']} "
+    f"({'cold' if first_paint['cold'] else 'warm'} start)"
+)
+perf.end_run()
+
+# --- Performance panel (DASHBOARD_PERF=1) ---
+if perf.ENABLED:
+    with st.sidebar.expander("🛠️ Performance"):
+        st.caption(f"Recent reruns across sessions · logged to {perf.LOG_PATH}")
+        st.dataframe(perf.summary(), use_container_width=True, hide_index=True)
+        st.caption("This session's previous rerun")
+        st.dataframe(perf.last_run(session_id), use_container_width=True, hide_index=True)
+        st.caption("Loaded tables: memory before and after compaction")
+        st.dataframe(memory_report(), use_container_width=True, hide_index=True)
+        warm_report = prefetch.last_report
+        if warm_report is not None:
+            st.caption(f"Warm start: {warm_report.attrs['seconds']:.2f}s on "
+                       f"{warm_report.attrs['workers']} workers ({EXCEL_ENGINE})")
+            st.dataframe(warm_report, use_container_width=True, hide_index=True)
@@ -0,0 +1,342 @@
+"""Benchmarks for the dashboard's load, aggregation, export and figure paths.
+
+For each requested size, synthetic source workbooks (``synthetic.py``) are
+written to a scratch directory and every dashboard section is timed stage by
+stage, with the peak resident memory each stage reached. Results go to a JSON
+file so runs can be compared::
+
+    python benchmark.py --rows 10000 100000
+    python benchmark.py --rows 10000 --compare bench_results/<earlier>.json
+
+``--compare`` prints the ratio of every stage to the earlier run and exits
+non-zero when a stage slowed down by more than ``--threshold``.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from perf import PeakMemory
+
+HERE = Path(__file__).resolve().parent
+RESULTS_DIR = HERE / "bench_results"
+DEFAULT_ROWS = [10000, 100000]
+THRESHOLD = 1.25
+# Stages faster than this are reported but never flagged; their noise dominates.
+MIN_COMPARE_SECONDS = 0.05
+
+
+class Run:
+    def __init__(self):
+        self.stages = {}
+
+    def stage(self, name, func):
+        with PeakMemory() as memory:
+            started = time.perf_counter()
+            result = func()
+            seconds = time.perf_counter() - started
+        self.stages[name] = {
+            "seconds": round(seconds, 4),
+            "peak_mb": round(memory.peak_mb, 1),
+            "delta_mb": round(memory.peak_mb - memory.start_mb, 1),
+        }
+        print(f"  {name:<32} {seconds:9.3f}s  peak {memory.peak_mb:8.1f} MB", flush=True)
+        return result
+
+
+def _cold(path=None):
+    """Drop in-memory and on-disk workbook caches."""
+    from data_cache import workbooks
+    workbooks.invalidate(path)
+    shutil.rmtree(workbooks.cache_dir, ignore_errors=True)
+
+
+# -------------------------------------------------
+# Sections
+# -------------------------------------------------
+def bench_delivered(run, paths, store):
+    import plotly.express as px
+    from charts import line_figure
+    from data_cache import read_excel, workbooks
+    from exports import write_xlsx
+    from rollups import ServiceRollups, prepare_records
+
+    _cold()
+    raw = run.stage("delivered.load_parse", lambda: read_excel(paths["lab_record"]))
+    workbooks.invalidate()
+    run.stage("delivered.load_sidecar", lambda: read_excel(paths["lab_record"]))
+    run.stage("delivered.load_memory", lambda: read_excel(paths["lab_record"]))
+    records = run.stage("delivered.prepare", lambda: prepare_records(raw))
+
+    rollups = ServiceRollups()
+    head = records.iloc[:len(records) * 99 // 100]
+    run.stage("delivered.rollups_full", lambda: rollups.rebuild(head))
+    run.stage("delivered.rollups_append_1pct", lambda: rollups.append(records.iloc[len(head):]))
+
+    def views():
+        rollups.metrics()
+        rollups.summary("all", ["Date", "Requester Name"], sort="Date")
+        rollups.summary("slides", "Service Type")
+        rollups.summary("slides", "Requester Name")
+        rollups.summary("slides", "Date")
+        rollups.summary("ffpe", "Date")
+        rollups.monthly_summary("slides")
+        return rollups.report()
+    report = run.stage("delivered.views", views)
+
+    def figures():
+        px.bar(rollups.summary("slides", "Service Type"), x="Service Type", y="Quantity", color="Service Type")
+        px.bar(rollups.summary("slides", "Requester Name"), x="Requester Name", y="Quantity",
+               color="Requester Name")
+        line_figure(rollups.summary("slides", "Date"), "Date", "Quantity", "Slides")
+        line_figure(rollups.summary("ffpe", "Date"), "Date", "Quantity", "FFPE")
+    run.stage("delivered.figures", figures)
+    run.stage("delivered.export_report_xlsx", lambda: write_xlsx({"report": report}))
+    run.stage("delivered.store_import", lambda: store.import_frame("service_records", raw, replace=True))
+    run.stage("delivered.store_frame", lambda: store.frame("service_records"))
+
+
+def bench_pending(run, paths):
+    from catalog import TissueCatalog, build_catalog
+    from cohort import find_cohorts
+    from exports import write_xlsx
+    from ingest import read_workbook
+    from tables import PagedTable
+
+    vendor_files = {vendor: paths[vendor] for vendor in ("BioIVT", "Cureline", "Reprocell", "Reprocell 2")}
+    _cold()
+    frames = run.stage("pending.vendor_load_parse", lambda: {v: read_workbook(p) for v, p in vendor_files.items()})
+    run.stage("pending.vendor_load_memory", lambda: {v: read_workbook(p) for v, p in vendor_files.items()})
+    catalog_df = run.stage("pending.catalog_build", lambda: build_catalog(vendor_files))
+    catalog = run.stage("pending.catalog_index", lambda: TissueCatalog(catalog_df))
+
+    def filters():
+        for preservation in ("FFPE", "Frozen"):
+            for ethnicity in catalog.facet_values("ethnicity"):
+                for low in range(20, 90, 10):
+                    catalog.filter(age=(low, low + 10), preservation=preservation, ethnicity=ethnicity,
+                                   available=True)
+    run.stage("pending.catalog_filters", filters)
+
+    def cohorts():
+        ethnicities = catalog.facet_values("ethnicity")
+        african_american = ["Black or African American"]
+        others = [e for e in ethnicities if e not in african_american]
+        arms = [("African American", 8, {"ethnicity": african_american}), ("Other", 8, {"ethnicity": others})]
+        find_cohorts(catalog, arms, matched=True)
+        find_cohorts(catalog, arms, preservation="FFPE", age=(40, 70), stage_group=["II", "III"])
+    run.stage("pending.cohort_search", cohorts)
+
+    table = PagedTable(catalog.df)
+
+    def pages():
+        for page in range(1, 21):
+            table.query(table.columns[:8], sort="age", ascending=False, search="ffpe", page=page)
+    run.stage("pending.paged_queries", pages)
+
+    def bundle():
+        sheets = {f"{v} - {s}"[:31]: df for v, workbook in frames.items() for s, df in workbook.items()}
+        return write_xlsx(sheets)
+    run.stage("pending.export_vendor_xlsx", bundle)
+
+
+def bench_records(run, store, rows):
+    import plotly.express as px
+    from billing import RecoveryCosts
+    from rollups import load_store_rollups
+    from synthetic import ffpe_repository, price_schedule, requester_tiers
+
+    repo = ffpe_repository(max(50, rows // 10))
+    run.stage("ffpe.store_import", lambda: store.import_frame("ffpe_repository", repo, replace=True))
+    repo_df = run.stage("ffpe.store_frame", lambda: store.export_frame("ffpe_repository"))
+    run.stage("ffpe.figure", lambda: px.bar(repo_df.groupby("Cancer Type", as_index=False)["Quantity"].sum(),
+                                            x="Cancer Type", y="Quantity", color="Cancer Type"))
+
+    rollups = load_store_rollups(store)
+    schedule, tiers = price_schedule(), requester_tiers()
+    costs = RecoveryCosts()
+    run.stage("cost.price_full", lambda: costs.update(rollups.daily, schedule, tiers))
+    revised = pd.concat([schedule, schedule.tail(1).assign(**{"Effective Date": pd.Timestamp("2025-07-01")})])
+    run.stage("cost.price_new_version", lambda: costs.update(rollups.daily, revised, tiers))
+
+    def cost_views():
+        px.bar(costs.by_requester(), x="Requester Name", y="Cost", color="Tier")
+        px.line(costs.monthly(), x="Month", y="Cost", color="Tier")
+        costs.report()
+    run.stage("cost.views_figures", cost_views)
+
+
+def bench_supply(run, paths):
+    import supply
+
+    _cold()
+    inventory = run.stage("supply.load", lambda: supply.SupplyInventory(
+        supply.prepare_supply(supply.read_sheet(paths["supply"], "Sheet1"))))
+    lots = inventory.df["lot"].dropna().to_numpy()
+    catalogs = inventory.df["catalog_no"].dropna().to_numpy()
+    rng = np.random.default_rng(0)
+
+    def lookups():
+        for lot in rng.choice(lots, 1000):
+            inventory.where_is_lot(lot)
+        for code in rng.choice(catalogs, 1000):
+            inventory.catalog_count(code)
+        for location in inventory.locations():
+            inventory.at_location(location)
+        inventory.expiring(30)
+    run.stage("supply.lookups", lookups)
+
+    def adjust():
+        for lot in rng.choice(lots, 500):
+            inventory.adjust(lot, 1)
+            inventory.adjust(lot, -1)
+    run.stage("supply.adjust_1000", adjust)
+
+
+def bench_startup(run, paths):
+    from prefetch import warm_start
+
+    files = {paths[vendor]: ("sheets",) for vendor in ("BioIVT", "Cureline", "Reprocell", "Reprocell 2")}
+    for vendor in ("Reprocell", "Reprocell 2"):
+        files[paths[vendor]] += ("first_sheet",)
+    files[paths["supply"]] = ("sheets",)
+    _cold()
+    run.stage("startup.warm_start_serial", lambda: warm_start(files, workers=1, build=False))
+    _cold()
+    run.stage("startup.warm_start_pool", lambda: warm_start(files, workers=len(files), build=False))
+    run.stage("startup.warm_start_sidecars", lambda: warm_start(files, workers=len(files), build=False))
+
+
+# -------------------------------------------------
+# Runner
+# -------------------------------------------------
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _environment():
+    import openpyxl
+    import plotly
+
+    from data_cache import EXCEL_ENGINE
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "xlsx_engine": EXCEL_ENGINE,
+        "packages": {"pandas": pd.__version__, "numpy": np.__version__,
+                     "openpyxl": openpyxl.__version__, "plotly": plotly.__version__},
+    }
+
+
+def run_size(rows, workdir):
+    from data_cache import memory_report
+    from store import Store
+    from synthetic import write_dataset
+
+    print(f"\n== {rows:,} service rows ==", flush=True)
+    started = time.perf_counter()
+    paths = write_dataset(workdir, rows)
+    generated = time.perf_counter() - started
+    print(f"  {'generate':<32} {generated:9.3f}s", flush=True)
+
+    run = Run()
+    store = Store(workdir / "bench.sqlite3")
+    bench_delivered(run, paths, store)
+    bench_pending(run, paths)
+    bench_records(run, store, rows)
+    bench_supply(run, paths)
+    bench_startup(run, paths)
+    memory = memory_report()
+    print("\n  In-memory tables (MB before -> after compaction)")
+    for row in memory.itertuples():
+        print(f"  {row.table:<48} {row.before_mb:9.2f} -> {row.after_mb:9.2f}")
+    return {
+        "generate_seconds": round(generated, 3),
+        "files_mb": {name: round(path.stat().st_size / 2**20, 2) for name, path in paths.items()},
+        "stages": run.stages,
+        "memory": memory.to_dict("records"),
+    }
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Print stage-by-stage ratios against ``baseline``; returns the regressions."""
+    regressions = []
+    for size, current in results["sizes"].items():
+        previous = baseline.get("sizes", {}).get(size)
+        if previous is None:
+            continue
+        print(f"\n== {int(size):,} rows vs {baseline.get('git') or baseline.get('created')} ==")
+        for name, stage in current["stages"].items():
+            old = previous["stages"].get(name)
+            if old is None:
+                continue
+            ratio = stage["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+            flagged = ratio > threshold and stage["seconds"] >= MIN_COMPARE_SECONDS
+            if flagged:
+                regressions.append((size, name, ratio))
+            print(f"  {name:<32} {old['seconds']:9.3f}s -> {stage['seconds']:9.3f}s  x{ratio:5.2f}"
+                  + ("  REGRESSION" if flagged else ""))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard on synthetic data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS,
+                        help="service-log sizes to run (default: %(default)s; up to 1000000)")
+    parser.add_argument("--out", help="results file (default: bench_results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="slowdown ratio counted as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    created = datetime.now(timezone.utc)
+    results = {
+        "created": created.isoformat(timespec="seconds"),
+        "git": _git_commit(),
+        "environment": _environment(),
+        "sizes": {},
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="dashboard-bench-") as scratch:
+        # Caches (.cache/ sidecars) are relative to the working directory.
+        os.chdir(scratch)
+        try:
+            for rows in args.rows:
+                workdir = Path(scratch) / str(rows)
+                workdir.mkdir()
+                results["sizes"][str(rows)] = run_size(rows, workdir)
+        finally:
+            os.chdir(cwd)
+    results["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{created:%Y%m%dT%H%M%SZ}-{results['git'] or 'nogit'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=1))
+    print(f"\nResults written to {out}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than x{args.threshold}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""Recovery cost derived from the delivered-service log.
+
+Tab 4 used to show a hand-maintained ``recovery_cost.xlsx``. Cost is now the
+quantity of each delivered service priced at the rate in effect on its date:
+the service rollup's daily rows (``rollups.ServiceRollups``) are as-of joined
+to an effective-dated price schedule by service type, sample type and rate
+tier (internal or external, per requester). A schedule row with a blank
+Sample Type prices every sample type of its service that has no rate of its
+own.
+
+``RecoveryCosts`` keeps the priced rows between updates. New or changed
+service rows are priced on their own; a new price version reprices only the
+rows dated on or after the earliest effective date it touches, and a tier
+change only that requester's rows.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from rollups import KEYS, load_store_rollups, service_rollups
+
+TIERS = ["Internal", "External"]
+DEFAULT_TIER = "Internal"
+SCHEDULE_COLUMNS = ["Effective Date", "Service Type", "Sample Type", "Tier", "Unit Price"]
+ROW_COLUMNS = KEYS + ["Quantity", "Entries"]
+LINE_COLUMNS = ROW_COLUMNS + ["Tier", "Unit Price", "Effective Date", "Cost"]
+
+
+def _text(values):
+    # Also for categorical columns, which cannot take "" as a fill value.
+    return values.astype(object).fillna("").astype(str).str.strip()
+
+
+def _tier(values):
+    tiers = _text(values).str.title()
+    return tiers.where(tiers.isin(TIERS), DEFAULT_TIER)
+
+
+def prepare_schedule(df):
+    """The price schedule with parsed dates and prices; unusable rows dropped
+    and, of rows repeating a rate's effective date, the last one kept."""
+    df = df.reset_index(drop=True).reindex(columns=SCHEDULE_COLUMNS)
+    df = df.assign(
+        **{"Effective Date": pd.to_datetime(df["Effective Date"], errors="coerce").astype("datetime64[ns]"),
+           "Service Type": _text(df["Service Type"]),
+           "Sample Type": _text(df["Sample Type"]),
+           "Tier": _tier(df["Tier"]),
+           "Unit Price": pd.to_numeric(df["Unit Price"], errors="coerce")}
+    )
+    df = df.dropna(subset=["Effective Date", "Unit Price"])
+    df = df[df["Service Type"] != ""]
+    df = df.drop_duplicates(["Service Type", "Sample Type", "Tier", "Effective Date"], keep="last")
+    return df.sort_values("Effective Date", kind="stable").reset_index(drop=True)
+
+
+def prepare_tiers(df):
+    """Requester name -> rate tier."""
+    if df.empty:
+        return pd.Series(dtype=object)
+    names = _text(df["Requester Name"])
+    return pd.Series(_tier(df["Tier"]).to_numpy(), index=names.to_numpy()).loc[lambda s: s.index != ""]
+
+
+def _as_of(rows, schedule, by):
+    return pd.merge_asof(rows, schedule[by + ["Effective Date", "Unit Price"]], left_on="Date",
+                         right_on="Effective Date", by=by, direction="backward")
+
+
+def price_rows(rows, schedule, tiers):
+    """``rows`` (daily rollup rows) with the requester's tier and the unit
+    price in effect on each row's date; rows without a rate get NaN."""
+    rows = rows[ROW_COLUMNS].reset_index(drop=True).astype({"Date": "datetime64[ns]"})
+    tier = rows["Requester Name"].astype(object).map(tiers).fillna(DEFAULT_TIER) if len(tiers) else DEFAULT_TIER
+    keyed = pd.DataFrame({
+        "Date": rows["Date"],
+        "Service Type": _text(rows["Service Type"]),
+        "Sample Type": _text(rows["Sample Type"]),
+        "Tier": tier,
+        "row": np.arange(len(rows)),
+    })
+    keyed = keyed[keyed["Date"].notna()].sort_values("Date", kind="stable")
+    specific = schedule[schedule["Sample Type"] != ""]
+    generic = schedule[schedule["Sample Type"] == ""]
+    exact = _as_of(keyed, specific, ["Service Type", "Sample Type", "Tier"]).set_index("row")
+    fallback = _as_of(keyed, generic, ["Service Type", "Tier"]).set_index("row")
+    use_exact = exact["Unit Price"].notna()
+    priced = exact[["Unit Price", "Effective Date"]].where(use_exact, fallback[["Unit Price", "Effective Date"]])
+    priced = priced.reindex(np.arange(len(rows)))
+
+    out = rows.assign(Tier=tier)
+    out["Unit Price"] = priced["Unit Price"].to_numpy()
+    out["Effective Date"] = priced["Effective Date"].to_numpy()
+    out["Cost"] = (out["Quantity"] * out["Unit Price"]).round(2)
+    return out
+
+
+def _row_hashes(df):
+    rows = df[ROW_COLUMNS].astype({"Date": "datetime64[ns]", "Quantity": "int64", "Entries": "int64"})
+    return pd.util.hash_pandas_object(rows, index=False).to_numpy()
+
+
+def _schedule_change(old, new):
+    """Earliest effective date of a rate added, removed or changed, or None."""
+    old_hashes = pd.util.hash_pandas_object(old, index=False).to_numpy()
+    new_hashes = pd.util.hash_pandas_object(new, index=False).to_numpy()
+    changed = pd.concat([old[~np.isin(old_hashes, new_hashes)], new[~np.isin(new_hashes, old_hashes)]])
+    return changed["Effective Date"].min() if len(changed) else None
+
+
+def _tier_changes(old, new):
+    names = old.index.union(new.index)
+    before = old.reindex(names).fillna(DEFAULT_TIER)
+    after = new.reindex(names).fillna(DEFAULT_TIER)
+    return names[(before != after).to_numpy()]
+
+
+class RecoveryCosts:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self.reset()
+
+    def reset(self):
+        self.lines = pd.DataFrame(columns=LINE_COLUMNS)
+        self.version = 0
+        self.source = None
+        self._hashes = np.array([], dtype=np.uint64)
+        self._schedule = None
+        self._tiers = pd.Series(dtype=object)
+        self._views.clear()
+
+    def update(self, daily, schedule, tiers):
+        """Bring the priced lines up to date with ``daily`` (the service
+        rollup), ``schedule`` and ``tiers`` (store frames).
+
+        Returns the number of rows that had to be priced.
+        """
+        schedule = prepare_schedule(schedule)
+        tiers = prepare_tiers(tiers)
+        hashes = _row_hashes(daily)
+        with self._lock:
+            kept = np.isin(self._hashes, hashes)
+            lines, line_hashes = self.lines[kept], self._hashes[kept]
+            if self._schedule is None:
+                stale = np.ones(len(lines), dtype=bool)
+            else:
+                since = _schedule_change(self._schedule, schedule)
+                stale = lines["Requester Name"].isin(_tier_changes(self._tiers, tiers)).to_numpy()
+                if since is not None:
+                    stale = stale | (lines["Date"] >= since).to_numpy()
+            new = ~np.isin(hashes, line_hashes)
+            parts = [part for part in (daily.loc[new, ROW_COLUMNS], lines.loc[stale, ROW_COLUMNS]) if len(part)]
+            removed = len(self.lines) - len(lines)
+            if parts:
+                priced = price_rows(pd.concat(parts, ignore_index=True), schedule, tiers)
+                priced_hashes = np.concatenate([hashes[new], line_hashes[stale]])
+                if len(lines):
+                    priced = pd.concat([lines[~stale], priced], ignore_index=True)
+                    priced_hashes = np.concatenate([line_hashes[~stale], priced_hashes])
+                # Hashes are carried along rather than recomputed over every line.
+                order = np.argsort(priced["Date"].to_numpy(), kind="stable")
+                lines, line_hashes = priced.iloc[order].reset_index(drop=True), priced_hashes[order]
+            if parts or removed:
+                self.lines, self._hashes = lines, line_hashes
+                self.version += 1
+                self._views.clear()
+            self._schedule = schedule
+            self._tiers = tiers
+            return int(new.sum() + stale.sum())
+
+    def _view(self, name, build):
+        key = (name, self.version)
+        if key not in self._views:
+            self._views[key] = build()
+        return self._views[key]
+
+    # --- Derived views, memoized per version ---
+    def metrics(self):
+        def build():
+            by_tier = self.lines.groupby("Tier", observed=True)["Cost"].sum()
+            return {
+                "total": float(self.lines["Cost"].sum()),
+                **{tier: float(by_tier.get(tier, 0.0)) for tier in TIERS},
+                "unpriced_entries": int(self.lines.loc[self.lines["Unit Price"].isna(), "Entries"].sum()),
+            }
+        return self._view("metrics", build)
+
+    def by_requester(self):
+        return self._view("by_requester", lambda: (
+            self.lines.groupby(["Requester Name", "Tier"], as_index=False, observed=True)["Cost"].sum()
+            .sort_values("Cost", ascending=False)
+        ))
+
+    def monthly(self):
+        def build():
+            month = self.lines["Date"].dt.to_period("M").dt.to_timestamp()
+            # A column, not a Series grouper: pandas 3 leaves those out of as_index=False results.
+            lines = self.lines.assign(Month=month)
+            return lines.groupby(["Month", "Tier"], as_index=False, observed=True)["Cost"].sum()
+        return self._view("monthly", build)
+
+    def unpriced(self):
+        """Services delivered without a rate in effect, to add to the schedule."""
+        return self._view("unpriced", lambda: (
+            self.lines[self.lines["Unit Price"].isna()]
+            .groupby(["Service Type", "Sample Type", "Tier"], as_index=False, observed=True, dropna=False)
+            .agg(First=("Date", "min"), Last=("Date", "max"), Quantity=("Quantity", "sum"))
+        ))
+
+    def report(self):
+        return self._view("report", lambda: self.lines.sort_values("Date", ascending=False, kind="stable"))
+
+
+# Shared by every session in the process, like ``rollups.service_rollups``.
+recovery_costs = RecoveryCosts()
+
+
+def load_recovery_costs(store, costs=recovery_costs, rollups=service_rollups):
+    """Bring ``costs`` up to date with the service records, price schedule
+    and requester tiers in ``store``."""
+    rollups = load_store_rollups(store, rollups=rollups)
+    source = (str(store.path.resolve()), rollups.version,
+              store.revision("price_schedule"), store.revision("requester_tiers"))
+    if costs.source != source:
+        costs.update(rollups.daily, store.frame("price_schedule"), store.frame("requester_tiers"))
+        costs.source = source
+    return costs
@@ -0,0 +1,406 @@
+"""Unified cross-vendor tissue catalog with precomputed facet indexes.
+
+Each vendor ships stock in its own layout (Cureline, Reprocell x2, BioIVT).
+The adapters below map them onto one schema, ``CATALOG_COLUMNS``, with
+harmonised vocabularies (FFPE/Frozen, stage group I-IV, ER/PR status, HER2
+IHC score, ethnicity group), each stored as a categorical over one shared
+dictionary. ``TissueCatalog`` then keeps one boolean bitmap per facet value,
+so a multi-facet filter is a handful of vectorised ANDs instead of a scan of
+every vendor table.
+"""
+import logging
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_cache import compact, fingerprint
+from ingest import read_workbook
+
+logger = logging.getLogger("dashboard.catalog")
+
+VENDOR_FILES = {
+    "BioIVT": Path("BioIVT_stock.xlsx"),
+    "Cureline": Path("Cureline_breast_cancer_stock.xlsx"),
+    "Reprocell": Path("reprocell_breast_stock.xlsx"),
+    "Reprocell 2": Path("reprocell_biobank_2.xlsx"),
+}
+
+CATALOG_COLUMNS = [
+    "vendor", "sample_id", "donor_id", "preservation", "diagnosis", "stage", "stage_group",
+    "grade", "er", "pr", "her2", "her2_ihc", "ethnicity", "age", "available", "quantity",
+    "price_usd", "source_sheet",
+]
+
+FACETS = ["vendor", "preservation", "stage_group", "grade", "er", "pr", "her2", "her2_ihc", "ethnicity", "available"]
+
+# One dictionary per harmonised column, shared by every vendor's rows (the
+# normalisers below produce nothing else).
+RECEPTOR_STATUSES = ["Negative", "Equivocal", "Positive"]
+CATEGORIES = {
+    "vendor": list(VENDOR_FILES),
+    "preservation": ["FFPE", "Frozen"],
+    "stage_group": ["I", "II", "III", "IV"],
+    "grade": ["G1", "G2", "G3", "G4", "GX"],
+    "er": RECEPTOR_STATUSES,
+    "pr": RECEPTOR_STATUSES,
+    "her2": RECEPTOR_STATUSES,
+    "her2_ihc": ["0", "1+", "2+", "3+"],
+    "ethnicity": ["Asian", "Black or African American", "Hispanic or Latino", "White", "Other", "Unknown"],
+}
+
+
+# -------------------------------------------------
+# Vocabulary normalisation
+# -------------------------------------------------
+def _text(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return str(value).strip().lower()
+
+
+def normalize_preservation(value):
+    text = _text(value)
+    if "ffpe" in text or "paraffin" in text:
+        return "FFPE"
+    if "frozen" in text or text in ("ff", "tissue", "oct"):
+        return "Frozen"
+    return None
+
+
+def normalize_stage(value):
+    """'STAGE II', 'IIA', 'Stage IIIB' -> ('IIA' style stage, 'I'..'IV' group)."""
+    match = re.search(r"\b(IV|I{1,3})([ABC]?)\b", str(value or "").upper().replace("STAGE", " "))
+    if not match:
+        return None, None
+    return match.group(1) + match.group(2), match.group(1)
+
+
+def normalize_grade(value):
+    text = _text(value)
+    match = re.search(r"g([1-4x])", text)
+    if match:
+        return "G" + match.group(1).upper()
+    for word, grade in (("well", "G1"), ("moderate", "G2"), ("poor", "G3"), ("undifferentiated", "G4")):
+        if word in text:
+            return grade
+    return None
+
+
+def normalize_receptor(value):
+    text = _text(value)
+    if not text or "no data" in text or text in ("n/a", "na", "no", "not performed"):
+        return None
+    if re.fullmatch(r"0+(\.0+)?", text):
+        return "Negative"
+    if "neg" in text or "(-)" in text:
+        return "Negative"
+    if "pos" in text or "(+)" in text:
+        return "Positive"
+    if "equivocal" in text:
+        return "Equivocal"
+    return None
+
+
+def normalize_her2_ihc(value):
+    """IHC score '0', '1+', '2+', '3+' from free text such as 'Negative (1+)'."""
+    text = _text(value)
+    if not text or "no data" in text:
+        return None
+    match = re.search(r"(?<![\d.])([0-3])\s*\+?(?![\d.%])", text)
+    if not match:
+        return None
+    return "0" if match.group(1) == "0" else match.group(1) + "+"
+
+
+def normalize_her2(value, ihc=None):
+    status = normalize_receptor(value)
+    if status is None and isinstance(ihc, str):
+        status = {"0": "Negative", "1+": "Negative", "2+": "Equivocal", "3+": "Positive"}.get(ihc)
+    return status
+
+
+def normalize_ethnicity(value):
+    text = _text(value)
+    if not text or text in ("unknown", "n/a", "not reported"):
+        return "Unknown"
+    if "black" in text or "african" in text:
+        return "Black or African American"
+    if "hispanic" in text or "latin" in text:
+        return "Hispanic or Latino"
+    if "white" in text or "caucasian" in text:
+        return "White"
+    if any(word in text for word in ("asian", "vietnam", "chinese", "japanese", "korean", "indian", "filipino")):
+        return "Asian"
+    return "Other"
+
+
+def _numeric(series):
+    return pd.to_numeric(series, errors="coerce")
+
+
+def _column(df, name):
+    if name not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    # Sheets arrive compacted; the normalisers expect plain values.
+    return df[name].astype(object) if isinstance(df[name].dtype, pd.CategoricalDtype) else df[name]
+
+
+def _finish(vendor, df, sheet, **columns):
+    out = pd.DataFrame({name: values for name, values in columns.items()}, index=df.index)
+    out.insert(0, "vendor", vendor)
+    out["source_sheet"] = sheet
+    stages = out.pop("stage_raw").map(normalize_stage)
+    out["stage"] = stages.str[0]
+    out["stage_group"] = stages.str[1]
+    for col in CATALOG_COLUMNS:
+        if col not in out.columns:
+            out[col] = None
+    return out[CATALOG_COLUMNS]
+
+
+# -------------------------------------------------
+# Vendor adapters
+# -------------------------------------------------
+def _from_bioivt(frames):
+    parts = []
+    for sheet, df in frames.items():
+        ihc = _column(df, "Hercep Test").map(normalize_her2_ihc)
+        parts.append(_finish(
+            "BioIVT", df, sheet,
+            sample_id=_column(df, "Specimen ID").astype(str),
+            donor_id=_column(df, "Case ID").astype(str),
+            preservation=_column(df, "Format").map(normalize_preservation),
+            diagnosis=_column(df, "Biosample Diagnosis"),
+            stage_raw=_column(df, "AJCC/UICC Stage Group"),
+            grade=_column(df, "Tumor Grade").map(normalize_grade),
+            er=_column(df, "ER").map(normalize_receptor),
+            pr=_column(df, "PR").map(normalize_receptor),
+            her2_ihc=ihc,
+            her2=[normalize_her2(None, i) for i in ihc],
+            ethnicity=_column(df, "Ethnicity").map(normalize_ethnicity),
+            age=_numeric(_column(df, "Age At Excision")),
+            available=_column(df, "Sales Status").map(_text).isin(["available", "section only"]),
+            quantity=1,
+            price_usd=_numeric(_column(df, "Price USD\n(EA or per mL)")),
+        ))
+    return parts
+
+
+def _from_cureline(frames):
+    # The specimen-level sheet lists every block/vial; the case-level
+    # "inventory" sheet is a summary of the same cases, so only fall back
+    # to it when the specimen sheet is missing.
+    specimen = {s: df for s, df in frames.items() if "Cureline Specimen ID" in df.columns}
+    frames = specimen or frames
+    parts = []
+    for sheet, df in frames.items():
+        her2_raw = _column(df, "HER2 Receptor")
+        ihc = her2_raw.map(normalize_her2_ihc)
+        if "Cureline Specimen ID" in df.columns:
+            sample_id = df["Cureline Specimen ID"]
+            quantity = _numeric(_column(df, "# of Containers")).fillna(1)
+            available = _column(df, "Specimen Status").map(_text) != "reserved"
+        else:
+            sample_id = _column(df, "Cureline Case ID")
+            quantity = (_numeric(_column(df, "FFPE # of Blocks")).fillna(0)
+                        + _numeric(_column(df, "FF # of tissues")).fillna(0))
+            available = quantity > 0
+        parts.append(_finish(
+            "Cureline", df, sheet,
+            sample_id=sample_id.astype(str),
+            donor_id=_column(df, "Cureline Case ID").astype(str),
+            preservation=_column(df, "Specimen Format").map(normalize_preservation),
+            diagnosis=_column(df, "Path Diagnosis"),
+            stage_raw=_column(df, "Cancer Stage"),
+            grade=_column(df, "Tumor Grade").map(normalize_grade),
+            er=_column(df, "ER Receptor").map(normalize_receptor),
+            pr=_column(df, "PR Receptor").map(normalize_receptor),
+            her2_ihc=ihc,
+            her2=[normalize_her2(v, i) for v, i in zip(her2_raw, ihc)],
+            ethnicity=_column(df, "Patient Ethnicity").map(normalize_ethnicity),
+            age=_numeric(_column(df, "Patient Age")),
+            available=available,
+            quantity=quantity,
+        ))
+    return parts
+
+
+def _from_reprocell(frames):
+    parts = []
+    for sheet, df in frames.items():
+        # Aliquots of one donor are listed as "ID(1)", "ID(2)" and only the
+        # first row carries the clinical data.
+        donor = _column(df, "Sample ID").astype(str).str.replace(r"\(\d+\)$", "", regex=True)
+        df = df.groupby(donor).ffill().assign(_donor=donor)
+        ihc = _column(df, "Her2 IHC").map(normalize_her2_ihc)
+        er = "ER.1" if "ER.1" in df.columns else "ER"
+        pr = "PR.1" if "PR.1" in df.columns else "PR"
+        parts.append(_finish(
+            "Reprocell", df, sheet,
+            sample_id=_column(df, "Sample ID").astype(str),
+            donor_id=df["_donor"],
+            preservation=_column(df, "Sample type").map(normalize_preservation),
+            diagnosis=_column(df, "Histological diagnosis"),
+            stage_raw=_column(df, "Stage"),
+            grade=_column(df, "Grade").map(normalize_grade),
+            er=_column(df, er).map(normalize_receptor),
+            pr=_column(df, pr).map(normalize_receptor),
+            her2_ihc=ihc,
+            her2=[normalize_her2(v, i) for v, i in zip(_column(df, "Her2 FISH"), ihc)],
+            ethnicity=_column(df, "Ethnicity").map(normalize_ethnicity),
+            age=_numeric(_column(df, "Age")),
+            available=True,
+            quantity=1,
+        ))
+    return parts
+
+
+def _split_receptors(value):
+    # 'ER(Neg) / PR (Neg)' -> ('Negative', 'Negative')
+    text = str(value or "")
+    found = {}
+    for name in ("ER", "PR"):
+        match = re.search(rf"{name}\s*\(([^)]*)\)", text, re.IGNORECASE)
+        found[name] = normalize_receptor(match.group(1)) if match else None
+    return found["ER"], found["PR"]
+
+
+def _from_reprocell2(frames):
+    parts = []
+    for sheet, df in frames.items():
+        receptors = _column(df, "RECEPTORS").map(_split_receptors)
+        ihc = _column(df, "HER_2_NEU_IMMUNO").map(normalize_her2_ihc)
+        parts.append(_finish(
+            "Reprocell 2", df, sheet,
+            sample_id=_column(df, "Current_Label").astype(str),
+            donor_id=_column(df, "Sample_id").astype(str),
+            preservation=_column(df, "Mat Type").map(normalize_preservation),
+            diagnosis=_column(df, "Tissue Diag").astype(str).str.replace(r"\(BREAST\d+\)$", "", regex=True),
+            stage_raw=_column(df, "Cancer_Stage"),
+            er=receptors.str[0],
+            pr=receptors.str[1],
+            her2_ihc=ihc,
+            her2=[normalize_her2(v, i) for v, i in zip(_column(df, "HER_2_NEU_IMMUNO"), ihc)],
+            ethnicity=_column(df, "Ethnicity").map(normalize_ethnicity),
+            age=_numeric(_column(df, "age")),
+            available=True,
+            quantity=1,
+        ))
+    return parts
+
+
+ADAPTERS = {
+    "BioIVT": _from_bioivt,
+    "Cureline": _from_cureline,
+    "Reprocell": _from_reprocell,
+    "Reprocell 2": _from_reprocell2,
+}
+
+
+# -------------------------------------------------
+# Indexed catalog
+# -------------------------------------------------
+class TissueCatalog:
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        # {vendor: error} for stock files that could not be read.
+        self.skipped = df.attrs.get("skipped", {})
+        self._size = len(self.df)
+        self.index = {}
+        for facet in FACETS:
+            codes, values = pd.factorize(self.df[facet], use_na_sentinel=True)
+            self.index[facet] = {value: codes == i for i, value in enumerate(values)}
+        ages = self.df["age"].to_numpy(dtype=float)
+        self._age_order = np.argsort(ages, kind="stable")
+        self._ages_sorted = ages[self._age_order]
+
+    def __len__(self):
+        return self._size
+
+    def facet_values(self, facet):
+        return sorted(self.index[facet], key=str)
+
+    def _age_mask(self, low, high):
+        start = np.searchsorted(self._ages_sorted, low, side="left")
+        stop = np.searchsorted(self._ages_sorted, high, side="right")
+        mask = np.zeros(self._size, dtype=bool)
+        mask[self._age_order[start:stop]] = True
+        return mask
+
+    def mask(self, age=None, **facets):
+        """Bitmap of rows matching every given facet.
+
+        Each facet takes a value or a list of accepted values; ``age`` takes
+        an inclusive ``(low, high)`` range.
+        """
+        mask = np.ones(self._size, dtype=bool)
+        for facet, accepted in facets.items():
+            if accepted is None:
+                continue
+            if not isinstance(accepted, (list, tuple, set)):
+                accepted = [accepted]
+            bitmaps = self.index[facet]
+            selected = np.zeros(self._size, dtype=bool)
+            for value in accepted:
+                if value in bitmaps:
+                    selected |= bitmaps[value]
+            mask &= selected
+        if age is not None:
+            mask &= self._age_mask(*age)
+        return mask
+
+    def filter(self, age=None, **facets):
+        return self.df[self.mask(age=age, **facets)]
+
+
+def build_catalog(vendor_files=None):
+    """Normalise every available vendor file into one frame.
+
+    A file that cannot be read is left out; ``attrs["skipped"]`` maps its
+    vendor to the error.
+    """
+    vendor_files = VENDOR_FILES if vendor_files is None else vendor_files
+    parts, skipped = [], {}
+    for vendor, path in vendor_files.items():
+        if not Path(path).exists():
+            continue
+        try:
+            parts.extend(ADAPTERS[vendor](read_workbook(path)))
+        except Exception as e:
+            logger.warning("leaving %s out of the catalog: %s", path, e)
+            skipped[vendor] = f"{type(e).__name__}: {e}"
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        df = pd.DataFrame(columns=CATALOG_COLUMNS)
+        df.attrs["skipped"] = skipped
+        return df
+    df = pd.concat(parts, ignore_index=True)
+    for col in CATALOG_COLUMNS:
+        if col not in ("age", "available", "quantity", "price_usd"):
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+    for col in ("age", "quantity", "price_usd"):
+        df[col] = _numeric(df[col])
+    df["available"] = df["available"].astype(bool)
+    df.attrs["skipped"] = skipped
+    return compact(df, "catalog", categories=CATEGORIES)
+
+
+_catalog = {}
+_catalog_lock = threading.Lock()
+
+
+def load_catalog(vendor_files=None):
+    """Shared ``TissueCatalog``, rebuilt only when a vendor file changes."""
+    vendor_files = VENDOR_FILES if vendor_files is None else vendor_files
+    version = tuple(
+        (vendor, str(path), fingerprint(path) if Path(path).exists() else None)
+        for vendor, path in vendor_files.items()
+    )
+    with _catalog_lock:
+        if _catalog.get("version") != version:
+            _catalog["catalog"] = TissueCatalog(build_catalog(vendor_files))
+            _catalog["version"] = version
+        return _catalog["catalog"]
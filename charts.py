@@ -0,0 +1,96 @@
+"""Memoized, downsampled Plotly figures for the dashboard charts.
+
+Figures are cached against the version of the data they plot (a rollup
+version or a file fingerprint), so a rerun that did not change the data
+reuses the figure object. Line charts longer than ``MAX_POINTS`` are thinned
+with Largest-Triangle-Three-Buckets, which keeps the peaks and dips a plain
+stride would drop; markers are dropped and WebGL traces are used once a
+series gets dense. Zooming into an ``x_range`` re-slices the full-resolution
+series before downsampling, so detail comes back as the window narrows.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+import perf
+MAX_POINTS = 1000
+MARKER_LIMIT = 200
+WEBGL_THRESHOLD = 500
+MAX_FIGURES = 32
+
+_figures = OrderedDict()
+_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def cached_figure(key, build):
+    """The figure for ``key`` (which must include the data's version)."""
+    with _lock:
+        if key in _figures:
+            _figures.move_to_end(key)
+            stats["hits"] += 1
+            return _figures[key]
+    with perf.span("figure", str(key[0])):
+        fig = build()
+    with _lock:
+        stats["misses"] += 1
+        _figures[key] = fig
+        while len(_figures) > MAX_FIGURES:
+            _figures.popitem(last=False)
+    return fig
+
+
+def _numeric(values):
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype("int64").to_numpy(dtype=float)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float)
+    return np.arange(len(values), dtype=float)
+
+
+def lttb(x, y, threshold):
+    """Positions of the ``threshold`` points Largest-Triangle-Three-Buckets keeps.
+
+    ``x`` must be sorted. The first and last points are always kept; every
+    bucket in between contributes the point forming the largest triangle with
+    the previously kept point and the mean of the next bucket.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = _numeric(x)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[stop:next_stop].mean()
+        avg_y = y[stop:next_stop].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def line_figure(df, x, y, title, x_range=None, max_points=MAX_POINTS, **kwargs):
+    """``px.line`` over ``df``, restricted to ``x_range`` and downsampled."""
+    data = df.sort_values(x)
+    if x_range is not None:
+        lo, hi = x_range
+        if pd.api.types.is_datetime64_any_dtype(data[x]):
+            # A date range includes the whole of its last day.
+            lo, hi = pd.Timestamp(lo), pd.Timestamp(hi) + pd.Timedelta(days=1) - pd.Timedelta(1)
+        data = data[(data[x] >= lo) & (data[x] <= hi)]
+    total = len(data)
+    if total > max_points:
+        data = data.iloc[lttb(data[x], data[y], max_points)]
+        title = f"{title} ({len(data)} of {total} points)"
+    return px.line(data, x=x, y=y, title=title, markers=len(data) <= MARKER_LIMIT,
+                   render_mode="webgl" if len(data) > WEBGL_THRESHOLD else "auto", **kwargs)
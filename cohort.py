@@ -0,0 +1,123 @@
+"""Cohort selection over the cross-vendor tissue catalog.
+
+Pending requests ask for cohorts, not single samples: "matched FFPE and
+frozen tissue from 8 African American and 8 non-African American patients".
+``find_cohorts`` answers them from ``catalog.TissueCatalog``:
+
+1. the shared criteria (stage, receptor status, age range, availability) and
+   each arm's criteria (e.g. ethnicity) are bitmap masks over the catalog;
+2. the matching rows are grouped per donor (a donor id is only unique within
+   its vendor), keeping the cheapest sample of each preservation type; with
+   ``matched=True`` only donors with both an FFPE and a frozen sample remain;
+3. each arm takes its cheapest donors, without reusing a donor of an earlier
+   arm, once for every single vendor and once across all vendors.
+
+The candidate cohorts are returned best first: complete before short, fewer
+vendors before more (one shipment, one agreement), fewer samples without a
+listed price (they add nothing to the total, so it would flatter them), then
+cheapest.
+"""
+import numpy as np
+import pandas as pd
+
+PRESERVATIONS = ["FFPE", "Frozen"]
+SAMPLE_COLUMNS = ["arm", "vendor", "donor_id", "preservation", "sample_id", "ethnicity", "stage",
+                  "stage_group", "er", "pr", "her2", "age", "price_usd", "source_sheet"]
+
+
+def _donor_samples(catalog, mask, preservation, matched):
+    """Cheapest sample per donor and preservation type, and per-donor cost."""
+    rows = catalog.df.loc[mask, ["vendor", "donor_id", "preservation", "price_usd"]]
+    if preservation is not None:
+        rows = rows[rows["preservation"].isin(preservation)]
+    rows = rows[rows["preservation"].notna()]
+    cheapest = (
+        rows.assign(row=rows.index)
+        .sort_values("price_usd", na_position="last", kind="stable")
+        .drop_duplicates(["vendor", "donor_id", "preservation"])
+    )
+    if matched:
+        kinds = cheapest.groupby(["vendor", "donor_id"], observed=True)["preservation"].transform("nunique")
+        cheapest = cheapest[kinds.to_numpy() == len(PRESERVATIONS)]
+    else:
+        # One sample per donor: the cheapest of whichever types are accepted.
+        cheapest = cheapest.drop_duplicates(["vendor", "donor_id"])
+    donors = cheapest.assign(unpriced=cheapest["price_usd"].isna()).groupby(
+        ["vendor", "donor_id"], observed=True, as_index=False
+    ).agg(cost=("price_usd", "sum"), unpriced=("unpriced", "sum"), rows=("row", list))
+    donors["vendor"] = donors["vendor"].astype(str)
+    return donors.sort_values(["unpriced", "cost"], kind="stable", ignore_index=True)
+
+
+def _pick(arm_donors, vendors):
+    """Greedy cheapest donors per arm within ``vendors``, no donor twice."""
+    used = set()
+    picks, shortfall = [], {}
+    for name, count, donors in arm_donors:
+        pool = donors[donors["vendor"].isin(vendors)]
+        keys = list(zip(pool["vendor"], pool["donor_id"]))
+        free = np.fromiter((key not in used for key in keys), dtype=bool, count=len(keys))
+        chosen = pool[free].head(count)
+        used.update(zip(chosen["vendor"], chosen["donor_id"]))
+        picks.append(chosen.assign(arm=name))
+        if len(chosen) < count:
+            shortfall[name] = count - len(chosen)
+    return pd.concat(picks, ignore_index=True), shortfall
+
+
+def _cohort(catalog, picks, shortfall):
+    positions = [row for rows in picks["rows"] for row in rows]
+    arms = [arm for arm, rows in zip(picks["arm"], picks["rows"]) for _ in rows]
+    samples = catalog.df.loc[positions].assign(arm=arms)[SAMPLE_COLUMNS].reset_index(drop=True)
+    return {
+        "vendors": sorted(picks["vendor"].unique()),
+        "donors": len(picks),
+        "total_cost": float(picks["cost"].sum()),
+        "unpriced": int(picks["unpriced"].sum()),
+        "feasible": not shortfall,
+        "shortfall": shortfall,
+        "samples": samples,
+    }
+
+
+def find_cohorts(catalog, arms, matched=False, preservation=None, age=None, available=True, max_results=5,
+                 **facets):
+    """Candidate cohorts for ``arms``, best first.
+
+    ``arms`` is a list of ``(name, donor count, {facet: accepted values})``.
+    ``preservation`` restricts the sample types when not ``matched``;
+    ``age`` is an inclusive range and ``facets`` are shared catalog facets
+    (e.g. ``stage_group=["II", "III"]``).
+
+    Each cohort is a dict with its ``vendors``, ``total_cost``, ``unpriced``
+    donor-samples, ``feasible``, per-arm ``shortfall`` and the ``samples``
+    frame (one row per sample, labelled with its arm).
+    """
+    if matched:
+        preservation = None
+    elif isinstance(preservation, str):
+        preservation = [preservation]
+    base = catalog.mask(age=age, available=available or None, **facets)
+    arm_donors = [
+        (name, count, _donor_samples(catalog, base & catalog.mask(**criteria), preservation, matched))
+        for name, count, criteria in arms
+    ]
+    vendors = sorted({v for _, _, donors in arm_donors for v in donors["vendor"]})
+    options = [[vendor] for vendor in vendors] + ([vendors] if len(vendors) > 1 else [])
+
+    cohorts = []
+    for option in options:
+        picks, shortfall = _pick(arm_donors, option)
+        if len(picks):
+            cohorts.append(_cohort(catalog, picks, shortfall))
+    if not cohorts:
+        return []
+    # The all-vendor option can duplicate a single-vendor one; keep the latter.
+    unique = {}
+    for cohort in cohorts:
+        key = tuple(sorted(map(tuple, cohort["samples"][["vendor", "sample_id"]].astype(str).to_numpy())))
+        unique.setdefault(key, cohort)
+    ranked = sorted(unique.values(), key=lambda c: (
+        sum(c["shortfall"].values()), len(c["vendors"]), c["unpriced"], c["total_cost"]
+    ))
+    return ranked[:max_results]
@@ -0,0 +1,324 @@
+"""Shared loading layer for the workbooks the dashboard reads.
+
+Every Streamlit rerun used to call ``pd.read_excel`` from scratch. Frames are
+now keyed on (path, sheet, read options) and validated against the file's
+mtime and size, so a workbook is only re-parsed when it actually changed.
+Parsed frames are kept in a bounded in-memory LRU and written to a Parquet
+sidecar under ``.cache/`` so a fresh server process can skip the XML parse too.
+
+Concurrent loads of the same read share one parse: the first caller parses
+and the others wait for its frame. A file a warm-start worker process is
+parsing (``expect``) is waited for the same way, until its frames are
+published here.
+
+Frames are compacted once, right after the parse (``compact``): repetitive
+text columns become categoricals, lossless numeric downcasts are applied and
+columns holding only dates become datetimes. ``memory_report`` lists each
+table's footprint before and after.
+
+xlsx files are parsed with the Rust-backed calamine reader when
+``python-calamine`` is installed, and with openpyxl otherwise.
+"""
+import datetime
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
+CACHE_DIR = Path(".cache")
+MAX_ENTRIES = 32
+# Bumped when the stored representation changes, so old sidecars are re-parsed.
+SIDECAR_FORMAT = 2
+# Longest a load waits for another process to publish a file's frames
+# before parsing it itself.
+EXPECT_TIMEOUT = 120
+# Text columns with no more distinct values than this share of their rows
+# become categorical.
+CATEGORY_MAX_RATIO = 0.5
+# pandas engine for xlsx files; calamine parses several times faster.
+EXCEL_ENGINE = "openpyxl" if python_calamine is None else "calamine"
+
+
+def fingerprint(path):
+    """Cheap change detector for a file: (mtime in ns, size in bytes)."""
+    stat = Path(path).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _digest(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:12]
+
+
+def normalize_mixed_columns(df):
+    # Vendor sheets mix ints and strings in ID columns (e.g. catalog numbers
+    # '09D4103' next to 602562). Arrow cannot store those, so cast the
+    # non-null values of such columns to str. This runs on every fresh parse,
+    # so memory and sidecar reads always agree.
+    for col in df.columns[df.dtypes == object]:
+        values = df[col].dropna()
+        if values.map(type).nunique() > 1:
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v)).astype(object)
+    return df
+
+
+# -------------------------------------------------
+# Compact in-memory representation
+# -------------------------------------------------
+footprints = {}
+_footprints_lock = threading.Lock()
+
+
+def _is_date(value):
+    return isinstance(value, (datetime.date, pd.Timestamp))
+
+
+def _compact_column(s, categories=None):
+    if categories is not None:
+        return s.astype(pd.CategoricalDtype(categories))
+    if pd.api.types.is_float_dtype(s.dtype) and s.dtype.itemsize > 4:
+        values = s.to_numpy()
+        narrow = values.astype(np.float32)
+        if np.array_equal(narrow.astype(values.dtype), values, equal_nan=True):
+            return pd.Series(narrow, index=s.index, name=s.name)
+        return s
+    if pd.api.types.is_integer_dtype(s.dtype) and s.dtype.itemsize > 4 and len(s):
+        # Never below 32 bits: adding two int8 counts would overflow silently.
+        if np.iinfo(np.int32).min <= s.min() and s.max() <= np.iinfo(np.int32).max:
+            return s.astype(np.int32)
+        return s
+    if not (s.dtype == object or pd.api.types.is_string_dtype(s.dtype)):
+        return s
+    values = s.dropna()
+    if len(values) and s.dtype == object and values.map(_is_date).all():
+        return pd.to_datetime(s)
+    if not len(values) or not values.map(type).eq(str).all():
+        return s
+    if values.nunique() > CATEGORY_MAX_RATIO * len(values):
+        return s
+    compacted = s.astype("category")
+    if compacted.memory_usage(deep=True) < s.memory_usage(deep=True):
+        return compacted
+    return s
+
+
+def compact(df, name=None, categories=None):
+    """``df`` with categorical text, downcast numbers and parsed dates.
+
+    ``categories`` maps columns to a fixed category list, for a dictionary
+    shared by frames built from different sources. With ``name``, the
+    before/after footprint is recorded for ``memory_report``.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    df = df.copy(deep=False)
+    categories = categories or {}
+    for i, col in enumerate(df.columns):
+        df.isetitem(i, _compact_column(df.iloc[:, i], categories.get(col)))
+    if name is not None:
+        record_footprint(name, df, before)
+    return df
+
+
+def record_footprint(name, df, before=None):
+    """Note ``df``'s in-memory size as table ``name`` (``before`` compaction)."""
+    after = int(df.memory_usage(deep=True).sum())
+    with _footprints_lock:
+        if before is None and name in footprints:
+            before = footprints[name]["before"]
+        footprints[name] = {"rows": len(df), "before": before, "after": after}
+
+
+def memory_report():
+    """Per-table memory before and after compaction, largest first (MB)."""
+    with _footprints_lock:
+        rows = [{"table": name, **entry} for name, entry in footprints.items()]
+    if not rows:
+        return pd.DataFrame(columns=["table", "rows", "before_mb", "after_mb", "saved_pct"])
+    df = pd.DataFrame(rows)
+    before = pd.to_numeric(df.pop("before"), errors="coerce")
+    after = df.pop("after")
+    df["before_mb"] = (before / 2**20).round(2)
+    df["after_mb"] = (after / 2**20).round(2)
+    df["saved_pct"] = ((1 - after / before) * 100).round(1)
+    return df.sort_values("after_mb", ascending=False, ignore_index=True)
+
+
+class WorkbookCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=MAX_ENTRIES):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        # key -> (fingerprint, Future) of a load running in this process.
+        self._inflight = {}
+        # resolved path -> Future settled once another process's frames are published.
+        self._expected = {}
+        self.stats = {"memory": 0, "sidecar": 0, "parsed": 0}
+
+    def _sidecar(self, path, key, fp):
+        prefix = f"{path.stem}-{_digest(*key)}"
+        return self.cache_dir / f"{prefix}-{_digest(*fp, SIDECAR_FORMAT)}.parquet", prefix
+
+    def _read_sidecar(self, sidecar):
+        try:
+            return pd.read_parquet(sidecar)
+        except Exception:
+            return None
+
+    def _write_sidecar(self, df, sidecar, prefix):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = sidecar.with_suffix(".tmp")
+            df.to_parquet(tmp, index=False)
+            tmp.replace(sidecar)
+        except Exception:
+            # A sidecar is an optimisation only; never fail a load over it.
+            return
+        for stale in self.cache_dir.glob(f"{prefix}-*.parquet"):
+            if stale != sidecar:
+                stale.unlink(missing_ok=True)
+
+    def load(self, path, key, parse):
+        """Return the frame ``parse()`` builds from ``path``, re-running it only
+        when the file changed. ``key`` identifies the read within the file.
+
+        Returns a copy, so callers may mutate the frame freely.
+        """
+        path = Path(path).resolve()
+        self.wait(path)
+        key = (str(path),) + tuple(key)
+        fp = fingerprint(path)
+
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is not None and entry[0] == fp:
+                self._frames.move_to_end(key)
+                self.stats["memory"] += 1
+                return entry[1].copy()
+            running = self._inflight.get(key)
+            if running is None or running[0] != fp:
+                future = Future()
+                self._inflight[key] = (fp, future)
+                running = None
+        if running is not None:
+            return running[1].result().copy()
+
+        try:
+            df, source = self._load(path, key, fp, parse)
+        except BaseException as e:
+            with self._lock:
+                self._finish(key, future)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._finish(key, future)
+            self.stats[source] += 1
+            self._frames[key] = (fp, df)
+            self._frames.move_to_end(key)
+            while len(self._frames) > self.max_entries:
+                self._frames.popitem(last=False)
+        future.set_result(df)
+        return df.copy()
+
+    def _finish(self, key, future):
+        # A load for a newer version of the file may have replaced ours.
+        if self._inflight.get(key, (None, None))[1] is future:
+            del self._inflight[key]
+
+    def _load(self, path, key, fp, parse):
+        sidecar, prefix = self._sidecar(path, key, fp)
+        name = f"{path.name} [{key[2]}]"
+        df = self._read_sidecar(sidecar) if sidecar.exists() else None
+        if df is not None:
+            record_footprint(name, df, df.attrs.get("uncompacted_bytes"))
+            return df, "sidecar"
+        raw = normalize_mixed_columns(parse())
+        df = compact(raw, name)
+        # Kept with the sidecar, so a warm start can still report it.
+        df.attrs["uncompacted_bytes"] = footprints[name]["before"]
+        self._write_sidecar(df, sidecar, prefix)
+        return df, "parsed"
+
+    def expect(self, path):
+        """Note that another process is parsing ``path``: loads of it wait
+        (up to ``EXPECT_TIMEOUT``) for ``settle(path)`` instead of parsing it
+        again. Every ``expect`` must be followed by a ``settle``."""
+        with self._lock:
+            self._expected.setdefault(str(Path(path).resolve()), Future())
+
+    def settle(self, path):
+        """Release the loads waiting on ``path`` (after ``publish``, or when
+        the other process gave up on it)."""
+        with self._lock:
+            future = self._expected.pop(str(Path(path).resolve()), None)
+        if future is not None:
+            future.set_result(None)
+
+    def wait(self, path, timeout=EXPECT_TIMEOUT):
+        """Block while ``path`` is expected from another process."""
+        with self._lock:
+            future = self._expected.get(str(Path(path).resolve()))
+        if future is not None:
+            try:
+                future.result(timeout)
+            except TimeoutError:
+                pass
+
+    def has_sidecars(self, path):
+        """Whether ``path`` has Parquet sidecars for its current contents, so
+        loading it skips the xlsx parse."""
+        path = Path(path).resolve()
+        current = _digest(*fingerprint(path), SIDECAR_FORMAT)
+        return any(self.cache_dir.glob(f"{path.stem}-*-{current}.parquet"))
+
+    def read_excel(self, path, sheet_name=0, **kwargs):
+        """Drop-in for ``pd.read_excel`` that only re-parses changed files."""
+        key = ("read_excel", sheet_name, tuple(sorted(kwargs.items())))
+        options = {"engine": EXCEL_ENGINE, **kwargs}
+        return self.load(path, key, lambda: pd.read_excel(path, sheet_name=sheet_name, **options))
+
+    def export(self, path):
+        """The cached frames of ``path`` as ``(key, fingerprint, frame)``
+        entries, to ``publish`` in another process."""
+        resolved = str(Path(path).resolve())
+        with self._lock:
+            return [(key, fp, df) for key, (fp, df) in self._frames.items() if key[0] == resolved]
+
+    def publish(self, entries):
+        """Adopt frames parsed in another process (see ``export``). An entry
+        whose file has changed since is re-parsed on its next load."""
+        with self._lock:
+            for key, fp, df in entries:
+                self._frames[key] = (fp, df)
+                self._frames.move_to_end(key)
+            while len(self._frames) > self.max_entries:
+                self._frames.popitem(last=False)
+        for key, _, df in entries:
+            record_footprint(f"{Path(key[0]).name} [{key[2]}]", df, df.attrs.get("uncompacted_bytes"))
+
+    def invalidate(self, path=None):
+        """Forget cached frames for ``path``, or everything when omitted."""
+        with self._lock:
+            if path is None:
+                self._frames.clear()
+                return
+            resolved = str(Path(path).resolve())
+            for key in [k for k in self._frames if k[0] == resolved]:
+                del self._frames[key]
+
+
+# Module state survives Streamlit reruns, so this instance is shared by every
+# session served from the same process.
+workbooks = WorkbookCache()
+
+
+def read_excel(path, sheet_name=0, **kwargs):
+    return workbooks.read_excel(path, sheet_name=sheet_name, **kwargs)
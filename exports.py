@@ -0,0 +1,131 @@
+"""On-demand, memoized Excel exports for the dashboard's download buttons.
+
+Nothing here runs during a normal rerun: ``lazy`` wraps an export so that
+``st.download_button`` only builds the bytes when someone clicks it. Results
+are memoized against the version of the data they were built from, so a
+second click (or a second user) gets the cached bytes.
+"""
+import threading
+import zipfile
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+import xlsxwriter
+
+import perf
+from data_cache import fingerprint
+from ingest import read_workbook
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_MIME = "application/zip"
+MAX_EXPORTS = 16
+
+_exports = OrderedDict()
+_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def _memoized(key, build):
+    with _lock:
+        if key in _exports:
+            _exports.move_to_end(key)
+            stats["hits"] += 1
+            return _exports[key]
+    data = build()
+    with _lock:
+        stats["misses"] += 1
+        _exports[key] = data
+        while len(_exports) > MAX_EXPORTS:
+            _exports.popitem(last=False)
+    return data
+
+
+def lazy(export, *args, **kwargs):
+    """Defer ``export(*args, **kwargs)`` until a download button is clicked."""
+    export = perf.timed("export", export.__name__, export)
+    return lambda: export(*args, **kwargs)
+
+
+def frame_version(df):
+    """Content hash of a frame, for data that has no file behind it."""
+    hashed = pd.util.hash_pandas_object(df.astype(str), index=False)
+    return (tuple(map(str, df.columns)), int(hashed.sum()), len(df))
+
+
+def _write_sheet(workbook, sheet_name, df):
+    worksheet = workbook.add_worksheet(sheet_name[:31])
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+    worksheet.write_row(0, 0, [str(c) for c in df.columns])
+    for col, dtype in enumerate(df.dtypes):
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            worksheet.set_column(col, col, 12, date_format)
+    # constant_memory mode flushes each row once the next one starts, so rows
+    # must be written strictly in order; nulls become empty cells.
+    values = df.astype(object).where(df.notna(), None)
+    for row, record in enumerate(values.itertuples(index=False, name=None), start=1):
+        worksheet.write_row(row, 0, record)
+
+
+def write_xlsx(sheets):
+    """Stream ``{sheet name: frame}`` into xlsx bytes in constant memory."""
+    buffer = BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {"constant_memory": True})
+    for sheet_name, df in sheets.items():
+        _write_sheet(workbook, sheet_name, df)
+    workbook.close()
+    return buffer.getvalue()
+
+
+def xlsx_bytes(df, sheet_name="Sheet1", version=None):
+    """Export a single frame, memoized on ``version`` (content hash by default)."""
+    if version is None:
+        version = frame_version(df)
+    return _memoized(("xlsx", sheet_name, version), lambda: write_xlsx({sheet_name: df}))
+
+
+def file_bytes(path):
+    """Original bytes of an unmodified file, memoized on its mtime/size."""
+    path = Path(path)
+    return _memoized(("file", str(path.resolve()), fingerprint(path)), path.read_bytes)
+
+
+def _bundle_version(paths):
+    return tuple((name, str(Path(p).resolve()), fingerprint(p)) for name, p in paths.items())
+
+
+def vendor_bundle_xlsx(paths):
+    """One workbook with a sheet per vendor stock sheet (``{label: path}``).
+
+    Files that cannot be read are left out.
+    """
+    existing = {name: p for name, p in paths.items() if Path(p).exists()}
+
+    def build():
+        sheets = {}
+        for name, p in existing.items():
+            try:
+                frames = read_workbook(p)
+            except Exception:
+                continue
+            for sheet_name, df in frames.items():
+                title = name if len(frames) == 1 else f"{name} - {sheet_name}"
+                sheets[title[:31]] = df
+        return write_xlsx(sheets)
+
+    return _memoized(("bundle-xlsx", _bundle_version(existing)), build)
+
+
+def vendor_bundle_zip(paths):
+    """Zip of the original vendor files, exactly as they were delivered."""
+    existing = {name: p for name, p in paths.items() if Path(p).exists()}
+
+    def build():
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for p in existing.values():
+                archive.write(p, arcname=Path(p).name)
+        return buffer.getvalue()
+
+    return _memoized(("bundle-zip", _bundle_version(existing)), build)
@@ -0,0 +1,237 @@
+"""Streaming, multi-sheet ingestion of vendor stock workbooks.
+
+Vendor exports are not tidy tables: BioIVT puts a "Search Results / Output
+Date" preamble above the real header and spreads stock over several sheets,
+and Cureline ships a large second sheet. ``pd.read_excel`` only sees sheet 0
+with the header on row 1. Here every sheet is streamed in openpyxl's
+read-only mode, the header row is detected from the first rows, and data rows
+are yielded in fixed-size chunks so peak memory does not grow with the file.
+When calamine is available (``data_cache.EXCEL_ENGINE``) rows come from its
+row iterator instead, which is much faster than openpyxl's stream. calamine
+keeps the sheet's cells in native memory while Python values are built one
+row at a time, so files above ``CALAMINE_MAX_BYTES`` are still streamed.
+"""
+import datetime
+import re
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+
+from data_cache import EXCEL_ENGINE, fingerprint, python_calamine, workbooks
+
+CHUNK_SIZE = 500
+# Larger workbooks are streamed with openpyxl to keep memory flat.
+CALAMINE_MAX_BYTES = 64 * 2**20
+HEADER_SCAN_ROWS = 50
+# Sheets whose widest row has fewer labelled cells than this (glossaries,
+# legends) are not stock tables and are skipped.
+MIN_HEADER_CELLS = 5
+
+_snapshot_infos = {}
+_OUTPUT_DATE = re.compile(r"Output Date:\s*([0-9/.\-]+)", re.IGNORECASE)
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _clean(value):
+    return None if _blank(value) else value
+
+
+def _header_score(row):
+    labels = [v for v in row if not _blank(v)]
+    if not labels or not all(isinstance(v, str) for v in labels):
+        return 0
+    return len(labels)
+
+
+def _column_names(row):
+    # Same conventions as pd.read_excel: blank headers become "Unnamed: i",
+    # repeated headers get a ".1", ".2" suffix.
+    last = max(i for i, v in enumerate(row) if not _blank(v))
+    names, seen = [], {}
+    for i, value in enumerate(row[:last + 1]):
+        name = f"Unnamed: {i}" if _blank(value) else str(value).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _is_section_row(row, columns):
+    # BioIVT splits a sheet into sections ("Tumor only", "whole blocks", ...)
+    # that each repeat the header; neither kind of row is a sample.
+    filled = [v for v in row if v is not None]
+    if [str(v).strip() for v in filled] == columns[:len(filled)] and len(filled) >= MIN_HEADER_CELLS:
+        return True
+    return len(filled) < MIN_HEADER_CELLS and all(isinstance(v, str) for v in filled)
+
+
+def _output_date(preamble):
+    for row in preamble:
+        for value in row:
+            match = _OUTPUT_DATE.search(value) if isinstance(value, str) else None
+            if match:
+                date = pd.to_datetime(match.group(1), errors="coerce")
+                # Kept as ISO text so frame.attrs stays JSON-serialisable.
+                return None if pd.isna(date) else date.date().isoformat()
+    return None
+
+
+def _open(path):
+    return openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+
+def _calamine_value(value):
+    # calamine reports every number as float and date cells as dates;
+    # openpyxl gives ints for whole numbers and datetimes.
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if type(value) is datetime.date:
+        return datetime.datetime.combine(value, datetime.time())
+    return value
+
+
+def _sheet_rows(path, sheet_name):
+    """Cell values of each row of a sheet, blank cells as None or ""."""
+    if EXCEL_ENGINE == "calamine" and Path(path).stat().st_size <= CALAMINE_MAX_BYTES:
+        sheet = python_calamine.CalamineWorkbook.from_path(str(path)).get_sheet_by_name(sheet_name)
+        for row in sheet.iter_rows():
+            yield [_calamine_value(v) for v in row]
+        return
+    wb = _open(path)
+    try:
+        yield from wb[sheet_name].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _scan_sheet(rows):
+    """Read the first rows of a sheet and locate its header.
+
+    Returns ``(meta, head)`` where ``head`` holds the rows consumed so far;
+    ``meta`` is None when the sheet has no table.
+    """
+    head = []
+    for row in rows:
+        head.append(row)
+        if len(head) >= HEADER_SCAN_ROWS:
+            break
+    scores = [_header_score(r) for r in head]
+    if not scores or max(scores) < MIN_HEADER_CELLS:
+        return None, head
+    best = max(scores)
+    header_row = next(i for i, s in enumerate(scores) if s >= 0.8 * best)
+    preamble = [[str(v) for v in r if not _blank(v)] for r in head[:header_row]]
+    meta = {
+        "header_row": header_row,
+        "preamble": [r for r in preamble if r],
+        "output_date": _output_date(head[:header_row]),
+    }
+    return meta, head
+
+
+def iter_sheet_chunks(path, sheet_name, chunk_size=CHUNK_SIZE):
+    """Yield DataFrame chunks of one sheet's data rows below its real header.
+
+    Chunks hold object columns: a column can be blank for a whole chunk, and
+    its type is only known once the chunks are put together (``read_sheet``).
+    """
+    rows = _sheet_rows(path, sheet_name)
+    try:
+        meta, head = _scan_sheet(rows)
+        if meta is None:
+            return
+        columns = _column_names(head[meta["header_row"]])
+        width = len(columns)
+
+        def records():
+            for row in head[meta["header_row"] + 1:]:
+                yield row
+            yield from rows
+
+        chunk = []
+        for row in records():
+            row = [_clean(v) for v in row[:width]]
+            if all(v is None for v in row) or _is_section_row(row, columns):
+                continue
+            chunk.append(row + [None] * (width - len(row)))
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=columns, dtype=object)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns, dtype=object)
+    finally:
+        rows.close()
+
+
+def snapshot_info(path):
+    """Per-sheet header position and vendor snapshot metadata.
+
+    Returns ``{sheet name: {"header_row", "preamble", "output_date"}}`` for
+    every sheet that holds a table; only the first rows of each are read.
+    """
+    workbooks.wait(path)
+    resolved, fp = str(Path(path).resolve()), fingerprint(path)
+    cached = _snapshot_infos.get(resolved)
+    if cached is not None and cached[0] == fp:
+        return cached[1]
+    wb = _open(path)
+    try:
+        info = {}
+        for ws in wb.worksheets:
+            meta, _ = _scan_sheet(ws.iter_rows(values_only=True))
+            if meta is not None:
+                info[ws.title] = meta
+    finally:
+        wb.close()
+    _snapshot_infos[resolved] = (fp, info)
+    return info
+
+
+def export_snapshot_info(path):
+    """``snapshot_info``'s cached scan of ``path``, to publish in another process."""
+    resolved = str(Path(path).resolve())
+    return {resolved: _snapshot_infos[resolved]} if resolved in _snapshot_infos else {}
+
+
+def publish_snapshot_info(entries):
+    """Adopt scans made in another process (see ``export_snapshot_info``)."""
+    _snapshot_infos.update(entries)
+
+
+def read_sheet(path, sheet_name, chunk_size=CHUNK_SIZE):
+    """Full table of one sheet, cached on the file's mtime/size."""
+    def parse():
+        chunks = list(iter_sheet_chunks(path, sheet_name, chunk_size))
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True).infer_objects()
+
+    return workbooks.load(path, ("stream", sheet_name), parse)
+
+
+def read_workbook(path):
+    """``{sheet name: frame}`` for every table-bearing sheet of a workbook.
+
+    Each frame's ``attrs["snapshot"]`` carries the sheet's preamble metadata,
+    including the vendor "Output Date" when present.
+    """
+    frames = {}
+    for sheet_name, meta in snapshot_info(path).items():
+        df = read_sheet(path, sheet_name)
+        df.attrs["snapshot"] = meta
+        frames[sheet_name] = df
+    return frames
+
+
+def snapshot_date(frames):
+    """Latest vendor "Output Date" across a workbook's sheets, if any."""
+    dates = [df.attrs.get("snapshot", {}).get("output_date") for df in frames.values()]
+    dates = [d for d in dates if d]
+    return pd.Timestamp(max(dates)) if dates else None
@@ -0,0 +1,217 @@
+"""Bulk QR label generation for supply lots and FFPE blocks.
+
+Supply labels encode ``CAT:<catalog>|LOT:<lot>|LOC:<location>`` (the format
+``scanner.parse_payload`` reads back); FFPE block labels encode
+``FFPE:<block id>|TYPE:<cancer type>``. Each label image is cached by its
+payload, in a bounded in-memory LRU and as a PNG under ``.cache/labels/``,
+so reprinting an unchanged label costs nothing. Missing labels are rendered
+in parallel on a process pool and assembled into a printable multi-page PDF
+sheet or a zip.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+LABEL_CACHE_DIR = Path(".cache") / "labels"
+# Label images kept in memory (a few KB each); older ones are re-read from disk.
+MAX_IMAGES = 4096
+LABEL_SIZE = (600, 720)
+PAGE_SIZE = (2550, 3300)  # US letter at 300 dpi
+PAGE_MARGIN = 75
+SHEET_COLUMNS = 4
+SHEET_ROWS = 4
+# Below this many missing labels a process pool costs more than it saves.
+PARALLEL_THRESHOLD = 32
+
+FFPE_ID_COLUMNS = ["Block ID", "Sample ID", "Block", "ID"]
+
+logger = logging.getLogger("dashboard.labels")
+
+
+def _present(value):
+    return value is not None and not (not isinstance(value, str) and pd.isna(value)) and str(value) != ""
+
+
+def supply_labels(inventory):
+    """``(payload, caption)`` for every in-stock supply lot."""
+    items = []
+    stock = inventory.df[inventory.df["in_stock"]]
+    for row in stock.itertuples(index=False):
+        parts = [f"CAT:{row.catalog_no}"] if _present(row.catalog_no) else []
+        if _present(row.lot):
+            parts.append(f"LOT:{row.lot}")
+        if _present(row.location):
+            parts.append(f"LOC:{row.location}")
+        if not parts:
+            continue
+        caption = "\n".join(str(v) for v in (str(row.item)[:40], row.catalog_no, row.lot, row.location)
+                            if _present(v))
+        items.append(("|".join(parts), caption))
+    return items
+
+
+def ffpe_labels(repo_df):
+    """``(payload, caption)`` for every block in the FFPE repository sheet."""
+    id_column = next((c for c in FFPE_ID_COLUMNS if c in repo_df.columns), None)
+    items = []
+    for position, row in enumerate(repo_df.to_dict("records"), start=1):
+        block = row[id_column] if id_column and _present(row[id_column]) else f"ROW{position}"
+        cancer_type = row.get("Cancer Type")
+        payload = f"FFPE:{block}" + (f"|TYPE:{cancer_type}" if _present(cancer_type) else "")
+        caption = "\n".join(str(v) for v in (block, cancer_type) if _present(v))
+        items.append((payload, caption))
+    return items
+
+
+def render_label(item):
+    """PNG bytes of one label: the QR code with its caption underneath."""
+    payload, caption = item
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=10, border=2)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    code = qr.make_image(fill_color="black", back_color="white").get_image().convert("L")
+    width, height = LABEL_SIZE
+    side = min(width, height - 160)
+    code = code.resize((side, side), Image.NEAREST)
+
+    label = Image.new("L", LABEL_SIZE, 255)
+    label.paste(code, ((width - side) // 2, 0))
+    draw = ImageDraw.Draw(label)
+    font = ImageFont.load_default(size=28)
+    draw.multiline_text((width // 2, side + 8), caption, fill=0, font=font, anchor="ma", align="center")
+    buffer = BytesIO()
+    label.convert("1").save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _render_all(items, workers=None):
+    if len(items) < PARALLEL_THRESHOLD:
+        return [render_label(item) for item in items]
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(items) // (workers * 4))
+    try:
+        # "spawn", as in prefetch: forking the threaded Streamlit server can
+        # deadlock the child on a lock held by another thread.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            return list(pool.map(render_label, items, chunksize=chunksize))
+    except (OSError, BrokenProcessPool) as e:
+        logger.warning("process pool unavailable (%s); rendering labels in this process", e)
+        return [render_label(item) for item in items]
+
+
+def _key(item):
+    return hashlib.sha1("\x00".join(item).encode()).hexdigest()
+
+
+class LabelCache:
+    def __init__(self, cache_dir=LABEL_CACHE_DIR, max_images=MAX_IMAGES):
+        self.cache_dir = Path(cache_dir)
+        self.max_images = max_images
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory": 0, "disk": 0, "rendered": 0}
+
+    def _from_disk(self, key):
+        path = self.cache_dir / f"{key}.png"
+        return path.read_bytes() if path.exists() else None
+
+    def _to_disk(self, key, data):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / f"{key}.png").write_bytes(data)
+        except OSError:
+            pass
+
+    def get_many(self, items, workers=None):
+        """PNG bytes for every ``(payload, caption)``, in order."""
+        keys = [_key(item) for item in items]
+        images = {}
+        missing, queued = [], set()
+        with self._lock:
+            for key, item in zip(keys, items):
+                if key in self._images:
+                    self._images.move_to_end(key)
+                    images[key] = self._images[key]
+                    self.stats["memory"] += 1
+        for key, item in zip(keys, items):
+            if key in images:
+                continue
+            data = self._from_disk(key)
+            if data is not None:
+                images[key] = data
+                self.stats["disk"] += 1
+            elif key not in queued:
+                queued.add(key)
+                missing.append((key, item))
+
+        if missing:
+            rendered = _render_all([item for _, item in missing], workers)
+            for (key, _), data in zip(missing, rendered):
+                images[key] = data
+                self._to_disk(key, data)
+            self.stats["rendered"] += len(missing)
+
+        with self._lock:
+            for key in keys:
+                self._images[key] = images[key]
+                self._images.move_to_end(key)
+            while len(self._images) > self.max_images:
+                self._images.popitem(last=False)
+        return [images[key] for key in keys]
+
+
+# Shared across sessions like the workbook cache.
+label_cache = LabelCache()
+
+
+def _pages(images, columns=SHEET_COLUMNS, rows=SHEET_ROWS):
+    per_page = columns * rows
+    cell_w = (PAGE_SIZE[0] - 2 * PAGE_MARGIN) // columns
+    cell_h = (PAGE_SIZE[1] - 2 * PAGE_MARGIN) // rows
+    for start in range(0, len(images), per_page):
+        page = Image.new("1", PAGE_SIZE, 1)
+        for i, data in enumerate(images[start:start + per_page]):
+            label = Image.open(BytesIO(data))
+            label.thumbnail((cell_w, cell_h))
+            x = PAGE_MARGIN + (i % columns) * cell_w + (cell_w - label.width) // 2
+            y = PAGE_MARGIN + (i // columns) * cell_h + (cell_h - label.height) // 2
+            page.paste(label, (x, y))
+        yield page
+
+
+def label_sheet_pdf(items, cache=label_cache):
+    """Printable multi-page PDF (letter, 4x4 labels per page)."""
+    if not items:
+        return b""
+    pages = _pages(cache.get_many(items))
+    first = next(pages)
+    buffer = BytesIO()
+    first.save(buffer, format="PDF", resolution=300, save_all=True, append_images=pages)
+    return buffer.getvalue()
+
+
+def labels_zip(items, cache=label_cache):
+    """Zip with one PNG per distinct label, named after its payload."""
+    buffer = BytesIO()
+    written = set()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for (payload, _), data in zip(items, cache.get_many(items)):
+            name = "".join(c if c.isalnum() or c in "-_." else "_" for c in payload)[:120]
+            if name in written:
+                continue
+            written.add(name)
+            archive.writestr(f"{name}.png", data)
+    return buffer.getvalue()
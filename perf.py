@@ -0,0 +1,240 @@
+"""Opt-in timing instrumentation for the dashboard.
+
+Set ``DASHBOARD_PERF=1`` to record every instrumented stage (load, transform,
+figure, render, export) of every rerun: wall time, peak resident memory and
+the cache hits and misses it caused. Each record is written as one JSON line
+to ``DASHBOARD_PERF_LOG`` (default ``.cache/perf.jsonl``) and kept in a
+bounded in-process buffer that the admin sidebar panel summarises as
+percentiles across recent sessions.
+
+When it is off, ``span`` returns a shared no-op context manager, so the
+instrumented code pays for one function call and nothing else.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import deque
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ENABLED = os.environ.get("DASHBOARD_PERF", "").lower() in ("1", "true", "yes", "on")
+LOG_PATH = Path(os.environ.get("DASHBOARD_PERF_LOG", Path(".cache") / "perf.jsonl"))
+MAX_RECORDS = 5000
+
+_NOOP = nullcontext()
+_local = threading.local()
+records = deque(maxlen=MAX_RECORDS)
+logger = logging.getLogger("dashboard.perf")
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return None
+
+
+class PeakMemory:
+    """Peak resident memory while the block runs, sampled every few ms.
+
+    Falls back to tracemalloc (Python allocations only) where /proc is not
+    available.
+    """
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.peak_mb = None
+        self.start_mb = None
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+
+    def __enter__(self):
+        self.start_mb = _rss_mb()
+        if self.start_mb is None:
+            tracemalloc.start()
+        else:
+            self.peak_mb = self.start_mb
+            self._done = threading.Event()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start_mb is None:
+            self.start_mb = 0.0
+            self.peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        else:
+            self._done.set()
+            self._thread.join()
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+
+
+def cache_counters():
+    """Hit and miss totals of every shared cache, as one flat dict."""
+    from charts import stats as figure_stats
+    from data_cache import workbooks
+    from exports import stats as export_stats
+    from labels import label_cache
+    from tables import stats as table_stats
+
+    return {
+        "workbook_hits": workbooks.stats["memory"],
+        "workbook_misses": workbooks.stats["sidecar"] + workbooks.stats["parsed"],
+        "workbook_parses": workbooks.stats["parsed"],
+        "figure_hits": figure_stats["hits"],
+        "figure_misses": figure_stats["misses"],
+        "table_hits": table_stats["hits"],
+        "table_misses": table_stats["misses"],
+        "export_hits": export_stats["hits"],
+        "export_misses": export_stats["misses"],
+        "label_hits": label_cache.stats["memory"] + label_cache.stats["disk"],
+        "label_misses": label_cache.stats["rendered"],
+    }
+
+
+def _configure_log():
+    if logger.handlers:
+        return
+    try:
+        LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.FileHandler(LOG_PATH)
+    except OSError:
+        return
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def _emit(record):
+    records.append(record)
+    logger.info(json.dumps(record, default=str))
+
+
+class _Span:
+    def __init__(self, stage, detail, section):
+        self.stage = stage
+        self.detail = detail
+        self.section = section
+
+    def __enter__(self):
+        self._counters = cache_counters()
+        self._memory = PeakMemory().__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._started
+        self._memory.__exit__(exc_type, exc, tb)
+        after = cache_counters()
+        run = getattr(_local, "run", None) or {}
+        _emit({
+            "ts": time.time(),
+            "kind": "span",
+            "run": run.get("id"),
+            "session": run.get("session"),
+            "page": run.get("page"),
+            "section": self.section or run.get("page") or "background",
+            "stage": self.stage,
+            "detail": self.detail,
+            "seconds": round(seconds, 6),
+            "peak_mb": round(self._memory.peak_mb, 1),
+            "delta_mb": round(self._memory.peak_mb - self._memory.start_mb, 1),
+            "cache": {k: after[k] - self._counters[k] for k in after if after[k] != self._counters[k]},
+            "error": exc_type.__name__ if exc_type else None,
+        })
+        return False
+
+
+def span(stage, detail=None, section=None):
+    """Time one ``stage`` ("load", "transform", "figure", "render", "export")
+    of ``section`` (by default the page being run); a no-op unless
+    instrumentation is enabled."""
+    if not ENABLED:
+        return _NOOP
+    return _Span(stage, detail, section)
+
+
+def timed(stage, detail, func):
+    """``func`` wrapped in a span (for deferred work such as exports)."""
+    if not ENABLED:
+        return func
+
+    def wrapper(*args, **kwargs):
+        with span(stage, detail):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def begin_run(session, page):
+    """Mark the start of a rerun of ``page`` on this thread."""
+    if not ENABLED:
+        return
+    _configure_log()
+    _local.run = {"id": uuid.uuid4().hex[:12], "session": session, "page": page,
+                  "started": time.perf_counter(), "counters": cache_counters()}
+
+
+def end_run():
+    """Record the rerun's total time and cache activity."""
+    run = getattr(_local, "run", None)
+    if not ENABLED or run is None:
+        return
+    after = cache_counters()
+    _emit({
+        "ts": time.time(),
+        "kind": "run",
+        "run": run["id"],
+        "session": run["session"],
+        "page": run["page"],
+        "section": run["page"],
+        "stage": "rerun",
+        "seconds": round(time.perf_counter() - run["started"], 6),
+        "peak_mb": round(_rss_mb() or 0.0, 1),
+        "cache": {k: after[k] - run["counters"][k] for k in after if after[k] != run["counters"][k]},
+    })
+    _local.run = None
+
+
+def summary():
+    """Per section/stage percentiles over the recorded spans and reruns."""
+    if not records:
+        return pd.DataFrame()
+    df = pd.DataFrame(list(records))
+    hits = df["cache"].map(lambda c: sum(v for k, v in c.items() if k.endswith("_hits")))
+    misses = df["cache"].map(lambda c: sum(v for k, v in c.items() if k.endswith("_misses")))
+    df = df.assign(hits=hits, misses=misses)
+    grouped = df.groupby(["section", "stage"])
+    out = grouped.agg(
+        count=("seconds", "size"),
+        sessions=("session", "nunique"),
+        p50_ms=("seconds", lambda s: np.percentile(s, 50) * 1000),
+        p90_ms=("seconds", lambda s: np.percentile(s, 90) * 1000),
+        p99_ms=("seconds", lambda s: np.percentile(s, 99) * 1000),
+        max_ms=("seconds", lambda s: s.max() * 1000),
+        peak_mb=("peak_mb", "max"),
+        hits=("hits", "sum"),
+        misses=("misses", "sum"),
+    ).reset_index()
+    return out.round(1).sort_values("p90_ms", ascending=False)
+
+
+def last_run(session):
+    """Spans of the most recent completed rerun of ``session``."""
+    finished = [r for r in records if r["kind"] == "run" and r["session"] == session]
+    if not finished:
+        return pd.DataFrame()
+    run_id = finished[-1]["run"]
+    rows = [r for r in records if r["run"] == run_id]
+    return pd.DataFrame(rows).reindex(columns=["section", "stage", "detail", "seconds", "peak_mb", "cache"])
@@ -0,0 +1,252 @@
+"""Warm start: parse every data file in parallel when the server starts.
+
+On a fresh process the first visitor used to wait while each workbook the
+app reads was parsed in turn. ``warm_start`` parses all of them at once in a
+process pool, one file per task (xlsx parsing is pure Python in openpyxl, so
+threads would share one core). Each worker reads a file exactly as the app
+does (``ingest.read_sheet`` / ``data_cache.read_excel``), which also writes
+the Parquet sidecars, and sends back the frames; they are then published
+into this process's shared caches and the tissue catalog and supply
+inventory are built from them, so the first request finds everything warm.
+Files whose sidecars are fresh, and small files, are read in this process
+instead: below ``POOL_MIN_BYTES`` of xlsx still to parse, starting the
+workers costs more than it saves.
+
+A missing or unreadable file is reported and skipped, never fatal: the page
+showing it says so and the rest of the app works.
+
+Streamlit has no process-start hook, so the app starts it on a background
+thread (``start_background``) from the first script run in a server process.
+That first visitor's page does not wait for the warm start as a whole, but
+it does not parse anything twice either: a file handed to the pool is marked
+as expected in ``data_cache.workbooks``, and loading it waits for the
+worker's frames; a file parsed in this process is shared with any page
+loading it at the same time. ``python prefetch.py`` warms the sidecars ahead
+of a server start and prints the per-file parse times.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pandas as pd
+
+from data_cache import EXCEL_ENGINE, read_excel, workbooks
+from ingest import export_snapshot_info, publish_snapshot_info, read_sheet, snapshot_info
+
+# Below this much xlsx in total, starting worker interpreters (each imports
+# pandas) takes longer than parsing everything in this process.
+POOL_MIN_BYTES = 4 * 2**20
+REPORT_COLUMNS = ["file", "status", "source", "tables", "rows", "seconds", "error"]
+
+logger = logging.getLogger("dashboard.prefetch")
+last_report = None
+
+
+def data_files():
+    """``{path: reads}`` for every non-store data file the app parses.
+
+    ``"sheets"`` is every table-bearing sheet (``ingest.read_workbook``);
+    ``"first_sheet"`` the plain ``read_excel`` of sheet 0, which Tab 2 shows
+    for the Reprocell files.
+    """
+    from catalog import VENDOR_FILES
+    from supply import SUPPLY_FILE
+
+    files = {path: ("sheets",) for path in VENDOR_FILES.values()}
+    for vendor in ("Reprocell", "Reprocell 2"):
+        files[VENDOR_FILES[vendor]] += ("first_sheet",)
+    files[SUPPLY_FILE] = ("sheets",)
+    return files
+
+
+# -------------------------------------------------
+# Worker side
+# -------------------------------------------------
+def parse_file(path, reads):
+    """Parse ``path`` for ``reads`` and return its cache entries and timing.
+
+    Runs in a worker process; never raises.
+    """
+    started = time.perf_counter()
+    result = {"path": str(path), "file": Path(path).name, "status": "parsed", "source": None, "error": None,
+              "frames": [], "snapshot_info": {}}
+    if not Path(path).exists():
+        result["status"] = "missing"
+    else:
+        before = dict(workbooks.stats)
+        try:
+            if "sheets" in reads:
+                for sheet in snapshot_info(path):
+                    read_sheet(path, sheet)
+            if "first_sheet" in reads:
+                read_excel(path)
+        except Exception as e:
+            result["status"] = "failed"
+            result["error"] = f"{type(e).__name__}: {e}"
+        else:
+            result["frames"] = workbooks.export(path)
+            result["snapshot_info"] = export_snapshot_info(path)
+            if workbooks.stats["parsed"] > before["parsed"]:
+                result["source"] = EXCEL_ENGINE
+            else:
+                result["source"] = "sidecar" if workbooks.stats["sidecar"] > before["sidecar"] else "memory"
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+# -------------------------------------------------
+# Server side
+# -------------------------------------------------
+def _parse_all(files, workers):
+    """Yield ``parse_file``'s result for each of ``files``, parsed by a pool
+    of ``workers`` processes when there is more than one."""
+    jobs = [(str(path), reads) for path, reads in files.items()]
+    done = 0
+    if workers > 1 and len(jobs) > 1:
+        try:
+            # "spawn": forking a server process that already runs threads can
+            # deadlock the child on a lock held by one of them.
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(workers, mp_context=context) as pool:
+                for result in pool.map(parse_file, *zip(*jobs)):
+                    done += 1
+                    yield result
+        except (OSError, BrokenProcessPool) as e:
+            logger.warning("process pool unavailable (%s); parsing in this process", e)
+    for path, reads in jobs[done:]:
+        # Parsed here after all: loads waiting for it may share this parse.
+        workbooks.settle(path)
+        yield parse_file(path, reads)
+
+
+def _build(name, load):
+    started = time.perf_counter()
+    try:
+        load()
+    except Exception as e:
+        logger.warning("warm start: building the %s failed: %s", name, e)
+        status, error = "failed", f"{type(e).__name__}: {e}"
+    else:
+        status, error = "built", None
+    return {"file": f"({name})", "status": status, "source": None, "tables": None, "rows": None,
+            "seconds": time.perf_counter() - started, "error": error}
+
+
+def plan(files=None, workers=None):
+    """Split ``files`` (default ``data_files()``) for ``warm_start``:
+    ``(ready, pending, workers)``.
+
+    Only files without fresh Parquet sidecars are pending, for the pool;
+    ``workers`` defaults to one per such file (up to the CPU count), or to
+    none (parse here) when they add up to less than ``POOL_MIN_BYTES``.
+    """
+    files = data_files() if files is None else files
+    pending = {path: reads for path, reads in files.items()
+               if Path(path).exists() and not workbooks.has_sidecars(path)}
+    if workers is None:
+        size = sum(Path(path).stat().st_size for path in pending)
+        workers = 1 if size < POOL_MIN_BYTES else min(len(pending), os.cpu_count() or 1)
+    workers = max(1, min(workers, len(pending)))
+    ready = {path: reads for path, reads in files.items() if path not in pending}
+    return ready, pending, workers
+
+
+def _expect(pending, workers):
+    # Pages that load a file meanwhile wait for the worker's frames instead
+    # of parsing it a second time.
+    if workers > 1 and len(pending) > 1:
+        for path in pending:
+            workbooks.expect(path)
+
+
+def warm_start(files=None, workers=None, build=True, planned=None):
+    """Parse ``files`` (see ``plan``) in parallel, publish the frames into
+    this process's caches and, with ``build``, build the tissue catalog and
+    supply inventory from them.
+
+    Returns the report: one row per file (and per derived structure) with
+    its status, where the frames came from and how long it took.
+    """
+    global last_report
+    from catalog import load_catalog
+    from supply import SUPPLY_FILE, load_supply
+
+    if planned is None:
+        planned = plan(files, workers)
+        _expect(planned[1], planned[2])
+    ready, pending, workers = planned
+    started = time.perf_counter()
+    rows = []
+    try:
+        for result in chain(_parse_all(ready, 1), _parse_all(pending, workers)):
+            frames = result.pop("frames")
+            publish_snapshot_info(result.pop("snapshot_info"))
+            workbooks.publish(frames)
+            workbooks.settle(result.pop("path"))
+            result["tables"] = len(frames)
+            result["rows"] = sum(len(df) for _, _, df in frames)
+            rows.append(result)
+            log = logger.warning if result["status"] == "failed" else logger.info
+            log("warm start: %s %s in %.2fs%s", result["file"], result["status"], result["seconds"],
+                f" ({result['error']})" if result["error"] else "")
+    finally:
+        for path in pending:
+            workbooks.settle(path)
+
+    if build:
+        rows.append(_build("tissue catalog", load_catalog))
+        if Path(SUPPLY_FILE).exists():
+            rows.append(_build("supply inventory", load_supply))
+    report = pd.DataFrame(rows, columns=REPORT_COLUMNS)
+    report = report.astype({"tables": "Int64", "rows": "Int64"})
+    report["seconds"] = report["seconds"].round(3)
+    report.attrs["seconds"] = time.perf_counter() - started
+    report.attrs["workers"] = workers
+    logger.info("warm start: %d files in %.2fs on %d workers (%s)", len(ready) + len(pending),
+                report.attrs["seconds"], workers, EXCEL_ENGINE)
+    last_report = report
+    return report
+
+
+def start_background(files=None, workers=None, build=True):
+    """Run ``warm_start`` on a daemon thread, so a server can take requests
+    meanwhile; the report lands in ``last_report``.
+
+    The files bound for the pool are marked as expected before the thread
+    starts, so a page load racing it waits for their frames rather than
+    parsing them again.
+    """
+    planned = plan(files, workers)
+    _expect(planned[1], planned[2])
+
+    def run():
+        try:
+            warm_start(build=build, planned=planned)
+        except Exception:
+            logger.exception("warm start failed")
+            for path in planned[1]:
+                workbooks.settle(path)
+
+    thread = threading.Thread(target=run, name="warm-start", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse every data file ahead of a server start.")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per file for large files)")
+    args = parser.parse_args()
+    report = warm_start(workers=args.workers)
+    print(report.to_string(index=False))
+    print(f"\n{report.attrs['seconds']:.2f}s on {report.attrs['workers']} workers, xlsx engine {EXCEL_ENGINE}")
+
+
+if __name__ == "__main__":
+    main()
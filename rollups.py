@@ -0,0 +1,162 @@
+"""Incrementally maintained rollups of the delivered-service log.
+
+Tab 1 used to group the raw service rows several times on every rerun.
+``ServiceRollups`` keeps a daily (date x requester x service x sample type)
+and a monthly rollup instead, built from the store's ``service_records``.
+When rows have only been added since the last refresh, just those rows
+(``Store.rows_after``) are aggregated and merged in; an edit or delete of an
+existing row triggers a full rebuild. Both rollups are kept compacted
+(categorical requester, service and sample type).
+"""
+import threading
+
+import pandas as pd
+
+from data_cache import compact
+
+REQUIRED_COLUMNS = ["Date", "Requester Name", "Service Type", "Sample Type", "Quantity"]
+KEYS = ["Date", "Requester Name", "Service Type", "Sample Type"]
+MONTHLY_KEYS = ["Month", "Requester Name", "Service Type", "Sample Type"]
+FFPE_SERVICE = "FFPE Processing & Embedding"
+
+
+def prepare_records(df):
+    """Parse dates and quantities the way Tab 1 always has."""
+    df = df.copy()
+    df["Date"] = pd.to_datetime(df["Date"])
+    df["Quantity"] = pd.to_numeric(df["Quantity"], errors="coerce").fillna(0).astype(int)
+    return df
+
+
+def _aggregate(df, keys):
+    # dropna=False keeps rows with a blank key in the totals, as len(df) did.
+    return df.groupby(keys, as_index=False, observed=True, dropna=False).agg(
+        Quantity=("Quantity", "sum"), Entries=("Quantity", "size")
+    )
+
+
+def _merge(rollup, delta, keys):
+    if rollup.empty:
+        return delta
+    return _aggregate_sum(pd.concat([rollup, delta], ignore_index=True), keys)
+
+
+def _aggregate_sum(df, keys):
+    return df.groupby(keys, as_index=False, observed=True, dropna=False)[["Quantity", "Entries"]].sum()
+
+
+class ServiceRollups:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self.reset()
+
+    def reset(self):
+        self.daily = pd.DataFrame(columns=KEYS + ["Quantity", "Entries"])
+        self.monthly = pd.DataFrame(columns=MONTHLY_KEYS + ["Quantity", "Entries"])
+        self.version = 0
+        self.source = None
+        self.last_id = 0
+        self._views.clear()
+
+    def rebuild(self, records):
+        """Replace the rollups with those of ``records`` (the whole, prepared log)."""
+        with self._lock:
+            version = self.version
+            self.reset()
+            self.version = version
+            self._fold(records)
+            self.version += 1
+            self._views.clear()
+
+    def append(self, records):
+        """Fold ``records`` (prepared rows added since the last update) in.
+
+        Returns the number of rows aggregated.
+        """
+        with self._lock:
+            if len(records):
+                self._fold(records)
+                self.version += 1
+                self._views.clear()
+            return len(records)
+
+    def _fold(self, records):
+        if not len(records):
+            return
+        records = records.assign(Month=records["Date"].dt.to_period("M").dt.to_timestamp())
+        self.daily = compact(_merge(self.daily, _aggregate(records, KEYS), KEYS), "service rollup (daily)")
+        self.monthly = compact(_merge(self.monthly, _aggregate(records, MONTHLY_KEYS), MONTHLY_KEYS),
+                               "service rollup (monthly)")
+
+    def _view(self, name, build):
+        key = (name, self.version)
+        if key not in self._views:
+            self._views[key] = build()
+        return self._views[key]
+
+    # --- Derived views, memoized per rollup version ---
+    def metrics(self):
+        def build():
+            slides = self.daily[self.daily["Service Type"] != FFPE_SERVICE]["Quantity"].sum()
+            return {
+                "total_services": int(self.daily["Entries"].sum()),
+                "total_slides": int(slides),
+                "unique_requesters": int(self.daily["Requester Name"].nunique()),
+            }
+        return self._view("metrics", build)
+
+    def slides(self):
+        return self._view("slides", lambda: self.daily[self.daily["Service Type"] != FFPE_SERVICE])
+
+    def ffpe(self):
+        return self._view("ffpe", lambda: self.daily[self.daily["Service Type"] == FFPE_SERVICE])
+
+    def summary(self, subset, by, sort=None):
+        """Quantity summed by ``by`` over the ``"all"``, ``"slides"`` or ``"ffpe"`` rows."""
+        def build():
+            source = {"all": self.daily, "slides": self.slides(), "ffpe": self.ffpe()}[subset]
+            out = source.groupby(by, as_index=False, observed=True)["Quantity"].sum()
+            return out if sort is None else out.sort_values(sort, ascending=False)
+        return self._view(("summary", subset, tuple(by) if isinstance(by, list) else by, sort), build)
+
+    def monthly_summary(self, subset):
+        def build():
+            source = self.monthly
+            if subset == "slides":
+                source = source[source["Service Type"] != FFPE_SERVICE]
+            elif subset == "ffpe":
+                source = source[source["Service Type"] == FFPE_SERVICE]
+            return source.groupby("Month", as_index=False, observed=True)["Quantity"].sum()
+        return self._view(("monthly", subset), build)
+
+    def report(self):
+        """The per-day service report (the old ``grouped`` frame), newest first."""
+        return self._view(
+            "report", lambda: self.daily[KEYS + ["Quantity"]].sort_values("Date", ascending=False)
+        )
+
+
+# Shared by every session in the process, like ``data_cache.workbooks``.
+service_rollups = ServiceRollups()
+
+
+def load_store_rollups(store, table="service_records", rollups=service_rollups):
+    """Bring ``rollups`` up to date with the service records in ``store``:
+    only rows added since the last call are read, unless an existing row was
+    changed or removed."""
+    # Read before the rows, so a write landing in between is picked up next time.
+    revision, rewrites = store.revision(table), store.rewrites(table)
+    base = (str(store.path.resolve()), rewrites)
+    if rollups.source is None or rollups.source[0] != base:
+        records = store.frame(table)
+        rollups.rebuild(prepare_records(records.reset_index(drop=True)))
+    elif rollups.source[1] != revision:
+        records = store.rows_after(table, rollups.last_id)
+        rollups.append(prepare_records(records.reset_index(drop=True)))
+    else:
+        return rollups
+    if len(records):
+        rollups.last_id = max(rollups.last_id, int(records.index.max()))
+    rollups.source = (base, revision)
+    return rollups
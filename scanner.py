@@ -0,0 +1,208 @@
+"""Barcode/QR scanning for supply check-in and check-out.
+
+Frames come from the browser camera (streamlit-webrtc) or, offline, from
+recorded frames and image files. The video callback never decodes: it hands
+every Nth frame to a small thread pool and returns immediately, so the stream
+keeps its frame rate. Frames are cropped to a central region and downscaled
+to grayscale before decoding, frames are dropped while the pool is busy, and
+a code seen again within the debounce window is ignored.
+
+Decoding uses pyzbar when the zbar library is installed and falls back to
+OpenCV's QR and 1D barcode detectors otherwise.
+
+Run ``python scanner.py image.png [...]`` to decode image files.
+"""
+import re
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+try:
+    from pyzbar import pyzbar
+except ImportError:  # the zbar shared library is not installed
+    pyzbar = None
+
+FRAME_STRIDE = 3
+ROI_FRACTION = 0.7
+MAX_DECODE_WIDTH = 640
+DEBOUNCE_SECONDS = 2.0
+WORKERS = 2
+
+_PAYLOAD_FIELDS = {"CAT": "catalog_no", "LOT": "lot", "LOC": "location"}
+
+
+def preprocess(frame, roi_fraction=ROI_FRACTION, max_width=MAX_DECODE_WIDTH):
+    """Central region of ``frame`` as a downscaled grayscale image."""
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    if roi_fraction < 1:
+        dy, dx = int(h * (1 - roi_fraction) / 2), int(w * (1 - roi_fraction) / 2)
+        gray = gray[dy:h - dy, dx:w - dx]
+    if gray.shape[1] > max_width:
+        scale = max_width / gray.shape[1]
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray
+
+
+_local = threading.local()
+
+
+def _opencv_detectors():
+    # OpenCV detectors are not thread-safe; keep one pair per worker thread.
+    if not hasattr(_local, "detectors"):
+        _local.detectors = (cv2.QRCodeDetector(), cv2.barcode.BarcodeDetector())
+    return _local.detectors
+
+
+def decode(gray):
+    """All barcode/QR payloads found in a grayscale image."""
+    if pyzbar is not None:
+        return [symbol.data.decode("utf-8", "replace") for symbol in pyzbar.decode(gray)]
+    codes = []
+    for detector in _opencv_detectors():
+        try:
+            result = detector.detectAndDecodeMulti(gray)
+        except cv2.error:
+            continue
+        if result[0]:
+            codes.extend(text for text in result[1] if text)
+    return codes
+
+
+def parse_payload(text):
+    """Split a scanned payload into inventory fields.
+
+    Labels printed by ``labels.py`` encode ``CAT:<catalog>|LOT:<lot>|LOC:<location>``;
+    anything else (a vendor barcode) is treated as a bare lot or catalog code.
+    """
+    fields = {}
+    for part in text.split("|"):
+        match = re.match(r"\s*([A-Z]+)\s*:\s*(.*?)\s*$", part)
+        if match and match.group(1) in _PAYLOAD_FIELDS:
+            fields[_PAYLOAD_FIELDS[match.group(1)]] = match.group(2)
+    if not fields:
+        fields["code"] = text.strip()
+    return fields
+
+
+def apply_scan(inventory, text, delta):
+    """Check a scanned item in (``delta`` > 0) or out (``delta`` < 0).
+
+    Returns the updated row, or None when the code matches nothing; raises
+    ValueError when a check-out finds nothing in stock.
+    """
+    fields = parse_payload(text)
+    code = fields.get("lot") or fields.get("code") or fields.get("catalog_no")
+    row = inventory.adjust(code, delta)
+    if row is None and fields.get("catalog_no"):
+        row = inventory.adjust(fields["catalog_no"], delta)
+    return row
+
+
+class ScanPipeline:
+    """Decode frames off the video thread and report each new code once.
+
+    ``on_scan(code)`` is called from a worker thread for every code that was
+    not already seen within ``debounce`` seconds; a ValueError it raises is
+    kept in ``errors`` for the page to show.
+    """
+
+    def __init__(self, on_scan, stride=FRAME_STRIDE, debounce=DEBOUNCE_SECONDS, workers=WORKERS):
+        self.on_scan = on_scan
+        self.stride = stride
+        self.debounce = debounce
+        self.workers = workers
+        self.frames = 0
+        self.decoded = 0
+        self.dropped = 0
+        self.history = deque(maxlen=50)
+        self.errors = deque(maxlen=50)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan")
+        self._pending = 0
+        self._last_seen = {}
+        self._lock = threading.Lock()
+
+    def submit(self, frame):
+        """Queue ``frame`` for decoding unless it is skipped; never blocks."""
+        with self._lock:
+            self.frames += 1
+            if self.frames % self.stride:
+                return None
+            if self._pending >= self.workers:
+                self.dropped += 1
+                return None
+            self._pending += 1
+        return self._pool.submit(self._decode, frame)
+
+    def _decode(self, frame):
+        try:
+            codes = decode(preprocess(frame))
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.decoded += 1
+        accepted = []
+        now = time.monotonic()
+        for code in codes:
+            with self._lock:
+                last = self._last_seen.get(code)
+                self._last_seen[code] = now
+                if last is not None and now - last < self.debounce:
+                    continue
+                self.history.appendleft((time.strftime("%H:%M:%S"), code))
+            accepted.append(code)
+            try:
+                self.on_scan(code)
+            except ValueError as e:
+                self.errors.append((code, str(e)))
+        return accepted
+
+    def scan_all(self, frames):
+        """Decode recorded frames synchronously (offline use); returns new codes."""
+        accepted = []
+        for frame in frames:
+            future = self.submit(frame)
+            if future is not None:
+                accepted.extend(future.result())
+        return accepted
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+def video_frame_callback(pipeline):
+    """streamlit-webrtc callback that feeds ``pipeline`` and passes video through."""
+    def callback(frame):
+        pipeline.submit(frame.to_ndarray(format="bgr24"))
+        return frame
+    return callback
+
+
+def read_image(path):
+    image = cv2.imread(str(path))
+    if image is None:
+        raise ValueError(f"Could not read image {path}")
+    return image
+
+
+def decode_bytes(data):
+    """Decode an uploaded image file's bytes."""
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Not a readable image")
+    return decode_image(image)
+
+
+def decode_image(image):
+    """Decode a single still image at full resolution (no ROI crop)."""
+    return decode(preprocess(image, roi_fraction=1.0, max_width=max(image.shape[1], MAX_DECODE_WIDTH)))
+
+
+if __name__ == "__main__":
+    for image_path in sys.argv[1:]:
+        print(image_path, decode_image(read_image(image_path)))
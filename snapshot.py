@@ -0,0 +1,419 @@
+"""Headless precompute of the dashboard's Tab 1-4 content.
+
+Run from cron (``python snapshot.py --html``) to load every source workbook
+and store table, compute each section's aggregates and figures, and write a
+versioned snapshot directory::
+
+    snapshots/<id>/manifest.json     sections as ordered display blocks
+    snapshots/<id>/frames/*.parquet  every table the blocks show
+    snapshots/<id>/figures/*.json    Plotly figure specs
+    snapshots/<id>/report.html       optional static report
+    snapshots/LATEST                 id of the newest complete snapshot
+
+Snapshots are built in a temporary directory and renamed into place, so a
+reader never sees a half-written one. With ``DASHBOARD_SNAPSHOT_DIR`` set, the
+dashboard renders Tabs 1-4 from the latest snapshot (a JSON read plus the
+Parquet files it actually shows) instead of computing them per request.
+"""
+import argparse
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+from billing import load_recovery_costs
+from catalog import VENDOR_FILES, load_catalog
+from charts import line_figure
+from data_cache import fingerprint, read_excel
+from ingest import read_workbook, snapshot_date
+from rollups import load_store_rollups
+from store import TABLES, get_store
+
+logger = logging.getLogger("dashboard.snapshot")
+
+SNAPSHOT_DIR = Path("snapshots")
+FORMAT_VERSION = 1
+KEEP = 5
+SECTION_TITLES = {
+    "delivered": "Delivered Services",
+    "pending": "Pending Services",
+    "ffpe": "FFPE Cancer Tissue Repository",
+    "cost": "Recovery Cost",
+}
+# (requester, request, status), as listed at the top of the Pending Services page.
+PENDING_REQUESTS = [
+    ("Dr. Amadou Gaye", "Matched FFPE and frozen tissue samples from 8 African American and "
+     "8 non–African American patients.", "In progress (biobank contact and coordination)"),
+    ("Dr. Chandravanu Dash", "Frozen mouse brain slide preparation for brain region study.",
+     "In review process"),
+    ("Dr. Menaka Thounaojam", "Frozen sections from unfixed snap frozen mouse eye tissue.",
+     "In process of optimizing sectioning protocol"),
+]
+
+
+def pending_markdown(requests=PENDING_REQUESTS):
+    """The pending-request list as the dashboard shows it."""
+    lines = ["**Pending Requests:**"]
+    for i, (requester, request, status) in enumerate(requests, 1):
+        lines.append(f"{i}. *{requester}* — {request}  \n   **Status:** {status}")
+    return "\n".join(lines)
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+class Section:
+    """Ordered display blocks for one dashboard section, plus their data."""
+
+    def __init__(self, name):
+        self.name = name
+        self.blocks = []
+        self.frames = {}
+        self.figures = {}
+
+    def subheader(self, text):
+        self.blocks.append({"type": "subheader", "text": text})
+
+    def caption(self, text):
+        self.blocks.append({"type": "caption", "text": text})
+
+    def info(self, text):
+        self.blocks.append({"type": "info", "text": text})
+
+    def requests(self, items):
+        self.blocks.append({"type": "requests", "items": [list(item) for item in items]})
+
+    def divider(self):
+        self.blocks.append({"type": "divider"})
+
+    def metrics(self, items):
+        self.blocks.append({"type": "metrics", "items": [[label, value] for label, value in items]})
+
+    def table(self, key, df):
+        name = _slug(f"{self.name}-{key}")
+        self.frames[name] = df
+        self.blocks.append({"type": "table", "name": name, "rows": len(df)})
+
+    def figure(self, key, fig):
+        name = _slug(f"{self.name}-{key}")
+        self.figures[name] = fig
+        self.blocks.append({"type": "figure", "name": name})
+
+
+# -------------------------------------------------
+# Sections
+# -------------------------------------------------
+def delivered_section(store):
+    section = Section("delivered")
+    store.seed("service_records")
+    if store.count("service_records") == 0:
+        section.info("No service records yet.")
+        return section
+    rollups = load_store_rollups(store)
+    metrics = rollups.metrics()
+    section.metrics([
+        ("Total Service Entries (all)", metrics["total_services"]),
+        ("Total Slides Processed (excl. FFPE Processing & Embedding)", metrics["total_slides"]),
+        ("Unique Requesters (all)", metrics["unique_requesters"]),
+    ])
+    section.divider()
+    section.subheader("📅 Provided Service Summary (All Services)")
+    section.table("daily", rollups.summary("all", ["Date", "Requester Name"], sort="Date"))
+    section.divider()
+    section.subheader("📊 Quantity by Service Type (Slide Generation)")
+    section.figure("service", px.bar(
+        rollups.summary("slides", "Service Type"), x="Service Type", y="Quantity", text="Quantity",
+        title="Quantity by Service Type (Slide Generation)", color="Service Type"))
+    section.subheader("👩‍🔬 Quantity by Requester (Slide Generation)")
+    section.figure("requester", px.bar(
+        rollups.summary("slides", "Requester Name"), x="Requester Name", y="Quantity", text="Quantity",
+        title="Quantity by Requester (Slide Generation)", color="Requester Name"))
+    section.subheader("📈 Histology Slide Generation Over Time")
+    section.figure("slides", line_figure(
+        rollups.summary("slides", "Date"), "Date", "Quantity",
+        "No of Histology Slides Over Time (excl. FFPE Processing & Embedding)"))
+    section.figure("slides-monthly", line_figure(
+        rollups.monthly_summary("slides").rename(columns={"Month": "Date"}), "Date", "Quantity",
+        "Monthly Histology Slides (excl. FFPE Processing & Embedding)"))
+    section.divider()
+    section.subheader("🧱 FFPE Processing & Embedding Trend Over Time")
+    if not rollups.ffpe().empty:
+        section.figure("ffpe", line_figure(
+            rollups.summary("ffpe", "Date"), "Date", "Quantity",
+            "FFPE Processing & Embedding Volume Over Time", color_discrete_sequence=["#FF7F50"]))
+        section.subheader("🔍 FFPE Processing & Embedding Summary by Requester")
+        section.table("ffpe-requesters", rollups.summary("ffpe", "Requester Name", sort="Quantity"))
+    else:
+        section.info("No 'FFPE Processing & Embedding' records found in this dataset.")
+    section.divider()
+    section.subheader("📋 Full Service Report (All Entries)")
+    section.table("report", rollups.report())
+    return section
+
+
+def pending_section(store):
+    section = Section("pending")
+    section.subheader("⏳ Pending Service Requests")
+    section.requests(PENDING_REQUESTS)
+    store.seed("biobanks")
+    section.subheader("📘 List of Biobanks")
+    section.table("biobanks", store.export_frame("biobanks"))
+    section.divider()
+    section.subheader("🔎 Cross-Vendor Tissue Catalog")
+    tissue_catalog = load_catalog()
+    section.caption(f"{len(tissue_catalog)} samples across {tissue_catalog.df['vendor'].nunique()} vendors")
+    section.table("catalog", tissue_catalog.df)
+    section.divider()
+    section.subheader("🏷️ Available Tissue Stock Files")
+    for vendor, path in VENDOR_FILES.items():
+        if not path.exists():
+            continue
+        section.subheader(f"{vendor} Tissue Stock")
+        workbook = path.name in ("BioIVT_stock.xlsx", "Cureline_breast_cancer_stock.xlsx")
+        try:
+            sheets = read_workbook(path) if workbook else {"sheet": read_excel(path)}
+        except Exception as e:
+            # One bad export should not abort the whole snapshot.
+            logger.warning("could not read %s: %s", path, e)
+            section.info(f"⚠️ {path.name} could not be read ({type(e).__name__}: {e}).")
+            continue
+        output_date = snapshot_date(sheets) if workbook else None
+        if output_date is not None:
+            section.caption(f"Vendor output date: {output_date:%m/%d/%Y}")
+        for sheet_name, sheet_df in sheets.items():
+            section.table(f"{vendor}-{sheet_name}", sheet_df)
+    return section
+
+
+def ffpe_section(store):
+    section = Section("ffpe")
+    store.seed("ffpe_repository")
+    if store.count("ffpe_repository") == 0:
+        section.info("No FFPE repository records yet.")
+        return section
+    repo_df = store.export_frame("ffpe_repository")
+    section.table("repository", repo_df)
+    section.subheader("📈 Repository Summary by Cancer Type")
+    section.figure("cancer-type", px.bar(
+        repo_df.groupby("Cancer Type", as_index=False)["Quantity"].sum(), x="Cancer Type", y="Quantity",
+        title="FFPE Samples by Cancer Type", color="Cancer Type"))
+    return section
+
+
+def cost_section(store):
+    section = Section("cost")
+    for table in ("service_records", "price_schedule", "requester_tiers"):
+        store.seed(table)
+    if store.count("service_records") == 0 or store.count("price_schedule") == 0:
+        section.info("No service records or price schedule yet.")
+        return section
+    costs = load_recovery_costs(store)
+    metrics = costs.metrics()
+    section.metrics([
+        ("Total Recovery Cost", f"${metrics['total']:,.2f}"),
+        ("Internal", f"${metrics['Internal']:,.2f}"),
+        ("External", f"${metrics['External']:,.2f}"),
+        ("Entries Without a Rate", metrics["unpriced_entries"]),
+    ])
+    if metrics["unpriced_entries"]:
+        section.table("unpriced", costs.unpriced())
+    section.subheader("📊 Cost Breakdown by Requester")
+    section.figure("requester", px.bar(
+        costs.by_requester(), x="Requester Name", y="Cost", text="Cost",
+        title="Total Recovery Cost per Requester", color="Tier"))
+    section.subheader("📈 Monthly Cost Trend")
+    section.figure("monthly", line_figure(costs.monthly(), "Month", "Cost", "Monthly Recovery Cost Trend",
+                                          color="Tier"))
+    section.subheader("📋 Priced Services")
+    section.table("lines", costs.report())
+    return section
+
+
+SECTIONS = {
+    "delivered": delivered_section,
+    "pending": pending_section,
+    "ffpe": ffpe_section,
+    "cost": cost_section,
+}
+
+
+# -------------------------------------------------
+# Writing
+# -------------------------------------------------
+def source_versions(store):
+    """What a snapshot was computed from: file fingerprints and store revisions."""
+    files = {str(p): list(fingerprint(p)) for p in VENDOR_FILES.values() if p.exists()}
+    tables = {table: store.revision(table) for table in TABLES}
+    return {"files": files, "tables": tables}
+
+
+def _write_frame(df, path):
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    try:
+        df.to_parquet(path, index=False)
+    except Exception:
+        # Arrow rejects object columns mixing types; store those as text.
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].map(lambda v: v if v is None or (not isinstance(v, str) and pd.isna(v)) else str(v))
+        df.to_parquet(path, index=False)
+
+
+def _html_report(manifest, sections):
+    parts = ["<html><head><meta charset='utf-8'><title>Core Activity Snapshot</title></head><body>",
+             f"<h1>In Situ Tissue-Omics Core</h1><p>Snapshot {manifest['id']} "
+             f"({manifest['created']})</p>"]
+    include_js = "cdn"
+    for section in sections:
+        parts.append(f"<h2>{html.escape(SECTION_TITLES[section.name])}</h2>")
+        for block in section.blocks:
+            kind = block["type"]
+            if kind == "subheader":
+                parts.append(f"<h3>{html.escape(block['text'])}</h3>")
+            elif kind in ("caption", "info"):
+                parts.append(f"<p>{html.escape(block['text'])}</p>")
+            elif kind == "requests":
+                parts.append("<ol>" + "".join(
+                    f"<li><i>{html.escape(requester)}</i> — {html.escape(request)}<br>"
+                    f"<b>Status:</b> {html.escape(status)}</li>"
+                    for requester, request, status in block["items"]) + "</ol>")
+            elif kind == "divider":
+                parts.append("<hr>")
+            elif kind == "metrics":
+                parts.append("<ul>" + "".join(f"<li>{html.escape(label)}: <b>{value}</b></li>"
+                                             for label, value in block["items"]) + "</ul>")
+            elif kind == "table":
+                df = section.frames[block["name"]]
+                parts.append(df.head(500).to_html(index=False, na_rep=""))
+                if len(df) > 500:
+                    parts.append(f"<p>First 500 of {len(df)} rows.</p>")
+            elif kind == "figure":
+                parts.append(pio.to_html(section.figures[block["name"]], full_html=False,
+                                         include_plotlyjs=include_js))
+                include_js = False
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def write_snapshot(out_dir=SNAPSHOT_DIR, sections=None, html_report=False, keep=KEEP, store=None):
+    """Compute ``sections`` (all by default) and write a new snapshot; returns its path."""
+    store = store or get_store()
+    out_dir = Path(out_dir)
+    names = list(sections or SECTIONS)
+    started = time.perf_counter()
+    built = [SECTIONS[name](store) for name in names]
+    sources = source_versions(store)
+    created = datetime.now(timezone.utc)
+    digest = hashlib.sha1(json.dumps(sources, sort_keys=True).encode()).hexdigest()[:8]
+    snapshot_id = f"{created:%Y%m%dT%H%M%SZ}-{digest}"
+
+    tmp = out_dir / f".tmp-{snapshot_id}-{os.getpid()}"
+    (tmp / "frames").mkdir(parents=True)
+    (tmp / "figures").mkdir()
+    for section in built:
+        for name, df in section.frames.items():
+            _write_frame(df, tmp / "frames" / f"{name}.parquet")
+        for name, fig in section.figures.items():
+            (tmp / "figures" / f"{name}.json").write_text(pio.to_json(fig))
+    manifest = {
+        "format": FORMAT_VERSION,
+        "id": snapshot_id,
+        "created": created.isoformat(timespec="seconds"),
+        "build_seconds": round(time.perf_counter() - started, 3),
+        "sources": sources,
+        "sections": {section.name: section.blocks for section in built},
+    }
+    (tmp / "manifest.json").write_text(json.dumps(manifest, indent=1, default=str))
+    if html_report:
+        (tmp / "report.html").write_text(_html_report(manifest, built))
+
+    final = out_dir / snapshot_id
+    os.replace(tmp, final)
+    latest = out_dir / f".LATEST-{os.getpid()}"
+    latest.write_text(snapshot_id)
+    os.replace(latest, out_dir / "LATEST")
+
+    snapshots = sorted(p for p in out_dir.iterdir() if p.is_dir() and not p.name.startswith("."))
+    for old in snapshots[:-keep] if keep else []:
+        shutil.rmtree(old, ignore_errors=True)
+    return final
+
+
+# -------------------------------------------------
+# Reading
+# -------------------------------------------------
+class Snapshot:
+    """A written snapshot; frames and figures are read on first use."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / "manifest.json").read_text())
+        if self.manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {self.path}")
+        self.id = self.manifest["id"]
+        self.created = self.manifest["created"]
+        self._frames = {}
+        self._figures = {}
+        self._lock = threading.Lock()
+
+    def blocks(self, section):
+        return self.manifest["sections"].get(section, [])
+
+    def frame(self, name):
+        with self._lock:
+            if name not in self._frames:
+                self._frames[name] = pd.read_parquet(self.path / "frames" / f"{name}.parquet")
+            return self._frames[name]
+
+    def figure(self, name):
+        with self._lock:
+            if name not in self._figures:
+                self._figures[name] = pio.from_json((self.path / "figures" / f"{name}.json").read_text())
+            return self._figures[name]
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def load_latest(out_dir=SNAPSHOT_DIR):
+    """The newest complete snapshot under ``out_dir``, or None if there is none."""
+    pointer = Path(out_dir) / "LATEST"
+    if not pointer.exists():
+        return None
+    snapshot_id = pointer.read_text().strip()
+    with _snapshots_lock:
+        if snapshot_id not in _snapshots:
+            _snapshots.clear()
+            _snapshots[snapshot_id] = Snapshot(Path(out_dir) / snapshot_id)
+        return _snapshots[snapshot_id]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute a dashboard snapshot.")
+    parser.add_argument("--out", default=str(SNAPSHOT_DIR), help="snapshot directory (default: %(default)s)")
+    parser.add_argument("--section", action="append", choices=list(SECTIONS),
+                        help="only these sections (repeatable; default: all)")
+    parser.add_argument("--html", action="store_true", help="also write a static report.html")
+    parser.add_argument("--keep", type=int, default=KEEP, help="snapshots to keep (default: %(default)s)")
+    args = parser.parse_args(argv)
+    path = write_snapshot(args.out, sections=args.section, html_report=args.html, keep=args.keep)
+    print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+"""Persistent SQLite store for the records the core edits.
+
+Service records, biobank contacts, the FFPE repository and the billing rates
+used to live only in hand-edited workbooks. They are now tables in one SQLite
+database in WAL mode, so several lab staff can write at once (readers never
+block writers) and an edit is a row-level upsert rather than a rewritten
+workbook. Columns keep their spreadsheet names on the way in and out; sheet
+columns the schema does not know are kept in an ``extra`` JSON column.
+xlsx import and export remain available as bulk operations.
+
+Every write bumps a per-table revision in the same transaction, and frames
+read from the store are cached against it. Writes that may change or delete
+existing rows also bump ``rewrites``, so readers that only need new rows
+(``rows_after``) know when an append-only refresh is enough.
+"""
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from data_cache import read_excel
+
+DB_PATH = Path("core_store.sqlite3")
+BUSY_TIMEOUT_MS = 10000
+
+# table -> (workbook it is seeded from, natural key column or None,
+#           [(sheet column, db column, SQL type), ...])
+TABLES = {
+    "service_records": ("lab_record.xlsx", None, [
+        ("Date", "date", "TEXT"),
+        ("Requester Name", "requester", "TEXT"),
+        ("Service Type", "service_type", "TEXT"),
+        ("Sample Type", "sample_type", "TEXT"),
+        ("Quantity", "quantity", "INTEGER"),
+        ("Notes", "notes", "TEXT"),
+    ]),
+    "biobanks": ("Cancer_biobanks_USA.xlsx", "name", [
+        ("Name", "name", "TEXT"),
+        ("contacted", "contacted", "TEXT"),
+        ("Notes", "notes", "TEXT"),
+    ]),
+    "ffpe_repository": ("ffpe_repository.xlsx", "block_id", [
+        ("Block ID", "block_id", "TEXT"),
+        ("Cancer Type", "cancer_type", "TEXT"),
+        ("Quantity", "quantity", "INTEGER"),
+        ("Notes", "notes", "TEXT"),
+    ]),
+    # Effective-dated rates recovery cost is computed from (billing.py).
+    "price_schedule": ("price_schedule.xlsx", None, [
+        ("Effective Date", "effective_date", "TEXT"),
+        ("Service Type", "service_type", "TEXT"),
+        ("Sample Type", "sample_type", "TEXT"),
+        ("Tier", "tier", "TEXT"),
+        ("Unit Price", "unit_price", "REAL"),
+        ("Notes", "notes", "TEXT"),
+    ]),
+    "requester_tiers": ("requester_tiers.xlsx", "requester", [
+        ("Requester Name", "requester", "TEXT"),
+        ("Tier", "tier", "TEXT"),
+        ("Notes", "notes", "TEXT"),
+    ]),
+    # Scan check-ins and check-outs, applied on top of the supply workbook
+    # (supply.py); there is no workbook to seed them from.
+    "supply_adjustments": (None, None, [
+        ("Scanned At", "scanned_at", "TEXT"),
+        ("Code", "code", "TEXT"),
+        ("Catalog #", "catalog_no", "TEXT"),
+        ("Lot #", "lot", "TEXT"),
+        ("Change", "delta", "INTEGER"),
+        ("Lot ID", "lot_id", "TEXT"),
+    ]),
+}
+INDEXES = {
+    "service_records": ["date", "requester", "service_type"],
+    "biobanks": [],
+    "ffpe_repository": ["cancer_type"],
+    "price_schedule": [],
+    "requester_tiers": [],
+    "supply_adjustments": [],
+}
+DATE_COLUMNS = {"date", "contacted", "effective_date"}
+# Sheet columns a workbook may leave out (besides Notes). Rows without a
+# natural key are plain inserts keyed on their row id.
+OPTIONAL_COLUMNS = {"ffpe_repository": {"block_id"}}
+# Keys a row can carry that are not sheet data: the row id, and the index
+# column ``st.data_editor`` adds to rows typed into a dynamic editor.
+EDITOR_KEYS = {"id", "_index"}
+
+
+def _schema():
+    statements = ["CREATE TABLE IF NOT EXISTS revisions (name TEXT PRIMARY KEY, revision INTEGER NOT NULL)"]
+    for table, (_, natural_key, columns) in TABLES.items():
+        fields = ["id INTEGER PRIMARY KEY"]
+        fields += [f"{db} {sql_type}" + (" UNIQUE" if db == natural_key else "") for _, db, sql_type in columns]
+        fields += ["extra TEXT", "updated_at TEXT NOT NULL DEFAULT (datetime('now'))"]
+        statements.append(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(fields)})")
+        statements += [f"CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})"
+                       for column in INDEXES[table]]
+    return statements
+
+
+def _db_value(value, db_column):
+    if value is None or (not isinstance(value, (str, list, dict)) and pd.isna(value)):
+        return None
+    if db_column in DATE_COLUMNS:
+        return pd.Timestamp(value).date().isoformat()
+    if hasattr(value, "item"):  # numpy scalar
+        return value.item()
+    return value
+
+
+def _json_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value.item() if hasattr(value, "item") else value
+
+
+class Store:
+    def __init__(self, path=DB_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._frames = {}
+        self._lock = threading.Lock()
+        with self.transaction() as conn:
+            for statement in _schema():
+                conn.execute(statement)
+            # Tables created by an earlier version gain the columns added since.
+            for table, (_, _, columns) in TABLES.items():
+                present = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for _, db, sql_type in columns:
+                    if db not in present:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {db} {sql_type}")
+
+    def _connection(self):
+        # sqlite3 connections are per thread; Streamlit runs sessions on many.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """A write transaction; BEGIN IMMEDIATE takes the write lock up front."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _bump(self, conn, table, rewrite=False):
+        names = [(table,), (f"{table}.rewrites",)] if rewrite else [(table,)]
+        conn.executemany(
+            "INSERT INTO revisions (name, revision) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET revision = revision + 1", names
+        )
+
+    def revision(self, table):
+        row = self._connection().execute("SELECT revision FROM revisions WHERE name = ?", (table,)).fetchone()
+        return row[0] if row else 0
+
+    def rewrites(self, table):
+        """Revision counting only writes that may change or remove existing
+        rows; appends leave it alone."""
+        return self.revision(f"{table}.rewrites")
+
+    def count(self, table):
+        return self._connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    # --- Reading ---
+    def _read(self, table, after_id=None):
+        _, _, columns = TABLES[table]
+        db_columns = [db for _, db, _ in columns]
+        where, params = ("WHERE id > ? ", (int(after_id),)) if after_id is not None else ("", ())
+        rows = self._connection().execute(
+            f"SELECT id, {', '.join(db_columns)}, extra FROM {table} {where}ORDER BY id", params
+        ).fetchall()
+        df = pd.DataFrame([row[:-1] for row in rows], columns=["id"] + db_columns).set_index("id")
+        extras = pd.DataFrame([json.loads(row[-1]) if row[-1] else {} for row in rows], index=df.index)
+        extras = extras.drop(columns=[c for c in extras.columns if c in EDITOR_KEYS])
+        for db in db_columns:
+            if db in DATE_COLUMNS:
+                df[db] = pd.to_datetime(df[db], errors="coerce")
+        df = df.rename(columns={db: sheet for sheet, db, _ in columns})
+        if not extras.empty and len(extras.columns):
+            df = df.join(extras)
+        return df
+
+    def frame(self, table):
+        """The table with its spreadsheet column names, indexed by row id."""
+        revision = self.revision(table)
+        with self._lock:
+            cached = self._frames.get(table)
+        if cached is not None and cached[0] == revision:
+            return cached[1].copy()
+        df = self._read(table)
+        with self._lock:
+            self._frames[table] = (revision, df)
+        return df.copy()
+
+    def rows_after(self, table, after_id):
+        """Rows with an id above ``after_id``, as ``frame()`` shows them; with
+        ``rewrites()`` unchanged these are exactly the rows added since."""
+        return self._read(table, after_id)
+
+    def editor_frame(self, table):
+        """``frame()`` for ``st.data_editor``: a RangeIndex with the row id as
+        an ``id`` column (show it disabled or hidden)."""
+        return self.frame(table).reset_index()
+
+    # --- Writing ---
+    def _record(self, table, row):
+        _, _, columns = TABLES[table]
+        known = {sheet for sheet, _, _ in columns}
+        values = {db: _db_value(row.get(sheet), db) for sheet, db, _ in columns if sheet in row}
+        extra = {str(k): _json_value(v) for k, v in row.items() if k not in known and k not in EDITOR_KEYS}
+        extra = {k: v for k, v in extra.items() if v is not None}
+        if extra:
+            values["extra"] = json.dumps(extra)
+        return values
+
+    def _upsert(self, conn, table, row, row_id=None):
+        """Write one row; returns whether it may have replaced an existing one."""
+        _, natural_key, _ = TABLES[table]
+        values = self._record(table, row)
+        if row_id is not None:
+            values["id"] = int(row_id)
+            conflict = "id"
+        elif natural_key and values.get(natural_key) is not None:
+            conflict = natural_key
+        else:
+            conflict = None
+        names = list(values)
+        sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+        if conflict:
+            updates = [f"{name} = excluded.{name}" for name in names if name != conflict]
+            updates.append("updated_at = datetime('now')")
+            sql += f" ON CONFLICT({conflict}) DO UPDATE SET {', '.join(updates)}"
+        conn.execute(sql, [values[name] for name in names])
+        return conflict is not None
+
+    def upsert(self, table, rows):
+        """Insert or update ``rows`` (dicts keyed by sheet column; an ``id``
+        entry updates that row) in one transaction."""
+        with self.transaction() as conn:
+            rewrite = False
+            for row in rows:
+                rewrite |= self._upsert(conn, table, row, row.get("id"))
+            self._bump(conn, table, rewrite)
+
+    def delete(self, table, ids):
+        with self.transaction() as conn:
+            conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(int(i),) for i in ids])
+            self._bump(conn, table, rewrite=True)
+
+    def apply_edits(self, table, df, changes):
+        """Save an ``st.data_editor`` change set made against ``df`` (an
+        ``editor_frame()`` result) as row-level upserts and deletes.
+
+        Returns the number of rows written or removed.
+        """
+        ids = df["id"]
+        edited = changes.get("edited_rows", {})
+        added = changes.get("added_rows", [])
+        deleted = changes.get("deleted_rows", [])
+        with self.transaction() as conn:
+            for position, values in edited.items():
+                self._upsert(conn, table, dict(df.iloc[int(position)]) | values, ids.iloc[int(position)])
+            for values in added:
+                values = {k: v for k, v in values.items() if k not in EDITOR_KEYS}
+                if any(v not in (None, "") for v in values.values()):
+                    self._upsert(conn, table, values)
+            conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(int(ids.iloc[p]),) for p in deleted])
+            self._bump(conn, table, rewrite=bool(edited or deleted))
+        return len(edited) + len(added) + len(deleted)
+
+    # --- Bulk xlsx import and export ---
+    def _import(self, conn, table, df, rewrite=False):
+        df = df.rename(columns=lambda c: str(c).strip())  # e.g. "contacted " in the biobank list
+        optional = OPTIONAL_COLUMNS.get(table, set()) | {"notes"}
+        required = [sheet for sheet, db, _ in TABLES[table][2] if db not in optional]
+        if not all(col in df.columns for col in required):
+            raise ValueError(f"Excel file must contain these columns: {required}")
+        records = df.to_dict("records")
+        for row in records:
+            rewrite |= self._upsert(conn, table, row)
+        self._bump(conn, table, rewrite)
+        return len(records)
+
+    def import_frame(self, table, df, replace=False):
+        """Load a sheet's rows in one transaction; ``replace`` clears the table first."""
+        with self.transaction() as conn:
+            if replace:
+                conn.execute(f"DELETE FROM {table}")
+            return self._import(conn, table, df, rewrite=replace)
+
+    def import_xlsx(self, table, source, replace=False):
+        df = read_excel(source) if isinstance(source, (str, Path)) else pd.read_excel(source)
+        return self.import_frame(table, df, replace=replace)
+
+    def seed(self, table):
+        """Fill an empty table from its workbook, if there is one (first run).
+
+        The emptiness check and the import share one write transaction, so
+        sessions (or processes) that start together seed the table once.
+        """
+        if TABLES[table][0] is None:
+            return
+        source = Path(TABLES[table][0])
+        if self.count(table) or not source.exists():
+            return
+        df = read_excel(source)
+        with self.transaction() as conn:
+            if self.count(table) == 0:  # same connection, so inside the transaction
+                self._import(conn, table, df)
+
+    def export_frame(self, table):
+        """The table as it would be written back to its workbook."""
+        return self.frame(table).reset_index(drop=True)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=DB_PATH):
+    """The shared ``Store`` for ``path`` (one per process)."""
+    key = str(Path(path).resolve())
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = Store(path)
+        return _stores[key]
@@ -0,0 +1,300 @@
+"""Indexed view of the lab supply inventory (``MMCCCL_supply_oct2025.xlsx``).
+
+The sheet lists one row per lot: analyzer platform, item, catalog number,
+lot number, expiration, quantity and storage location. ``SupplyInventory``
+builds hash indexes on catalog number, lot number and location so bench
+lookups ("where is lot X", "how many of catalog Y", "what's in Fridge2") are
+dictionary hits, and precomputes the low-stock and expiry views once per
+version of the file.
+
+Scan check-ins and check-outs are saved in the store's
+``supply_adjustments`` table and re-applied on top of the workbook whenever
+it is loaded, so they survive restarts and reloads of a changed file. Each
+is saved with the ``lot_ids`` identity of the row it changed, so replaying a
+catalog-number check-out does not have to guess its lot again. An
+adjustment patches the indexes and views it affects in place.
+"""
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_cache import fingerprint
+from ingest import read_sheet, snapshot_info
+from store import get_store
+
+SUPPLY_FILE = Path("MMCCCL_supply_oct2025.xlsx")
+
+COLUMN_NAMES = {
+    "platform": "platform",
+    "item": "item",
+    "minimum_stock_level": "min_stock",
+    "cat_no.": "catalog_no",
+    "expiration": "expiration",
+    "lot #": "lot",
+    "Tests_per_Cart": "pack_size",
+    "quantity": "quantity",
+    "location": "location",
+    "shelf": "shelf",
+    "order_unit": "order_unit",
+    "removed_date": "removed_date",
+}
+
+
+def normalize_code(value):
+    """Canonical form of a catalog or lot number, as typed or scanned."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = re.sub(r"\s+", "", str(value)).upper()
+    return re.sub(r"\.0$", "", text) or None
+
+
+def normalize_location(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    text = " ".join(str(value).split())
+    # "Fridge 2" and "Fridge2" are the same fridge.
+    text = re.sub(r"^fridge\s*(\d+)$", r"Fridge\1", text, flags=re.IGNORECASE)
+    return text or None
+
+
+def prepare_supply(raw):
+    df = raw.rename(columns=COLUMN_NAMES)
+    df = df[[c for c in COLUMN_NAMES.values() if c in df.columns]].copy()
+    df["catalog_no"] = df["catalog_no"].map(normalize_code)
+    df["lot"] = df["lot"].map(normalize_code)
+    df["location"] = df["location"].map(normalize_location)
+    df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce").fillna(0)
+    df["min_stock"] = pd.to_numeric(df["min_stock"], errors="coerce")
+    df["expiration"] = pd.to_datetime(df["expiration"], errors="coerce")
+    df["removed_date"] = pd.to_datetime(df["removed_date"], errors="coerce")
+    # Rows with a removal date are kept for history but are no longer stock.
+    df["in_stock"] = df["removed_date"].isna()
+    return df.reset_index(drop=True)
+
+
+def lot_ids(df):
+    """Identity of each lot row, saved with its adjustments: catalog number,
+    lot number, expiration and location (one lot can sit in several places)."""
+    parts = [df["catalog_no"], df["lot"], df["expiration"].dt.strftime("%Y-%m-%d"), df["location"]]
+    parts = [part.astype(object).where(part.notna(), "").astype(str) for part in parts]
+    return parts[0].str.cat(parts[1:], sep="|")
+
+
+def _soonest_match(df, catalog_no, lot):
+    # The row adjust() picks for a code: the soonest-expiring matching row.
+    match = df["in_stock"].to_numpy() & (df["lot"].isna() if pd.isna(lot) else df["lot"] == lot).to_numpy()
+    if not pd.isna(catalog_no):
+        match &= (df["catalog_no"] == catalog_no).to_numpy()
+    positions = np.flatnonzero(match)
+    if not len(positions):
+        return None
+    return positions[np.argsort(df["expiration"].to_numpy()[positions], kind="stable")][0]
+
+
+def apply_adjustments(df, adjustments):
+    """Add saved check-ins and check-outs (a ``supply_adjustments`` frame)
+    to the lot rows they were made on; a lot never drops below zero.
+
+    Adjustments are matched on their ``Lot ID``. Ones saved without it, or
+    whose row has left the workbook, go to the soonest-expiring row with
+    their catalog and lot number.
+    """
+    if adjustments is None or adjustments.empty:
+        return df
+    stock = df["in_stock"].to_numpy()
+    by_id = pd.Series(np.flatnonzero(stock), index=lot_ids(df)[stock].to_numpy())
+    by_id = by_id[~by_id.index.duplicated()]
+    adjustments = adjustments.reindex(columns=["Lot ID", "Catalog #", "Lot #", "Change"])
+    changes = adjustments.groupby(["Lot ID", "Catalog #", "Lot #"], dropna=False, sort=False)["Change"].sum()
+    for (lot_id, catalog_no, lot), change in changes.items():
+        position = by_id.get(lot_id) if not pd.isna(lot_id) else None
+        if position is None:
+            position = _soonest_match(df, catalog_no, lot)
+        if position is not None:
+            df.at[position, "quantity"] = max(df.at[position, "quantity"] + change, 0)
+    return df
+
+
+def _hash_index(series):
+    index = {}
+    for position, key in enumerate(series):
+        if not pd.isna(key):
+            index.setdefault(key, []).append(position)
+    return {key: np.array(rows) for key, rows in index.items()}
+
+
+class SupplyInventory:
+    def __init__(self, df, store=None):
+        self._lock = threading.Lock()
+        self.df = df
+        self.store = store
+        self.version = 0
+        self._rebuild()
+
+    def _rebuild(self):
+        stock = self.df[self.df["in_stock"]]
+        self.by_catalog = _hash_index(self.df["catalog_no"].where(self.df["in_stock"], None))
+        self.by_lot = _hash_index(self.df["lot"].where(self.df["in_stock"], None))
+        self.by_location = _hash_index(self.df["location"].where(self.df["in_stock"], None))
+        self.catalog_totals = stock.groupby("catalog_no")["quantity"].sum().to_dict()
+
+        # A catalog number's minimum is recorded on one of its lot rows only.
+        levels = stock.groupby("catalog_no").agg(
+            platform=("platform", "first"),
+            item=("item", "first"),
+            min_stock=("min_stock", "max"),
+            quantity=("quantity", "sum"),
+            lots=("lot", "nunique"),
+            next_expiration=("expiration", "min"),
+        ).reset_index()
+        self._levels = levels.set_index("catalog_no")
+        self._lot_ids = lot_ids(self.df).to_numpy()
+        self._refresh_low_stock()
+        self._refresh_expiry()
+
+    def _refresh_expiry(self):
+        # Positions of the in-stock lots with units left, soonest expiry first.
+        expiration = self.df["expiration"].to_numpy()
+        listed = self.df["in_stock"].to_numpy() & (self.df["quantity"].to_numpy() > 0) & ~np.isnat(expiration)
+        positions = np.flatnonzero(listed)
+        self._expiry_positions = positions[np.argsort(expiration[positions], kind="stable")]
+        self._expiry_dates = expiration[self._expiry_positions]
+
+    def _patch_expiry(self, position, old, new):
+        """List or unlist ``position`` in the expiry view when its quantity
+        crosses zero."""
+        if (old > 0) == (new > 0):
+            return
+        date = self.df["expiration"].to_numpy()[position]
+        if np.isnat(date):
+            return
+        lo = np.searchsorted(self._expiry_dates, date, side="left")
+        hi = np.searchsorted(self._expiry_dates, date, side="right")
+        # Lots expiring on the same day stay in sheet order.
+        at = lo + np.searchsorted(self._expiry_positions[lo:hi], position)
+        if new > 0:
+            self._expiry_positions = np.insert(self._expiry_positions, at, position)
+            self._expiry_dates = np.insert(self._expiry_dates, at, date)
+        else:
+            self._expiry_positions = np.delete(self._expiry_positions, at)
+            self._expiry_dates = np.delete(self._expiry_dates, at)
+
+    def _refresh_low_stock(self):
+        levels = self._levels
+        low = levels[levels["quantity"] < levels["min_stock"].fillna(0)]
+        self.low_stock = low.reset_index().sort_values("item")
+
+    def _patch_low_stock(self, catalog_no, old_total, new_total):
+        minimum = self._levels.at[catalog_no, "min_stock"]
+        minimum = 0 if pd.isna(minimum) else minimum
+        if (old_total < minimum) != (new_total < minimum):
+            self._refresh_low_stock()
+        elif new_total < minimum:
+            # A new frame rather than an edit: other sessions may be showing this one.
+            low = self.low_stock.copy()
+            low.loc[low["catalog_no"] == catalog_no, "quantity"] = new_total
+            self.low_stock = low
+
+    def _rows(self, index, key):
+        positions = index.get(key)
+        if positions is None:
+            return self.df.iloc[0:0]
+        return self.df.iloc[positions]
+
+    def where_is_lot(self, lot):
+        return self._rows(self.by_lot, normalize_code(lot))
+
+    def catalog_count(self, catalog_no):
+        return self.catalog_totals.get(normalize_code(catalog_no), 0)
+
+    def catalog_rows(self, catalog_no):
+        return self._rows(self.by_catalog, normalize_code(catalog_no))
+
+    def at_location(self, location):
+        return self._rows(self.by_location, normalize_location(location))
+
+    def locations(self):
+        return sorted(self.by_location)
+
+    def expiring(self, within_days=30, today=None):
+        """In-stock lots expiring within ``within_days`` (already expired included)."""
+        today = pd.Timestamp.today().normalize() if today is None else pd.Timestamp(today)
+        cutoff = np.datetime64(today + pd.Timedelta(days=within_days))
+        stop = np.searchsorted(self._expiry_dates, cutoff, side="right")
+        return self.df.iloc[self._expiry_positions[:stop]]
+
+    def _soonest_expiring(self, positions):
+        return positions[np.argsort(self.df["expiration"].to_numpy()[positions], kind="stable")]
+
+    def adjust(self, code, delta):
+        """Add ``delta`` units to the lot matching ``code`` (a lot number, or a
+        catalog number meaning its soonest-expiring lot; for a check-out, its
+        soonest-expiring lot that has units left).
+
+        The change is saved to the store, when there is one, and patched into
+        the catalog totals and the low-stock and expiry views in place.
+        Returns the updated row, or None when nothing matches; raises
+        ValueError when a check-out asks for more units than are in stock.
+        """
+        key = normalize_code(code)
+        with self._lock:
+            positions = self.by_lot.get(key)
+            if positions is None:
+                positions = self.by_catalog.get(key)
+                if positions is not None:
+                    positions = self._soonest_expiring(positions)
+                    if delta < 0:
+                        stocked = positions[self.df["quantity"].to_numpy()[positions] >= -delta]
+                        if not len(stocked):
+                            raise ValueError(f"No units of catalog # {key} are in stock.")
+                        positions = stocked
+            if positions is None:
+                return None
+            position = positions[0]
+            old = self.df.at[position, "quantity"]
+            if old + delta < 0:
+                raise ValueError(f"Lot {key} has {old:g} units in stock; cannot check out {-delta}.")
+            new = old + delta
+            catalog_no = self.df.at[position, "catalog_no"]
+            if self.store is not None:
+                self.store.upsert("supply_adjustments", [{
+                    "Scanned At": pd.Timestamp.now().isoformat(timespec="seconds"),
+                    "Code": key,
+                    "Catalog #": catalog_no,
+                    "Lot #": self.df.at[position, "lot"],
+                    "Change": delta,
+                    "Lot ID": self._lot_ids[position],
+                }])
+            self.df.at[position, "quantity"] = new
+            if not pd.isna(catalog_no):
+                total = self.catalog_totals.get(catalog_no, 0)
+                self.catalog_totals[catalog_no] = total + new - old
+                self._levels.at[catalog_no, "quantity"] = total + new - old
+                self._patch_low_stock(catalog_no, total, total + new - old)
+            self._patch_expiry(position, old, new)
+            self.version += 1
+            return self.df.iloc[position]
+
+
+_inventory = {}
+_inventory_lock = threading.Lock()
+
+
+def load_supply(path=SUPPLY_FILE, store=None):
+    """Shared ``SupplyInventory`` with the saved check-ins and check-outs in
+    ``store`` (the shared store by default) applied, rebuilt only when the
+    workbook changes."""
+    store = get_store() if store is None else store
+    version = (str(Path(path).resolve()), fingerprint(path), str(store.path.resolve()))
+    with _inventory_lock:
+        if _inventory.get("version") != version:
+            sheet = next(iter(snapshot_info(path)))
+            df = apply_adjustments(prepare_supply(read_sheet(path, sheet)), store.frame("supply_adjustments"))
+            _inventory["inventory"] = SupplyInventory(df, store=store)
+            _inventory["version"] = version
+        return _inventory["inventory"]
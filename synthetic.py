@@ -0,0 +1,283 @@
+"""Synthetic stand-ins for the dashboard's source workbooks.
+
+Used by ``benchmark.py`` to time the loaders and views at sizes the real
+files have not reached yet. Each generator returns a frame shaped like the
+real sheet (same column names, similar value vocabularies and skew), and
+``write_workbook`` writes frames to xlsx, with an optional preamble above the
+header the way the vendor exports have one. Everything is seeded, so a size
+always produces the same data.
+"""
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+# Roughly the mix in lab_record.xlsx: FFPE work dominates, IHC is rarer.
+SERVICES = {
+    "FFPE Processing & Embedding": ("Formalin fixed tissue", 0.22),
+    "FFPE sectioning & H&E slide": ("Formalin fixed tissue", 0.30),
+    "Frozen Sectioning & H&E slide": ("Frozen Tissue (OCT)", 0.18),
+    "Unstained slides": ("FFPE block", 0.15),
+    "IHC staining": ("FFPE slide", 0.10),
+    "Special stain": ("FFPE slide", 0.05),
+}
+ETHNICITIES = ["Caucasian", "African American", "Asian", "Hispanic", "Black", "white", "VIETNAMESE", None]
+STAGES = ["I", "IA", "IIA", "IIB", "IIIA", "IIIB", "IIIC", "IV", None]
+GRADES = ["G1", "G2", "G3", None]
+RECEPTORS = ["Positive", "Negative", None]
+HER2 = ["0", "1+", "2+", "3+", "Negative 2+", None]
+PLATFORMS = ["Leica Bond", "Ventana", "Sakura", "General"]
+LOCATIONS = ["Fridge1", "Fridge 2", "Freezer A", "Freezer B", "Shelf 1", "Shelf 2", "Cabinet"]
+
+
+def _rng(seed):
+    return np.random.default_rng(seed)
+
+
+def lab_records(rows, years=5, requesters=60, seed=0):
+    """Delivered-service log: Zipf-skewed requesters, weighted services, dates
+    over ``years`` of weekdays with volume growing over time."""
+    rng = _rng(seed)
+    names = np.array([f"Dr. Requester {i:03d}" for i in range(requesters)])
+    weights = 1 / np.arange(1, requesters + 1) ** 1.1
+    services = list(SERVICES)
+    service_p = np.array([SERVICES[s][1] for s in services])
+    days = pd.bdate_range(end="2025-10-31", periods=int(years * 261))
+    # Later days are busier: sample day positions from a rising ramp.
+    day_p = np.linspace(1, 3, len(days))
+    service = rng.choice(len(services), rows, p=service_p / service_p.sum())
+    df = pd.DataFrame({
+        "Date": days[np.sort(rng.choice(len(days), rows, p=day_p / day_p.sum()))],
+        "Requester Name": names[rng.choice(requesters, rows, p=weights / weights.sum())],
+        "Service Type": np.array(services)[service],
+        "Sample Type": np.array([SERVICES[s][0] for s in services])[service],
+        "Quantity": rng.geometric(1 / 25, rows),
+        "Notes": np.where(rng.random(rows) < 0.1, "same batch", None),
+    })
+    return df
+
+
+def bioivt_sheets(rows, seed=1):
+    """BioIVT stock: three format sheets, each with sales status and pricing."""
+    rng = _rng(seed)
+    sheets = {}
+    for offset, (sheet, fmt) in enumerate([("frozen", "Fresh Frozen"), ("frozen inprocessing", "Fresh Frozen"),
+                                           ("ffpe", "FFPE")]):
+        n = max(1, rows // 3)
+        cases = rng.integers(10000, 400000, n)
+        sheets[sheet] = pd.DataFrame({
+            "Sales Status": rng.choice(["available", "in processing", "section only", "on hold"], n),
+            "Repository": "R130",
+            "Product Code": [f"HUMANBREAST-{i:07d}" for i in range(offset * n, (offset + 1) * n)],
+            "Price USD\n(EA or per mL)": rng.choice([700, 1300, 1600], n),
+            "Case ID": cases,
+            "Specimen ID": [f"{c}{'F' if fmt != 'FFPE' else 'B'}{i % 9 + 1}" for i, c in enumerate(cases)],
+            "Format": fmt,
+            "Tissue": "Breast",
+            "Biosample Diagnosis": rng.choice(["Infiltrating ductal carcinoma", "Lobular carcinoma"], n),
+            "Tumor Grade": rng.choice(GRADES, n),
+            "Age At Excision": rng.integers(28, 90, n),
+            "Sex": "Female",
+            "Ethnicity": rng.choice(ETHNICITIES, n),
+            "AJCC/UICC Stage Group": rng.choice(STAGES, n),
+            "ER": rng.choice(RECEPTORS, n),
+            "PR": rng.choice(RECEPTORS, n),
+            "Hercep Test": rng.choice(HER2, n),
+        })
+    return sheets
+
+
+def cureline_sheets(rows, seed=2):
+    """Cureline stock: a case-level inventory plus the specimen-level sheet."""
+    rng = _rng(seed)
+    cases = [f"CU{rng.integers(100000, 999999)}-{i:05d}" for i in range(max(1, rows // 12))]
+    case = rng.choice(len(cases), rows)
+    specimen = pd.DataFrame({
+        "Name": [f"SPEC-{i:07d}" for i in range(rows)],
+        "UID": np.arange(rows),
+        "Sample Type": "Tissue",
+        "Freezer": rng.choice(["NEW STEEL CAB #2", "FREEZER 7"], rows),
+        "Cureline Specimen ID": [f"{cases[c]}-S{i}" for i, c in enumerate(case)],
+        "Specimen Format": rng.choice(["FFPE", "Fresh Frozen"], rows, p=[0.7, 0.3]),
+        "# of Containers": rng.integers(1, 4, rows).astype(float),
+        "Specimen Status": rng.choice(["Available", "Reserved"], rows, p=[0.75, 0.25]),
+        "Cureline Case ID": np.array(cases)[case],
+        "Patient Sex": "Female",
+        "Patient Age": rng.integers(28, 90, rows),
+        "Patient Ethnicity": rng.choice(ETHNICITIES, rows),
+        "Path Diagnosis": "Infiltrating ductal carcinoma - NOS",
+        "Tumor Grade": rng.choice(GRADES, rows),
+        "Cancer Stage": rng.choice(STAGES, rows),
+        "ER Receptor": rng.choice(RECEPTORS, rows),
+        "PR Receptor": rng.choice(RECEPTORS, rows),
+        "HER2 Receptor": rng.choice(HER2, rows),
+    })
+    inventory = pd.DataFrame({
+        "Index": np.arange(1, len(cases) + 1),
+        "Cureline Case ID": cases,
+        "Clinical Site": "Site 137",
+        "All Diagnosis": "Breast carcinoma",
+        "FFPE # of Blocks": rng.integers(0, 4, len(cases)).astype(float),
+        "FF # of tissues": rng.integers(0, 3, len(cases)).astype(float),
+        "Specimen Format": "FFPE",
+        "Patient Age": rng.integers(28, 90, len(cases)),
+        "Patient Ethnicity": rng.choice(ETHNICITIES, len(cases)),
+    })
+    return {"TNBC inventory": inventory, "tnbc": specimen}
+
+
+def reprocell_sheet(rows, seed=3):
+    """Reprocell stock: aliquots ``ID(n)`` where only the first carries clinical data."""
+    rng = _rng(seed)
+    records = []
+    donor = 0
+    while len(records) < rows:
+        donor += 1
+        aliquots = int(rng.integers(1, 4))
+        for n in range(1, aliquots + 1):
+            first = n == 1
+            records.append({
+                "Sample ID": f"{donor:07d}T2({n})",
+                "Sex": "F" if first else None,
+                "Age": float(rng.integers(28, 90)) if first else None,
+                "Ethnicity": rng.choice(ETHNICITIES[:-1]) if first else None,
+                "Sample type": "FF" if first else "FFPE",
+                "Tissue type": "breast" if first else None,
+                "Histological diagnosis": "infiltrating ductal carcinoma" if first else None,
+                "Grade": rng.choice(GRADES[:-1]) if first else None,
+                "Stage": rng.choice(STAGES[:-1]) if first else None,
+                "ER.1": rng.choice(["negative", "positive"]) if first else None,
+                "PR.1": rng.choice(["negative", "positive"]) if first else None,
+                "Her2 IHC": rng.choice(HER2[:-1]) if first else None,
+                "Tumor content %": int(rng.integers(40, 100)),
+            })
+    return pd.DataFrame(records[:rows])
+
+
+def reprocell2_sheet(rows, seed=4):
+    """Second Reprocell biobank export (one row per labelled block)."""
+    rng = _rng(seed)
+    donors = [f"D{i:05d}" for i in range(max(1, rows // 3))]
+    donor = rng.choice(len(donors), rows)
+    er = rng.choice(["Neg", "Pos"], rows)
+    pr = rng.choice(["Neg", "Pos"], rows)
+    return pd.DataFrame({
+        "Study": "TripNeg_BREAST_4_1",
+        "Mat Type": rng.choice(["FFPE BLOCK", "TISSUE SNAP FROZEN"], rows),
+        "Sample_id": np.array(donors)[donor],
+        "Current_Label": [f"{donors[d]}L{i:06d}" for i, d in enumerate(donor)],
+        "Volume": 1.0,
+        "Cancer_Stage": [f"STAGE {s}" for s in rng.choice(["I", "II", "III", "IV"], rows)],
+        "RECEPTORS": [f"ER({e}) / PR ({p})" for e, p in zip(er, pr)],
+        "HER_2_NEU_IMMUNO": rng.choice(["Negative (0)", "Equivocal (2+)", "Positive (3+)"], rows),
+        "Tissue Diag": "Infiltrating ductal carcinoma(BREAST07)",
+        "age": rng.integers(28, 90, rows),
+        "gender": "FEMALE",
+        "Ethnicity": rng.choice(["VIETNAMESE", "AFRICAN AMERICAN", "CAUCASIAN", "HISPANIC"], rows),
+    })
+
+
+def supply_sheet(rows, seed=5):
+    """Supply inventory: lots of a smaller set of catalog numbers across locations."""
+    rng = _rng(seed)
+    catalogs = [f"{rng.integers(100000, 999999)}" for _ in range(max(1, rows // 4))]
+    catalog = rng.choice(len(catalogs), rows)
+    expiration = pd.Timestamp("2025-10-01") + pd.to_timedelta(rng.integers(-60, 720, rows), unit="D")
+    removed = np.where(rng.random(rows) < 0.15, pd.Timestamp("2025-09-01"), pd.NaT)
+    return pd.DataFrame({
+        "platform": rng.choice(PLATFORMS, rows),
+        "item": [f"Reagent {c}" for c in np.array(catalogs)[catalog]],
+        "minimum_stock_level": np.where(rng.random(rows) < 0.3, rng.integers(1, 10, rows), None),
+        "cat_no.": np.array(catalogs)[catalog],
+        "expiration": expiration,
+        "lot #": [f"L{i:07d}" for i in range(rows)],
+        "Tests_per_Cart": rng.choice([50, 100, 250], rows),
+        "quantity": rng.integers(0, 12, rows),
+        "location": rng.choice(LOCATIONS, rows),
+        "shelf": rng.integers(1, 6, rows),
+        "order_unit": "box",
+        "removed_date": removed,
+    })
+
+
+def ffpe_repository(rows, seed=6):
+    """FFPE block repository: one row per block."""
+    rng = _rng(seed)
+    return pd.DataFrame({
+        "Block ID": [f"FFPE-{i:07d}" for i in range(rows)],
+        "Cancer Type": rng.choice(["Breast", "Prostate", "Colon", "Lung", "Pancreas"], rows,
+                                  p=[0.4, 0.2, 0.2, 0.15, 0.05]),
+        "Quantity": rng.integers(1, 6, rows),
+        "Notes": None,
+    })
+
+
+def price_schedule(years=5, seed=7):
+    """Internal and external unit prices per service, revised every January,
+    plus a sample-type-specific IHC rate."""
+    rng = _rng(seed)
+    base = rng.choice([4.5, 12.0, 35.0], len(SERVICES))
+    rows = []
+    for year in range(2025 - years, 2026):
+        for (service, (sample_type, _)), price in zip(SERVICES.items(), base):
+            for tier, markup in (("Internal", 1.0), ("External", 1.6)):
+                rows.append((pd.Timestamp(year, 1, 1), service, "", tier,
+                             round(price * markup * 1.03 ** (year - 2025 + years), 2)))
+        rows.append((pd.Timestamp(year, 1, 1), "IHC staining", "FFPE slide", "External", 80.0))
+    return pd.DataFrame(rows, columns=["Effective Date", "Service Type", "Sample Type", "Tier", "Unit Price"])
+
+
+def requester_tiers(requesters=60, external=0.2, seed=7):
+    """Rate tier per synthetic requester (``lab_records`` names)."""
+    rng = _rng(seed)
+    return pd.DataFrame({
+        "Requester Name": [f"Dr. Requester {i:03d}" for i in range(requesters)],
+        "Tier": np.where(rng.random(requesters) < external, "External", "Internal"),
+    })
+
+
+def write_workbook(path, sheets, preamble=None):
+    """Write ``{sheet: frame}`` to ``path``; ``preamble`` rows go above each header."""
+    workbook = xlsxwriter.Workbook(str(path), {"constant_memory": True})
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+    for sheet_name, df in sheets.items():
+        worksheet = workbook.add_worksheet(sheet_name[:31])
+        row = 0
+        for line in preamble or []:
+            worksheet.write_row(row, 0, line)
+            row += 1
+        worksheet.write_row(row, 0, [str(c) for c in df.columns])
+        values = df.astype(object).where(df.notna(), None)
+        for record in values.itertuples(index=False, name=None):
+            row += 1
+            for col, value in enumerate(record):
+                if isinstance(value, pd.Timestamp):
+                    worksheet.write_datetime(row, col, value.to_pydatetime(), date_format)
+                elif value is not None:
+                    worksheet.write(row, col, value)
+    workbook.close()
+    return path
+
+
+def write_dataset(directory, rows, seed=0):
+    """Write every synthetic source workbook at ``rows`` scale into ``directory``.
+
+    Vendor and supply sheets are scaled down from the service-log size the
+    way the real files are (the service log grows fastest).
+    """
+    vendor_rows = max(50, rows // 10)
+    paths = {
+        "lab_record": directory / "lab_record.xlsx",
+        "BioIVT": directory / "BioIVT_stock.xlsx",
+        "Cureline": directory / "Cureline_breast_cancer_stock.xlsx",
+        "Reprocell": directory / "reprocell_breast_stock.xlsx",
+        "Reprocell 2": directory / "reprocell_biobank_2.xlsx",
+        "supply": directory / "MMCCCL_supply_oct2025.xlsx",
+    }
+    write_workbook(paths["lab_record"], {"Sheet1": lab_records(rows, seed=seed)})
+    write_workbook(paths["BioIVT"], bioivt_sheets(vendor_rows, seed=seed + 1),
+                   preamble=[["Search Results"], ["Output Date:10/24/2025"], []])
+    write_workbook(paths["Cureline"], cureline_sheets(vendor_rows, seed=seed + 2))
+    write_workbook(paths["Reprocell"], {"Sheet1": reprocell_sheet(vendor_rows, seed=seed + 3)})
+    write_workbook(paths["Reprocell 2"], {"Tissue": reprocell2_sheet(vendor_rows, seed=seed + 4)})
+    write_workbook(paths["supply"], {"Sheet1": supply_sheet(max(50, rows // 20), seed=seed + 5)})
+    return paths
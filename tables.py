@@ -0,0 +1,123 @@
+"""Server-side paging for the dashboard's large tables.
+
+``st.dataframe`` serialises every row and column it is given on every rerun.
+``PagedTable`` wraps a cached frame and answers page requests instead: the
+search filter and sort run here, against the frame's columns, and only the
+requested page of the selected columns is handed to Streamlit. Sort orders
+and search masks are memoized per table, so paging through a sorted,
+filtered view is a slice of a cached index array.
+"""
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_cache import fingerprint
+
+PAGE_SIZES = [25, 50, 100, 250]
+MAX_TABLES = 32
+MAX_SEARCHES = 8
+
+
+class PagedTable:
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.columns = [str(c) for c in self.df.columns]
+        self.df.columns = self.columns
+        self._column_positions = {c: i for i, c in reversed(list(enumerate(self.columns)))}
+        self._text = None
+        self._orders = {}
+        self._masks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.df)
+
+    def _row_text(self):
+        # Lower-cased text of every cell joined per row; built on first search.
+        if self._text is None:
+            parts = [self.df[c].astype(str).str.lower().where(self.df[c].notna(), "") for c in self.columns]
+            text = parts[0].str.cat(parts[1:], sep="\x00") if parts else pd.Series([], dtype=str)
+            self._text = text.to_numpy(dtype=object)
+        return self._text
+
+    def _mask(self, search):
+        with self._lock:
+            if search in self._masks:
+                self._masks.move_to_end(search)
+                return self._masks[search]
+        needle = search.lower()
+        mask = np.fromiter((needle in row for row in self._row_text()), dtype=bool, count=len(self.df))
+        with self._lock:
+            self._masks[search] = mask
+            while len(self._masks) > MAX_SEARCHES:
+                self._masks.popitem(last=False)
+        return mask
+
+    def _order(self, column, ascending):
+        key = (column, ascending)
+        if key not in self._orders:
+            values = self.df[column]
+            try:
+                order = values.sort_values(ascending=ascending, na_position="last", kind="stable").index
+            except TypeError:
+                # Mixed types in a column that was not normalised; compare as text.
+                text = values.astype(str).where(values.notna())
+                order = text.sort_values(ascending=ascending, na_position="last", kind="stable").index
+            self._orders[key] = order.to_numpy()
+        return self._orders[key]
+
+    def query(self, columns=None, sort=None, ascending=True, search="", page=1, page_size=50):
+        """One page of the table: ``(frame, matching row count)``.
+
+        ``page`` is 1-based and clamped to the last page.
+        """
+        columns = [self._column_positions[c] for c in (columns or self.columns) if c in self._column_positions]
+        positions = self._order(sort, ascending) if sort in self.columns else None
+        search = search.strip()
+        if search:
+            mask = self._mask(search)
+            positions = np.flatnonzero(mask) if positions is None else positions[mask[positions]]
+        total = len(self.df) if positions is None else len(positions)
+        pages = max(1, -(-total // page_size))
+        start = (min(max(page, 1), pages) - 1) * page_size
+        # Rows first: self.df[columns], like .iloc[rows, columns], copies
+        # every row of the chosen columns before the page is cut out.
+        rows = slice(start, start + page_size) if positions is None else positions[start:start + page_size]
+        return self.df.iloc[rows].iloc[:, columns], total
+
+
+_tables = OrderedDict()
+_tables_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def paged_table(key, build):
+    """Shared ``PagedTable`` for ``key`` (which must include the data's version)."""
+    with _tables_lock:
+        if key in _tables:
+            _tables.move_to_end(key)
+            stats["hits"] += 1
+            return _tables[key]
+    table = PagedTable(build())
+    with _tables_lock:
+        stats["misses"] += 1
+        _tables[key] = table
+        while len(_tables) > MAX_TABLES:
+            _tables.popitem(last=False)
+    return table
+
+
+def file_table(path, name, load):
+    """``PagedTable`` over ``load()``, rebuilt only when ``path`` changes."""
+    return paged_table((str(Path(path).resolve()), name, fingerprint(path)), load)
+
+
+def invalidate(path):
+    """Drop the ``file_table``s of every version of ``path``."""
+    resolved = str(Path(path).resolve())
+    with _tables_lock:
+        for key in [k for k in _tables if k[0] == resolved]:
+            del _tables[key]
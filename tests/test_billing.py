@@ -0,0 +1,73 @@
+import pandas as pd
+
+from billing import RecoveryCosts, price_rows, prepare_schedule, prepare_tiers
+
+
+def daily(rows):
+    """Daily rollup rows from ``(date, requester, service, sample type, quantity)``."""
+    df = pd.DataFrame(rows, columns=["Date", "Requester Name", "Service Type", "Sample Type", "Quantity"])
+    return df.assign(Date=pd.to_datetime(df["Date"]), Entries=1)
+
+
+def schedule(rows):
+    return pd.DataFrame(rows, columns=["Effective Date", "Service Type", "Sample Type", "Tier", "Unit Price"])
+
+
+NO_TIERS = pd.DataFrame(columns=["Requester Name", "Tier"])
+
+
+def test_rows_are_priced_at_the_rate_in_effect_on_their_date():
+    rows = daily([
+        ("2024-12-31", "Dr. A", "H&E", "Tissue", 1),
+        ("2025-01-01", "Dr. A", "H&E", "Tissue", 1),
+        ("2025-03-01", "Dr. A", "H&E", "Tissue", 2),
+    ])
+    rates = schedule([
+        ("2024-01-01", "H&E", "Tissue", "Internal", 10.0),
+        ("2025-01-01", "H&E", "Tissue", "Internal", 12.0),
+    ])
+    priced = price_rows(rows, prepare_schedule(rates), prepare_tiers(NO_TIERS))
+    assert priced["Unit Price"].tolist() == [10.0, 12.0, 12.0]
+    assert priced["Cost"].tolist() == [10.0, 12.0, 24.0]
+
+
+def test_sample_type_rate_takes_precedence_over_the_service_rate():
+    rows = daily([
+        ("2025-02-01", "Dr. A", "IHC", "Tissue", 1),
+        ("2025-02-01", "Dr. A", "IHC", "Cells", 1),
+        ("2025-02-01", "Dr. A", "Special Stain", "Tissue", 1),
+    ])
+    rates = schedule([
+        ("2025-01-01", "IHC", "", "Internal", 30.0),
+        ("2025-01-01", "IHC", "Tissue", "Internal", 45.0),
+    ])
+    priced = price_rows(rows, prepare_schedule(rates), prepare_tiers(NO_TIERS))
+    assert priced["Unit Price"].tolist()[:2] == [45.0, 30.0]
+    assert pd.isna(priced["Unit Price"].iloc[2])
+
+
+def test_rate_and_tier_changes_reprice_only_the_rows_they_affect():
+    rows = daily([
+        ("2025-01-15", "Dr. A", "H&E", "Tissue", 1),
+        ("2025-02-15", "Dr. B", "H&E", "Tissue", 1),
+        ("2025-03-15", "Dr. A", "H&E", "Tissue", 1),
+    ])
+    rates = schedule([("2025-01-01", "H&E", "Tissue", "Internal", 10.0)])
+    costs = RecoveryCosts()
+    assert costs.update(rows, rates, NO_TIERS) == 3
+
+    raised = pd.concat([rates, schedule([("2025-03-01", "H&E", "Tissue", "Internal", 15.0)])])
+    assert costs.update(rows, raised, NO_TIERS) == 1
+    assert costs.lines["Unit Price"].tolist() == [10.0, 10.0, 15.0]
+
+    tiers = pd.DataFrame({"Requester Name": ["Dr. B"], "Tier": ["External"]})
+    external = pd.concat([raised, schedule([("2025-01-01", "H&E", "Tissue", "External", 20.0)])])
+    # The new external rate dates back to January, so every row is repriced.
+    assert costs.update(rows, external, tiers) == 3
+    assert costs.lines["Tier"].tolist() == ["Internal", "External", "Internal"]
+    assert costs.lines["Cost"].tolist() == [10.0, 20.0, 15.0]
+    assert costs.metrics()["External"] == 20.0
+
+    tiers = pd.DataFrame({"Requester Name": ["Dr. A", "Dr. B"], "Tier": ["External", "External"]})
+    assert costs.update(rows, external, tiers) == 2  # only Dr. A's rows
+    assert costs.lines["Cost"].tolist() == [20.0, 20.0, 20.0]
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog import ADAPTERS, CATALOG_COLUMNS, CATEGORIES, TissueCatalog
+from data_cache import compact
+
+# One made-up row per vendor layout, and what it should normalise to.
+VENDOR_ROWS = {
+    "BioIVT": ({
+        "Specimen ID": "S1", "Case ID": "C1", "Format": "FFPE Block", "AJCC/UICC Stage Group": "Stage IIB",
+        "Tumor Grade": "Moderately differentiated", "ER": "Positive", "PR": "Negative",
+        "Hercep Test": "Negative (1+)", "Ethnicity": "African American", "Age At Excision": 61,
+        "Sales Status": "Available", "Price USD\n(EA or per mL)": 250,
+    }, {"preservation": "FFPE", "stage": "IIB", "stage_group": "II", "grade": "G2", "er": "Positive",
+        "pr": "Negative", "her2_ihc": "1+", "her2": "Negative", "ethnicity": "Black or African American",
+        "available": True, "price_usd": 250}),
+    "Cureline": ({
+        "Cureline Specimen ID": "CS1", "Cureline Case ID": "CC1", "Specimen Format": "Frozen tissue",
+        "Cancer Stage": "IIIA", "Tumor Grade": "G3", "ER Receptor": "neg", "PR Receptor": "(-)",
+        "HER2 Receptor": "3+", "Patient Ethnicity": "Caucasian", "Patient Age": 48,
+        "# of Containers": 2, "Specimen Status": "Reserved",
+    }, {"preservation": "Frozen", "stage": "IIIA", "stage_group": "III", "grade": "G3", "er": "Negative",
+        "pr": "Negative", "her2_ihc": "3+", "her2": "Positive", "ethnicity": "White",
+        "available": False, "quantity": 2}),
+    "Reprocell": ({
+        "Sample ID": "R1(1)", "Sample type": "FFPE", "Stage": "I", "Grade": "G1", "ER": "pos", "PR": "pos",
+        "Her2 IHC": "2+", "Her2 FISH": "Equivocal", "Ethnicity": "Hispanic", "Age": 55,
+    }, {"donor_id": "R1", "preservation": "FFPE", "stage": "I", "stage_group": "I", "grade": "G1",
+        "er": "Positive", "pr": "Positive", "her2_ihc": "2+", "her2": "Equivocal",
+        "ethnicity": "Hispanic or Latino"}),
+    "Reprocell 2": ({
+        "Current_Label": "L1", "Sample_id": "D1", "Mat Type": "Paraffin block", "Cancer_Stage": "STAGE IV",
+        "RECEPTORS": "ER(Neg) / PR (Pos)", "HER_2_NEU_IMMUNO": "0", "Ethnicity": "Korean", "age": 70,
+        "Tissue Diag": "Carcinoma(BREAST12)",
+    }, {"preservation": "FFPE", "stage": "IV", "stage_group": "IV", "er": "Negative", "pr": "Positive",
+        "her2_ihc": "0", "her2": "Negative", "ethnicity": "Asian", "diagnosis": "Carcinoma"}),
+}
+
+
+@pytest.mark.parametrize("vendor", list(VENDOR_ROWS))
+def test_vendor_rows_are_normalised(vendor):
+    row, expected = VENDOR_ROWS[vendor]
+    (out,) = ADAPTERS[vendor]({"Sheet1": pd.DataFrame([row])})
+    assert list(out.columns) == CATALOG_COLUMNS
+    assert out["vendor"].iloc[0] == vendor
+    assert {col: out[col].iloc[0] for col in expected} == expected
+
+
+def test_facet_filter_intersects_facets_and_unions_values():
+    df = pd.DataFrame({
+        "vendor": ["BioIVT", "BioIVT", "Cureline", "Cureline", "Reprocell"],
+        "preservation": ["FFPE", "Frozen", "FFPE", "FFPE", "FFPE"],
+        "stage_group": ["II", "II", "III", "I", "II"],
+        "er": ["Positive", "Positive", "Positive", "Negative", None],
+        "age": [40, 50, 60, 70, 80],
+        "available": True,
+    }).reindex(columns=CATALOG_COLUMNS)
+    catalog = TissueCatalog(compact(df, categories=CATEGORIES))
+
+    mask = catalog.mask(preservation="FFPE", stage_group=["II", "III"], er="Positive")
+    assert np.flatnonzero(mask).tolist() == [0, 2]
+    assert np.flatnonzero(catalog.mask(preservation="FFPE", age=(50, 70))).tolist() == [2, 3]
+    assert not catalog.mask(vendor="Reprocell", er="Positive").any()
+    assert catalog.filter(stage_group="IV").empty
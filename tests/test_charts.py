@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from charts import lttb
+
+
+@pytest.mark.parametrize("threshold", [3, 10, 257])
+def test_lttb_keeps_threshold_points_including_the_endpoints(threshold):
+    rng = np.random.default_rng(0)
+    x = pd.date_range("2024-01-01", periods=1000, freq="D")
+    y = rng.normal(size=1000).cumsum()
+    keep = lttb(x, y, threshold)
+    assert len(keep) == threshold
+    assert keep[0] == 0 and keep[-1] == 999
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_keeps_a_lone_spike():
+    y = np.zeros(500)
+    y[321] = 50.0
+    assert 321 in lttb(np.arange(500), y, 20)
+
+
+@pytest.mark.parametrize("threshold", [100, 101])
+def test_lttb_returns_short_series_unchanged(threshold):
+    x = np.arange(100)
+    assert lttb(x, np.sin(x), threshold).tolist() == list(range(100))
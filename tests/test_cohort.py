@@ -0,0 +1,48 @@
+import pandas as pd
+
+from catalog import CATALOG_COLUMNS, CATEGORIES, TissueCatalog
+from cohort import find_cohorts
+from data_cache import compact
+
+AA = "Black or African American"
+ARMS = [("AA", 1, {"ethnicity": AA}), ("non-AA", 1, {"ethnicity": "White"})]
+
+
+def tissue_catalog(rows):
+    """Catalog of FFPE samples from ``(vendor, donor, ethnicity, price)``."""
+    df = pd.DataFrame([
+        {"vendor": vendor, "sample_id": f"{donor}-1", "donor_id": donor, "preservation": "FFPE",
+         "ethnicity": ethnicity, "available": True, "quantity": 1, "price_usd": price}
+        for vendor, donor, ethnicity, price in rows
+    ]).reindex(columns=CATALOG_COLUMNS)
+    df["price_usd"] = pd.to_numeric(df["price_usd"])
+    return TissueCatalog(compact(df, categories=CATEGORIES))
+
+
+CATALOG = [
+    ("BioIVT", "b1", AA, 100.0),
+    ("BioIVT", "b2", "White", 100.0),
+    ("Cureline", "c1", AA, 10.0),
+    ("Cureline", "c2", "White", None),
+]
+
+
+def test_cohorts_rank_single_vendor_then_fully_priced_then_cheapest():
+    cohorts = find_cohorts(tissue_catalog(CATALOG), ARMS)
+    assert [c["vendors"] for c in cohorts] == [["BioIVT"], ["Cureline"], ["BioIVT", "Cureline"]]
+    assert [c["unpriced"] for c in cohorts] == [0, 1, 0]
+    assert [c["total_cost"] for c in cohorts] == [200.0, 10.0, 110.0]
+    assert all(c["feasible"] for c in cohorts)
+    mixed = cohorts[2]["samples"].set_index("arm")["donor_id"]
+    assert mixed.to_dict() == {"AA": "c1", "non-AA": "b2"}
+
+
+def test_short_cohorts_are_returned_after_complete_ones():
+    arms = [("AA", 2, {"ethnicity": AA}), ("non-AA", 1, {"ethnicity": "White"})]
+    cohorts = find_cohorts(tissue_catalog(CATALOG), arms)
+    assert cohorts[0]["vendors"] == ["BioIVT", "Cureline"]
+    assert cohorts[0]["feasible"]
+    assert [c["shortfall"] for c in cohorts[1:]] == [{"AA": 1}, {"AA": 1}]
+    assert not any(c["feasible"] for c in cohorts[1:])
+    # A short cohort still lists the donors it did find.
+    assert cohorts[1]["samples"]["donor_id"].tolist() == ["b1", "b2"]
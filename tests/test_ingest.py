@@ -0,0 +1,60 @@
+import warnings
+from pathlib import Path
+
+import openpyxl
+import pytest
+from openpyxl.utils.escape import unescape
+
+import ingest
+
+ROOT = Path(__file__).resolve().parent.parent
+WORKBOOKS = sorted(ROOT.glob("*.xlsx"))
+
+
+def _rows(path, sheet_name, engine, monkeypatch):
+    monkeypatch.setattr(ingest, "EXCEL_ENGINE", engine)
+    rows = []
+    for row in ingest._sheet_rows(path, sheet_name):
+        # openpyxl leaves Excel's _xHHHH_ escapes in text; calamine decodes them.
+        row = [None if v in (None, "") else unescape(v) if isinstance(v, str) else v for v in row]
+        while row and row[-1] is None:
+            row.pop()
+        rows.append(row)
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+@pytest.mark.parametrize("path", WORKBOOKS, ids=lambda p: p.name)
+def test_calamine_rows_match_openpyxl(path, monkeypatch):
+    pytest.importorskip("python_calamine")
+    wb = ingest._open(path)
+    sheet_names = wb.sheetnames
+    wb.close()
+    for sheet_name in sheet_names:
+        assert _rows(path, sheet_name, "calamine", monkeypatch) == _rows(path, sheet_name, "openpyxl", monkeypatch)
+
+
+def test_large_files_are_streamed_with_openpyxl(monkeypatch):
+    pytest.importorskip("python_calamine")
+    monkeypatch.setattr(ingest, "EXCEL_ENGINE", "calamine")
+    monkeypatch.setattr(ingest, "CALAMINE_MAX_BYTES", 0)
+    opened = []
+    monkeypatch.setattr(ingest, "_open", lambda path: opened.append(path) or ingest.openpyxl.load_workbook(
+        path, read_only=True, data_only=True))
+    next(ingest._sheet_rows(ROOT / "lab_record.xlsx", "Sheet1"))
+    assert opened
+
+
+def test_column_blank_for_a_whole_chunk_keeps_its_type(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    wb = openpyxl.Workbook()
+    wb.active.append(["Sample ID", "Format", "Site", "Age", "Price"])
+    for i in range(6):
+        wb.active.append([f"S{i}", "FFPE", "Breast", 50 + i, None if i < 3 else 10.5 * i])
+    wb.save(tmp_path / "stock.xlsx")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        df = ingest.read_sheet(tmp_path / "stock.xlsx", "Sheet", chunk_size=3)
+    assert df["Price"].dtype.kind == "f"
+    assert df["Price"].isna().tolist() == [True] * 3 + [False] * 3
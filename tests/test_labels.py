@@ -0,0 +1,28 @@
+import labels
+from labels import PARALLEL_THRESHOLD, LabelCache
+
+
+def test_unavailable_pool_falls_back_to_this_process(tmp_path, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise OSError("no semaphores")
+
+    monkeypatch.setattr(labels, "ProcessPoolExecutor", no_pool)
+    items = [(f"CAT:{i}|LOT:L{i}", f"item {i}") for i in range(PARALLEL_THRESHOLD)]
+    cache = LabelCache(tmp_path)
+    images = cache.get_many(items, workers=2)
+    assert len(images) == len(items)
+    assert all(image.startswith(b"\x89PNG") for image in images)
+    assert cache.stats["rendered"] == len(items)
+
+
+def test_memory_cache_keeps_the_most_recent_labels(tmp_path):
+    cache = LabelCache(tmp_path, max_images=2)
+    first, second, third = [(f"CAT:{i}|LOT:L{i}", f"item {i}") for i in range(3)]
+    cache.get_many([first, second], workers=1)
+    cache.get_many([first], workers=1)  # now the most recently used
+    cache.get_many([third], workers=1)
+    assert cache.stats["memory"] == 1
+    cache.get_many([first, third], workers=1)
+    assert cache.stats["memory"] == 3
+    cache.get_many([second], workers=1)
+    assert cache.stats["disk"] == 1
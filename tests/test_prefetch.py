@@ -0,0 +1,62 @@
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from data_cache import WorkbookCache, workbooks
+from ingest import read_workbook
+from prefetch import start_background, warm_start
+
+ROOT = Path(__file__).resolve().parent.parent
+FILES = ["reprocell_breast_stock.xlsx", "reprocell_biobank_2.xlsx"]
+
+
+def test_fresh_sidecars_skip_the_pool(tmp_path, monkeypatch):
+    for name in FILES:
+        shutil.copy(ROOT / name, tmp_path)
+    monkeypatch.chdir(tmp_path)
+    files = {tmp_path / name: ("sheets", "first_sheet") for name in FILES}
+    workbooks.invalidate()
+    assert warm_start(files, workers=1, build=False)["status"].eq("parsed").all()
+    assert all(workbooks.has_sidecars(path) for path in files)
+
+    workbooks.invalidate()
+    report = warm_start(files, workers=len(files), build=False)
+    assert report.attrs["workers"] == 1
+    assert report["source"].eq("sidecar").all()
+
+
+def test_concurrent_loads_share_one_parse(tmp_path):
+    path = tmp_path / "stock.xlsx"
+    path.write_bytes(b"stand-in")
+    cache = WorkbookCache(tmp_path / ".cache")
+    calls = []
+
+    def parse():
+        calls.append(1)
+        time.sleep(0.2)
+        return pd.DataFrame({"a": [1, 2]})
+
+    threads = [threading.Thread(target=cache.load, args=(path, ("stream", "Sheet1"), parse)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+
+def test_page_load_waits_for_the_pool_instead_of_parsing(tmp_path, monkeypatch):
+    for name in FILES:
+        shutil.copy(ROOT / name, tmp_path)
+    monkeypatch.chdir(tmp_path)
+    files = {tmp_path / name: ("sheets",) for name in FILES}
+    workbooks.invalidate()
+    parsed = workbooks.stats["parsed"]
+
+    thread = start_background(files, workers=len(files), build=False)
+    frames = read_workbook(tmp_path / FILES[0])  # as a page racing the warm start would
+    thread.join()
+    assert frames and all(len(df) for df in frames.values())
+    assert workbooks.stats["parsed"] == parsed  # every parse happened in the pool
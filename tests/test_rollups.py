@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from rollups import ServiceRollups, load_store_rollups, prepare_records
+from store import Store
+
+
+def test_summaries_hold_only_observed_groups():
+    rng = np.random.default_rng(0)
+    n = 5000
+    records = prepare_records(pd.DataFrame({
+        "Date": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 200, n), unit="D"),
+        "Requester Name": rng.choice([f"Dr. {i}" for i in range(30)], n),
+        "Service Type": rng.choice(["H&E", "IHC", "FFPE Processing & Embedding"], n),
+        "Sample Type": rng.choice(["Tissue", "Cells"], n),
+        "Quantity": rng.integers(1, 5, n),
+    }))
+    rollups = ServiceRollups()
+    rollups.rebuild(records)
+    assert isinstance(rollups.daily["Requester Name"].dtype, pd.CategoricalDtype)
+
+    daily = rollups.summary("all", ["Date", "Requester Name"])
+    assert len(daily) == len(records.drop_duplicates(["Date", "Requester Name"]))
+    assert (daily["Quantity"] > 0).all()
+    assert (rollups.summary("ffpe", "Requester Name")["Quantity"] > 0).all()
+    assert (rollups.monthly_summary("slides")["Quantity"] > 0).all()
+
+
+def test_store_rollups_read_only_new_rows_until_a_row_changes(tmp_path, monkeypatch):
+    store = Store(tmp_path / "store.sqlite3")
+    rows = pd.DataFrame({
+        "Date": pd.to_datetime(["2025-01-02", "2025-01-03", "2025-02-01"]),
+        "Requester Name": ["Dr. A", "Dr. B", "Dr. A"],
+        "Service Type": ["H&E", "IHC", "H&E"],
+        "Sample Type": ["Tissue", "Tissue", "Cells"],
+        "Quantity": [2, 3, 4],
+    })
+    store.import_frame("service_records", rows.iloc[:2])
+    rollups = ServiceRollups()
+    load_store_rollups(store, rollups=rollups)
+
+    store.import_frame("service_records", rows.iloc[2:])
+    read = []
+    monkeypatch.setattr(store, "frame", lambda table: read.append(table))
+    load_store_rollups(store, rollups=rollups)
+    assert not read  # the append was folded in from rows_after alone
+    monkeypatch.undo()
+    expected = ServiceRollups()
+    expected.rebuild(prepare_records(store.frame("service_records").reset_index(drop=True)))
+    assert rollups.metrics() == expected.metrics()
+    assert rollups.summary("all", "Requester Name").equals(expected.summary("all", "Requester Name"))
+
+    store.delete("service_records", [int(store.frame("service_records").index[0])])
+    load_store_rollups(store, rollups=rollups)
+    assert rollups.metrics() == {"total_services": 2, "total_slides": 7, "unique_requesters": 2}
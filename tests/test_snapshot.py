@@ -0,0 +1,22 @@
+import json
+import shutil
+from pathlib import Path
+
+from snapshot import PENDING_REQUESTS, write_snapshot
+from store import Store
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_pending_snapshot_survives_an_unreadable_stock_file(tmp_path, monkeypatch):
+    shutil.copy(ROOT / "Cancer_biobanks_USA.xlsx", tmp_path)
+    (tmp_path / "reprocell_breast_stock.xlsx").write_text("not a workbook")
+    monkeypatch.chdir(tmp_path)
+
+    path = write_snapshot(tmp_path / "snapshots", sections=["pending"], html_report=True,
+                          store=Store(tmp_path / "store.sqlite3"))
+    blocks = json.loads((path / "manifest.json").read_text())["sections"]["pending"]
+    assert {"type": "requests", "items": [list(item) for item in PENDING_REQUESTS]} in blocks
+    infos = [block["text"] for block in blocks if block["type"] == "info"]
+    assert any("reprocell_breast_stock.xlsx could not be read" in text for text in infos)
+    assert "Dr. Chandravanu Dash" in (path / "report.html").read_text()
@@ -0,0 +1,156 @@
+import shutil
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from store import Store
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A scratch directory holding the bundled biobank list, like the app's own."""
+    shutil.copy(ROOT / "Cancer_biobanks_USA.xlsx", tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DASHBOARD_PREFETCH", "0")
+    monkeypatch.setenv("DASHBOARD_WATCH", "0")
+    return tmp_path
+
+
+def _app_on_page(app_path, url_path):
+    """Test entry script: run the app with ``url_path`` as its default page."""
+    import runpy
+
+    import streamlit as st
+
+    page = st.Page
+
+    def default_to(target, *args, **kwargs):
+        kwargs["default"] = kwargs.get("url_path") == url_path
+        return page(target, *args, **kwargs)
+
+    st.Page = default_to
+    try:
+        runpy.run_path(app_path)
+    finally:
+        st.Page = page
+
+
+def open_page(url_path):
+    at = AppTest.from_function(_app_on_page, args=(str(ROOT / "app.py"), url_path), default_timeout=60)
+    return at.run()
+
+
+def editor_frame(at, column):
+    """The frame shown by the data editor that has ``column``."""
+    return next(table.value for table in at.dataframe
+                if table.value.columns[0] == "id" and column in table.value.columns)
+
+
+def test_added_editor_row_keeps_the_list_renderable(workdir):
+    at = open_page("pending")
+    assert not at.exception
+
+    store = Store(workdir / "core_store.sqlite3")
+    df = store.editor_frame("biobanks")
+    assert df.index.equals(pd.RangeIndex(len(df)))
+    # st.data_editor hands back added rows with its own "_index" key.
+    changes = {"added_rows": [{"_index": None, "Name": "Test Biobank", "Notes": "added in editor"}]}
+    assert store.apply_edits("biobanks", df, changes) == 1
+
+    frame = store.frame("biobanks")
+    assert "_index" not in frame.columns
+    assert frame["Name"].iloc[-1] == "Test Biobank"
+
+    at.run()
+    assert not at.exception
+    biobanks = editor_frame(at, "Name")
+    assert biobanks.index.equals(pd.RangeIndex(len(df) + 1))
+    assert biobanks["Name"].iloc[-1] == "Test Biobank"
+
+
+def test_edits_and_deletes_use_the_id_column(workdir):
+    store = Store(workdir / "core_store.sqlite3")
+    store.seed("biobanks")
+    df = store.editor_frame("biobanks")
+    first, second = df["id"].iloc[0], df["id"].iloc[1]
+    store.apply_edits("biobanks", df, {"edited_rows": {0: {"Notes": "called"}}, "deleted_rows": [1]})
+
+    frame = store.frame("biobanks")
+    assert frame.loc[first, "Notes"] == "called"
+    assert second not in frame.index
+    assert "id" not in frame.columns
+
+
+def test_added_rate_row_keeps_the_cost_page_renderable(workdir):
+    shutil.copy(ROOT / "lab_record.xlsx", workdir)
+    at = open_page("cost")
+    assert not at.exception
+
+    store = Store(workdir / "core_store.sqlite3")
+    df = store.editor_frame("price_schedule")
+    changes = {"added_rows": [{"_index": None, "Effective Date": "2025-01-01", "Service Type": "H&E",
+                               "Tier": "Internal", "Unit Price": 5.0}]}
+    assert store.apply_edits("price_schedule", df, changes) == 1
+    assert "_index" not in store.frame("price_schedule").columns
+
+    at.run()
+    assert not at.exception
+    rates = editor_frame(at, "Unit Price")
+    assert rates.index.equals(pd.RangeIndex(1))
+    assert rates["id"].tolist() == [1]
+
+
+def test_concurrent_seeding_imports_once(workdir):
+    shutil.copy(ROOT / "lab_record.xlsx", workdir)
+    rows = len(pd.read_excel(workdir / "lab_record.xlsx"))
+    store = Store(workdir / "core_store.sqlite3")
+    barrier = threading.Barrier(4)
+
+    def seed():
+        barrier.wait()
+        store.seed("service_records")
+
+    threads = [threading.Thread(target=seed) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.count("service_records") == rows
+
+
+@pytest.mark.parametrize("workbook, url_path", [
+    ("lab_record.xlsx", "delivered"),
+    ("lab_record.xlsx", "cost"),
+    ("Cancer_biobanks_USA.xlsx", "pending"),
+    ("price_schedule.xlsx", "cost"),
+])
+def test_malformed_seed_workbook_is_reported(workdir, workbook, url_path):
+    (workdir / workbook).write_bytes(b"not an xlsx file")
+    at = open_page(url_path)
+    assert not at.exception
+    assert any(workbook in error.value for error in at.error)
+
+
+def test_ffpe_workbook_without_block_ids_imports(workdir):
+    pd.DataFrame({"Cancer Type": ["Breast", "Breast", "Colon"], "Quantity": [3, 2, 5]}).to_excel(
+        workdir / "ffpe_repository.xlsx", index=False)
+    store = Store(workdir / "core_store.sqlite3")
+    store.seed("ffpe_repository")
+    frame = store.frame("ffpe_repository")
+    assert frame["Cancer Type"].tolist() == ["Breast", "Breast", "Colon"]
+    assert frame["Block ID"].isna().all()
+
+    # Rows without an ID never collide with each other or with identified blocks.
+    store.import_frame("ffpe_repository", pd.DataFrame({
+        "Block ID": [None, "B-1", "B-1"], "Cancer Type": ["Lung", "Lung", "Lung"], "Quantity": [1, 1, 4]}))
+    frame = store.frame("ffpe_repository")
+    assert len(frame) == 5
+    assert frame.loc[frame["Block ID"] == "B-1", "Quantity"].tolist() == [4]
+
+    with pytest.raises(ValueError):
+        store.import_frame("ffpe_repository", pd.DataFrame({"Cancer Type": ["Lung"]}))
@@ -0,0 +1,216 @@
+"""Background watcher for the data files staff drop into the app directory.
+
+Vendor stock exports and the supply workbook used to be picked up on the
+next rerun that happened to read them. ``DataWatcher`` notices a change as it
+happens: through inotify (``watchdog``) when it is installed, otherwise by
+polling file fingerprints. A file is only re-ingested once its size and mtime
+have been stable for ``DEBOUNCE_SECONDS`` and it opens as a complete xlsx
+(zip) archive, so a half-copied export is never parsed.
+
+Re-ingestion runs on the watcher's thread and only touches what was built
+from the changed file: its parsed sheets, its paged tables and whatever the
+file feeds (the tissue catalog or the supply inventory). Each of those is
+rebuilt in full and then swapped in under its own lock, so a session reads
+either the old version or the new one. ``generation`` is bumped after every
+successful reload; open sessions poll it and rerun.
+
+The seed workbooks of the SQLite store (``lab_record.xlsx`` and the like) are
+not watched: the store is the record of truth, and re-importing a dropped
+file would overwrite edits made in the app.
+"""
+import logging
+import threading
+import time
+import zipfile
+from collections import deque
+from pathlib import Path
+
+from data_cache import fingerprint
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+DEBOUNCE_SECONDS = 2.0
+POLL_SECONDS = 2.0
+MAX_EVENTS = 50
+
+logger = logging.getLogger("dashboard.watcher")
+
+
+# -------------------------------------------------
+# Reloaders: what each watched file feeds
+# -------------------------------------------------
+def reload_vendor_file(path):
+    from catalog import load_catalog
+    from ingest import read_workbook, snapshot_info
+    from tables import invalidate
+
+    invalidate(path)
+    snapshot_info(path)
+    read_workbook(path)
+    load_catalog()
+
+
+def reload_supply_file(path):
+    from supply import load_supply
+
+    load_supply(path)
+
+
+def default_handlers():
+    """``{file name: reloader}`` for every non-store data file the app reads."""
+    from catalog import VENDOR_FILES
+    from supply import SUPPLY_FILE
+
+    handlers = {path.name: reload_vendor_file for path in VENDOR_FILES.values()}
+    handlers[SUPPLY_FILE.name] = reload_supply_file
+    return handlers
+
+
+def _complete(path):
+    # xlsx files are zip archives; a partial copy has no central directory yet.
+    try:
+        return zipfile.is_zipfile(path)
+    except OSError:
+        return False
+
+
+def _fingerprint(path):
+    try:
+        return fingerprint(path)
+    except OSError:
+        return None
+
+
+class DataWatcher:
+    def __init__(self, directory=".", handlers=None, debounce=DEBOUNCE_SECONDS, poll=POLL_SECONDS):
+        self.directory = Path(directory).resolve()
+        self.handlers = default_handlers() if handlers is None else handlers
+        self.debounce = debounce
+        self.poll = poll
+        self.generation = 0
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.mode = None
+        self._known = {name: _fingerprint(self.directory / name) for name in self.handlers}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_Events(self), str(self.directory), recursive=False)
+                self._observer.start()
+                self.mode = "inotify"
+            except OSError:
+                # e.g. the inotify watch limit; polling still works.
+                self._observer = None
+        self.mode = self.mode or "polling"
+        self._thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+        self._thread.start()
+        logger.info("watching %s (%s) for %s", self.directory, self.mode, ", ".join(sorted(self.handlers)))
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread is not None:
+            self._thread.join()
+
+    def touched(self, name):
+        """A file event for ``name`` (from inotify); checked on the next tick."""
+        if name in self.handlers:
+            self._wake.set()
+
+    def events_since(self, generation):
+        with self._lock:
+            return [e for e in self.events if e["generation"] > generation]
+
+    # --- Worker thread ---
+    def _run(self):
+        while not self._stop.is_set():
+            # inotify events wake the loop at once; the timed tick is the
+            # polling fallback and steps the debounce of flagged files.
+            timeout = self.debounce / 4 if self._pending else self.poll
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            self._scan()
+            for name in self._settled():
+                self._reload(name)
+
+    def _scan(self):
+        now = time.monotonic()
+        for name in self.handlers:
+            fp = _fingerprint(self.directory / name)
+            if fp == self._known[name] and name not in self._pending:
+                continue
+            pending = self._pending.get(name)
+            if pending is None or pending[0] != fp:
+                self._pending[name] = (fp, now)
+
+    def _settled(self):
+        now = time.monotonic()
+        settled = []
+        for name, (fp, since) in list(self._pending.items()):
+            if now - since < self.debounce:
+                continue
+            if fp is None:
+                # Deleted (or mid-rename); readers already handle a missing file.
+                self._known[name] = None
+                del self._pending[name]
+            elif fp == self._known[name]:
+                del self._pending[name]
+            elif _complete(self.directory / name):
+                settled.append(name)
+        return settled
+
+    def _reload(self, name):
+        fp, _ = self._pending.pop(name)
+        path = self.directory / name
+        started = time.perf_counter()
+        try:
+            self.handlers[name](path)
+        except Exception as e:
+            # Keep serving the previous version; the next change retries.
+            logger.exception("reloading %s failed", name)
+            status = f"failed: {e}"
+        else:
+            status = "reloaded"
+        self._known[name] = fp
+        with self._lock:
+            if status == "reloaded":
+                self.generation += 1
+            self.events.append({
+                "generation": self.generation,
+                "time": time.time(),
+                "file": name,
+                "status": status,
+                "seconds": round(time.perf_counter() - started, 3),
+            })
+        logger.info("%s %s in %.2fs", name, status, time.perf_counter() - started)
+
+
+if Observer is not None:
+    class _Events(FileSystemEventHandler):
+        def __init__(self, watcher):
+            self.watcher = watcher
+
+        def on_any_event(self, event):
+            for attr in ("src_path", "dest_path"):
+                path = getattr(event, attr, None)
+                if path:
+                    self.watcher.touched(Path(path).name)